@@ -0,0 +1,62 @@
+"""JSON encode/decode micro-benchmark on real converter output.
+
+Compares the historic stdlib ``indent=2`` writer with ``bids2ebrains.jsonio``
+in both styles (and orjson, when installed) on every ``*.jsonld`` file of a
+directory, reporting seconds per pass and bytes written.
+
+    python benchmarks/bench_json.py --jsonld out/ --repeat 20
+"""
+from __future__ import annotations
+import argparse, json, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bids2ebrains import jsonio
+
+
+def _time(fn, items, repeat):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = [fn(x) for x in items]
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--jsonld", type=Path, required=True)
+    p.add_argument("--repeat", type=int, default=10)
+    args = p.parse_args(argv)
+
+    raw = [fp.read_bytes() for fp in sorted(args.jsonld.glob("*.jsonld"))]
+    if not raw:
+        raise SystemExit(f"No *.jsonld files in {args.jsonld}")
+    objs = [json.loads(b) for b in raw]
+
+    rows = []
+    backends = ["json"] + (["orjson"] if jsonio._orjson is not None else [])
+    t, _ = _time(json.loads, raw, args.repeat)
+    rows.append(("loads", "stdlib json", t, sum(map(len, raw))))
+    t, out = _time(lambda o: json.dumps(o, indent=2).encode("utf-8"), objs, args.repeat)
+    rows.append(("dumps", "stdlib indent=2 (historic)", t, sum(map(len, out))))
+    for name in backends:
+        jsonio.set_backend(name)
+        t, _ = _time(jsonio.loads, raw, args.repeat)
+        rows.append(("loads", f"jsonio/{name}", t, sum(map(len, raw))))
+        for style in jsonio.STYLES:
+            t, out = _time(lambda o: jsonio.dumps(o, style), objs, args.repeat)
+            rows.append(("dumps", f"jsonio/{name} {style}", t, sum(map(len, out))))
+    jsonio.set_backend("auto")
+
+    print(f"{len(raw)} files, best of {args.repeat}")
+    print(f"{'op':<7}{'variant':<30}{'ms':>10}{'bytes':>12}")
+    for op, variant, t, size in rows:
+        print(f"{op:<7}{variant:<30}{t * 1000:>10.2f}{size:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
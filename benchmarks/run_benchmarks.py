@@ -0,0 +1,207 @@
+"""Stage-level benchmarks for the bids2ebrains pipeline.
+
+Generates synthetic BIDS datasets at several sizes and times every ``core``
+entry point (convert, scan, patch, validate, upload, group) in a fresh child
+process, recording wall time, peak RSS and file I/O counters. Uploads go to a
+local stub KG server so no network or token is needed.
+
+    python benchmarks/run_benchmarks.py --sizes 5,50,200 --out bench.json
+    python benchmarks/run_benchmarks.py --sizes 5,50 --compare bench.json
+"""
+from __future__ import annotations
+import argparse, json, multiprocessing as mp, os, platform, queue, shutil, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+STAGES = ("convert", "scan", "patch", "validate", "upload", "group")
+STAGE_TIMEOUT = 3600.0
+
+ANSWERS = {
+    "Dataset.description": "Synthetic benchmark dataset",
+    "DatasetVersion.license": "CC BY 4.0",
+    "DatasetVersion.accessibility": "freeAccess",
+    "DatasetVersion.versionIdentifier": "v1.0.0",
+    "DatasetVersion.versionInnovation": "Initial release",
+    "SubjectState.ageCategory": "youngAdult",
+}
+
+
+class _StubKG(BaseHTTPRequestHandler):
+    def _reply(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.send_response(201 if self.command == "POST" else 200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_POST = do_PUT = do_GET = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def _io_counters() -> dict:
+    try:
+        with open("/proc/self/io") as fh:
+            return {k: int(v) for k, v in (line.split(":") for line in fh)}
+    except OSError:
+        return {}
+
+
+def _peak_rss_kb() -> int:
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss // 1024 if sys.platform == "darwin" else rss
+    except ImportError:
+        return 0
+
+
+def _stage(name: str, bids: str, out: str, queue) -> None:
+    import io, contextlib
+    from bids2ebrains import core
+
+    calls = {
+        "convert": lambda: core.convert_bids(Path(bids), Path(out)),
+        "scan": lambda: core.scan_missing(Path(out)),
+        "patch": lambda: core.patch_openminds(Path(out), repo_iri="", answers=dict(ANSWERS)),
+        "validate": lambda: core.validate_jsonld(Path(out)),
+        "upload": lambda: core.upload_to_kg(Path(out), space="bench", token="bench"),
+        "group": lambda: core.group_subjects(
+            Path(out), by="group", participants=Path(bids) / "participants.tsv"
+        ),
+    }
+    before, err = _io_counters(), None
+    t0 = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            calls[name]()
+    except Exception as e:
+        err = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - t0
+    after = _io_counters()
+    queue.put({
+        "wall_s": round(wall, 4),
+        "peak_rss_kb": _peak_rss_kb(),
+        "io": {k: after[k] - before.get(k, 0) for k in after},
+        "error": err,
+    })
+
+
+def _collect(p, q, timeout: float) -> dict:
+    # the child may die without reporting (OOM kill, segfault) or hang: never block on the queue
+    t0 = time.perf_counter()
+    while True:
+        try:
+            return q.get(timeout=1.0)
+        except queue.Empty:
+            pass
+        elapsed = time.perf_counter() - t0
+        if not p.is_alive():
+            try:
+                return q.get(timeout=1.0)
+            except queue.Empty:
+                err = f"stage process exited with code {p.exitcode} without a result"
+                break
+        if elapsed > timeout:
+            p.terminate()
+            err = f"timed out after {timeout:.0f}s"
+            break
+    return {"wall_s": round(elapsed, 4), "peak_rss_kb": 0, "io": {}, "error": err}
+
+
+def run(sizes, stages, file_size: int, sessions: int, runs: int, workdir: Path,
+        timeout: float = STAGE_TIMEOUT) -> list:
+    from bids2ebrains.synthetic import generate_bids
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubKG)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["EBRAINS_KG_BASE"] = f"http://127.0.0.1:{server.server_port}/v3/instances"
+
+    ctx = mp.get_context("spawn")
+    results = []
+    try:
+        for n in sizes:
+            bids, out = workdir / f"bids-{n}", workdir / f"out-{n}"
+            generate_bids(bids, subjects=n, sessions=sessions, runs=runs, file_size=file_size)
+            for stage in stages:
+                q = ctx.Queue()
+                p = ctx.Process(target=_stage, args=(stage, str(bids), str(out), q))
+                p.start()
+                rec = _collect(p, q, timeout)
+                p.join()
+                rec.update(
+                    size=n, stage=stage,
+                    nodes=len(list(out.glob("*.jsonld"))) if out.exists() else 0,
+                )
+                results.append(rec)
+                print(f"{n:>6} {stage:<9} {rec['wall_s']:>9.3f}s {rec['peak_rss_kb'] / 1024:>8.1f} MiB"
+                      + (f"  [{rec['error']}]" if rec["error"] else ""))
+            shutil.rmtree(bids, ignore_errors=True)
+            shutil.rmtree(out, ignore_errors=True)
+    finally:
+        server.shutdown()
+    return results
+
+
+def compare(old: dict, new: dict) -> None:
+    base = {(r["size"], r["stage"]): r for r in old.get("results", [])}
+    print(f"{'size':>6} {'stage':<9} {'old':>9} {'new':>9} {'ratio':>7}")
+    for r in new["results"]:
+        o = base.get((r["size"], r["stage"]))
+        if not o or not o["wall_s"]:
+            continue
+        print(f"{r['size']:>6} {r['stage']:<9} {o['wall_s']:>9.3f} {r['wall_s']:>9.3f} {r['wall_s'] / o['wall_s']:>7.2f}")
+
+
+def _json_backend() -> str:
+    from bids2ebrains import jsonio
+    return jsonio.backend()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--sizes", default="5,50,200", help="Comma-separated subject counts")
+    p.add_argument("--stages", default=",".join(STAGES))
+    p.add_argument("--sessions", type=int, default=1)
+    p.add_argument("--runs", type=int, default=1)
+    p.add_argument("--file-size", type=int, default=0, help="Bytes per imaging file (sparse)")
+    p.add_argument("--workdir", type=Path, help="Scratch directory (default: a temp dir)")
+    p.add_argument("--out", type=Path, help="Write results JSON here")
+    p.add_argument("--compare", type=Path, help="Previous results JSON to compare against")
+    p.add_argument("--timeout", type=float, default=STAGE_TIMEOUT, help="Seconds before a stage is killed")
+    args = p.parse_args(argv)
+
+    try:
+        from importlib.metadata import version as _dist_version
+        version = _dist_version("bids2ebrains")
+    except Exception:
+        version = "unknown"
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    stages = [s for s in args.stages.split(",") if s in STAGES]
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        results = run(sizes, stages, args.file_size, args.sessions, args.runs, Path(tmp), args.timeout)
+
+    report = {
+        "meta": {
+            "version": version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "json_backend": _json_backend(), "json_style": os.getenv("BIDS2EBRAINS_JSON_STYLE", "pretty"),
+            "file_size": args.file_size, "sessions": args.sessions, "runs": args.runs,
+        },
+        "results": results,
+    }
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        compare(json.loads(args.compare.read_text()), report)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,7 @@ from .scanner import Scanner
 from .patcher import Patcher
 from .uploader import Uploader
 from .grouper import group_subjects
+from .profiling import profile
 
 from .core import (
     convert_bids,
@@ -23,4 +24,5 @@ __all__ = [
     "upload_to_kg",
     "validate_jsonld",  
     "group_subjects",  
+    "profile",
 ]
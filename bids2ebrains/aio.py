@@ -0,0 +1,222 @@
+from __future__ import annotations
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import asyncio, contextlib, contextvars, functools, time
+
+import requests
+
+try:  # optional native HTTP client
+    import aiohttp
+except Exception:
+    aiohttp = None
+
+from . import auth, core, instrumentation, jsonio, progress
+from .config import KG_BASE
+from .cache import PersonCache
+from .person_index import SIMILARITY_THRESHOLD
+from .resolver import MAX_WORKERS, PersonSpec, resolve_persons_batch
+from .uploader import _send, is_controlled, kg_headers
+from .utils import read_json
+
+UPLOAD_CONCURRENCY = 8
+# per-node transport failures; anything else is a bug and still propagates
+_TRANSPORT_ERRORS = (requests.RequestException, asyncio.TimeoutError) + (
+    (aiohttp.ClientError,) if aiohttp is not None else ())
+
+
+def _tracked(prog: progress.Progress, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    with progress.tracking(prog):
+        return fn(*args, **kwargs)
+
+
+async def run_blocking(fn: Callable[..., Any], *args, executor: Optional[Executor] = None, **kwargs) -> Any:
+    """Run ``fn`` in ``executor`` (default: the loop's) with the caller's context.
+
+    Cancelling the awaiting task stops ``fn`` at its next progress checkpoint;
+    ``CancelledError`` is re-raised only once the worker has let go. With a
+    ``ProcessPoolExecutor`` ``fn`` and its arguments must be picklable
+    (module-level functions such as the ``core`` API) and run without the
+    caller's context or progress, so a started call runs to completion.
+    """
+    loop = asyncio.get_running_loop()
+    prog = progress.current() or progress.Progress()
+    if isinstance(executor, ProcessPoolExecutor):
+        call = functools.partial(fn, *args, **kwargs)
+    else:
+        call = functools.partial(contextvars.copy_context().run, _tracked, prog, fn, args, kwargs)
+
+    fut = loop.run_in_executor(executor, call)
+    try:
+        return await asyncio.shield(fut)
+    except asyncio.CancelledError:
+        prog.cancel()
+        with contextlib.suppress(BaseException):
+            await fut
+        raise
+
+
+async def convert_bids(bids_root: Path, out_dir: Optional[Path] = None, pack: Optional[Path] = None,
+                       *, executor: Optional[Executor] = None) -> None:
+    return await run_blocking(core.convert_bids, bids_root, out_dir, pack=pack, executor=executor)
+
+
+async def scan_missing(jsonld_dir: Path, *, executor: Optional[Executor] = None):
+    return await run_blocking(core.scan_missing, jsonld_dir, executor=executor)
+
+
+async def validate_jsonld(jsonld_dir: Path, cache=None, *, executor: Optional[Executor] = None):
+    return await run_blocking(core.validate_jsonld, jsonld_dir, cache=cache, executor=executor)
+
+
+async def resolve_persons(
+    specs: Sequence[PersonSpec],
+    token: Optional[str] = None,
+    scope: str = "released",
+    cache: Optional[PersonCache] = None,
+    use_cache: bool = True,
+    index: Optional[Path] = None,
+    threshold: float = SIMILARITY_THRESHOLD,
+    concurrency: int = MAX_WORKERS,
+    *,
+    executor: Optional[Executor] = None,
+) -> List[Optional[str]]:
+    """Async :func:`resolve_persons_batch`: at most ``concurrency`` KG lookups in flight, input order."""
+    return await run_blocking(
+        resolve_persons_batch, specs, token=token, scope=scope, cache=cache, use_cache=use_cache,
+        max_workers=concurrency, index=index, threshold=threshold, executor=executor,
+    )
+
+
+async def patch_openminds(jsonld_dir: Path, repo_iri: str, *, executor: Optional[Executor] = None, **kwargs) -> None:
+    """Async :func:`bids2ebrains.core.patch_openminds` (same keyword arguments)."""
+    return await run_blocking(core.patch_openminds, jsonld_dir, repo_iri, executor=executor, **kwargs)
+
+
+def _read_all(files: List[Path]) -> List[tuple]:
+    return [(fp, read_json(fp)) for fp in files]
+
+
+async def _send_aiohttp(session, method: str, url: str, headers: dict, payload: dict,
+                        reason: Optional[str] = None):
+    data = jsonio.dumps(payload, jsonio.COMPACT)
+    t0 = time.perf_counter()
+    status, body, err = None, b"", None
+    try:
+        async with session.request(method, url, headers=headers, data=data) as resp:
+            status, body = resp.status, await resp.read()
+            return status, body
+    except Exception as e:
+        err = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        instrumentation.emit(
+            method, url, status, time.perf_counter() - t0, len(data), len(body),
+            retry=reason is not None, reason=reason, error=err,
+        )
+
+
+async def upload_to_kg(
+    jsonld_dir: Path,
+    space: str,
+    token: Optional[str] = None,
+    overwrite: bool = True,
+    skip_controlled_terms: bool = True,
+    dry_run: bool = False,
+    concurrency: int = UPLOAD_CONCURRENCY,
+    *,
+    token_file: Optional[Path] = None,
+    token_provider: Optional[auth.TokenProvider] = None,
+    executor: Optional[Executor] = None,
+) -> Dict[str, Any]:
+    """Upload every node with at most ``concurrency`` requests in flight.
+
+    POST, PUT on 409 when ``overwrite``; after the first rejected node no
+    further uploads start; a transport error (connection, timeout) counts as a
+    rejection with status None. The token comes from ``token_provider`` (default:
+    :func:`bids2ebrains.auth.token_provider`) and is renewed on 401. Unlike
+    :meth:`Uploader.upload_dir` there is no ``reconcile`` and the limit is
+    fixed: 429/5xx answers are not retried and count as failures.
+    """
+    provider = token_provider or auth.token_provider(token, token_file)
+    files = sorted(Path(jsonld_dir).glob("*.jsonld"))
+    payloads = await run_blocking(_read_all, files, executor=executor)
+    result: Dict[str, Any] = {"uploaded": 0, "skipped": 0, "unchanged": 0, "failed": [], "auth_retries": 0}
+    todo = []
+    for fp, payload in payloads:
+        if skip_controlled_terms and is_controlled(payload.get("@id", "")):
+            result["skipped"] += 1
+        elif dry_run:
+            print("[dry-run]", fp.stem)
+            result["skipped"] += 1
+        else:
+            todo.append((fp, payload))
+
+    sem = asyncio.Semaphore(concurrency)
+    failed = asyncio.Event()
+    prog = progress.current()
+    if prog:
+        prog.update("upload", total=len(todo))
+    post_url = f"{KG_BASE}?space={space}"
+
+    def authorized(raw):
+        # same 401 handling as KGSession.request; providers may block, so ask them off the loop
+        async def send(method, url, payload, reason=None):
+            token = await asyncio.to_thread(provider.token)
+            status, text = await raw(method, url, kg_headers(token), payload, reason)
+            if status == 401:
+                fresh = await asyncio.to_thread(provider.refresh, token)
+                if fresh != token:
+                    result["auth_retries"] += 1
+                    status, text = await raw(method, url, kg_headers(fresh), payload, "401-refresh")
+            return status, text
+        return send
+
+    async def one(send, fp: Path, payload: dict) -> None:
+        async with sem:
+            if failed.is_set():
+                return
+            try:
+                status, text = await send("POST", post_url, payload)
+                if status == 409 and overwrite:
+                    iid = payload["@id"].split("/")[-1]
+                    status, text = await send("PUT", f"{KG_BASE}/{iid}?space={space}", payload, "409-put")
+            except _TRANSPORT_ERRORS as e:
+                print("✗", fp.stem, e)
+                result["failed"].append((fp.stem, None))
+                failed.set()
+            else:
+                if 200 <= status < 300:
+                    print("✓", fp.stem)
+                    result["uploaded"] += 1
+                else:
+                    print("✗", fp.stem, status, text)
+                    result["failed"].append((fp.stem, status))
+                    failed.set()
+            if prog:
+                prog.update(advance=1)
+
+    async def run_all(send) -> None:
+        tasks = [asyncio.ensure_future(one(send, fp, payload)) for fp, payload in todo]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    if aiohttp is not None:
+        timeout = aiohttp.ClientTimeout(total=30)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            async def send(method, url, headers, payload, reason=None):
+                status, body = await _send_aiohttp(session, method, url, headers, payload, reason)
+                return status, body.decode("utf-8", "replace")
+            await run_all(authorized(send))
+    else:
+        async def send(method, url, headers, payload, reason=None):
+            resp = await asyncio.to_thread(_send, method, url, headers, payload, reason)
+            return resp.status_code, resp.text
+        await run_all(authorized(send))
+    return result
@@ -0,0 +1,221 @@
+from __future__ import annotations
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+import hashlib, os, shutil, threading
+
+from .config import CACHE_DIR
+from .utils import read_json, write_json
+from .vfs import ArchiveFS
+from . import profiling, progress
+
+# Sidecars, tables and descriptions: everything bids2openminds actually reads.
+METADATA_SUFFIXES = (".json", ".tsv", ".csv", ".bval", ".bvec", ".txt", ".md", ".rst", ".cff")
+METADATA_NAMES = ("README", "CHANGES", "LICENSE", "CITATION")
+
+# Placeholders keep this many leading bytes (NIfTI headers, gzip block start) and are sparse after.
+HEAD_BYTES = 64 * 1024
+CHUNK = 1 << 20
+DIGESTS = ("md5", "sha256")
+
+MANIFEST_SUFFIX = ".archive.json"
+
+
+def stream_to_file(src: BinaryIO, dest: Union[str, Path], chunk: int = CHUNK) -> int:
+    """Copy a file-like upload to ``dest`` in ``chunk``-sized pieces; bytes written."""
+    if hasattr(src, "seek"):
+        src.seek(0)
+    n = 0
+    with open(dest, "wb") as out:
+        while True:
+            buf = src.read(chunk)
+            if not buf:
+                return n
+            out.write(buf)
+            n += len(buf)
+
+
+def is_metadata(name: str) -> bool:
+    base = PurePosixPath(name).name
+    if base.lower().endswith(METADATA_SUFFIXES):
+        return True
+    return any(base.upper().startswith(n) for n in METADATA_NAMES)
+
+
+def find_bids_root(names) -> Optional[str]:
+    """Archive prefix ("" or ``"a/b/"``) of the shallowest ``dataset_description.json``."""
+    best = None
+    for name in names:
+        p = PurePosixPath(name)
+        if p.name != "dataset_description.json" or "__MACOSX" in p.parts:
+            continue
+        if best is None or len(p.parts) < len(best.parts):
+            best = p
+    if best is None:
+        return None
+    prefix = str(best.parent)
+    return "" if prefix == "." else prefix + "/"
+
+
+def manifest_path(bids_root: Union[str, Path]) -> Path:
+    """Sidecar manifest of a metadata-only tree; kept next to (not inside) the BIDS root."""
+    root = Path(bids_root).resolve()
+    return root.parent / f"{root.name}{MANIFEST_SUFFIX}"
+
+
+def _safe_rel(name: str, prefix: str) -> Optional[PurePosixPath]:
+    rel = PurePosixPath(name[len(prefix):])
+    if not rel.parts or rel.is_absolute() or ".." in rel.parts:
+        return None
+    return rel
+
+
+def extract_metadata(
+    archive: Union[str, Path],
+    dest: Union[str, Path],
+    metadata_only: bool = True,
+    head_bytes: int = HEAD_BYTES,
+) -> Path:
+    """Extract the BIDS dataset in a zip or tar ``archive`` to ``dest/<root name>``; returns the root.
+
+    The root is located from the archive's member list. With ``metadata_only``
+    only sidecars, TSVs and descriptions are extracted in full; larger
+    payload files become sparse placeholders of their real size holding the
+    first ``head_bytes``, and their size (and zip CRC-32) go to the manifest
+    at :func:`manifest_path` so conversion and patching read them from the
+    archive instead.
+    """
+    archive, dest = Path(archive), Path(dest)
+    with ArchiveFS(archive) as fs:
+        prefix = find_bids_root(fs.names())
+        if prefix is None:
+            raise FileNotFoundError(f"{archive}: no dataset_description.json in archive")
+        root = dest / (PurePosixPath(prefix).name or archive.name.split(".")[0])
+        members = [(name, size, rel) for name, size in fs.members() if name.startswith(prefix)
+                   for rel in [_safe_rel(name, prefix)] if rel is not None]
+        placeholders: Dict[str, Any] = {}
+        progress.report("extract", total=len(members))
+        for n, (name, size, rel) in enumerate(members):
+            progress.report(done=n)
+            target = root.joinpath(*rel.parts)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with fs.open(name) as src, open(target, "wb") as out:
+                if not metadata_only or is_metadata(name) or size <= head_bytes:
+                    shutil.copyfileobj(src, out, CHUNK)
+                    continue
+                out.write(src.read(head_bytes))
+                out.truncate(size)
+            placeholders[str(rel)] = {"member": name, "size": size, "crc32": fs.crc32(name)}
+        progress.report(done=len(members))
+    write_json(manifest_path(root), {"archive": str(archive.resolve()), "root": prefix, "placeholders": placeholders})
+    _load_manifest.cache_clear()
+    return root
+
+
+def materialize(archive: Union[str, Path], cache_dir: Union[str, Path, None] = None) -> Path:
+    """Metadata-only tree of ``archive`` under ``CACHE_DIR/archives``, reused while the archive is unchanged.
+
+    bids2openminds indexes datasets with pybids, which needs a directory; this
+    gives it one at the cost of the metadata files only.
+    """
+    archive = Path(archive).resolve()
+    st = archive.stat()
+    key = hashlib.sha256(f"{archive}\0{st.st_size}\0{st.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+    base = Path(cache_dir or Path(CACHE_DIR) / "archives") / key
+    def ready() -> Optional[Path]:
+        for m in base.glob(f"*{MANIFEST_SUFFIX}"):
+            root = base / m.name[:-len(MANIFEST_SUFFIX)]
+            if root.is_dir():
+                return root
+        return None
+
+    cached = ready()
+    if cached:
+        return cached
+    tmp = base.with_name(f"{key}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    try:
+        root = extract_metadata(archive, tmp)
+        for _ in range(2):
+            try:
+                os.replace(tmp, base)
+                break
+            except OSError:
+                # a concurrent worker got there first, or a crash left a partial tree behind
+                if ready():
+                    break
+                shutil.rmtree(base, ignore_errors=True)
+        else:
+            raise OSError(f"could not move extracted archive to {base}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+        _load_manifest.cache_clear()
+    return base / root.name
+
+
+@lru_cache(maxsize=64)
+def _load_manifest(root: str) -> Optional[Dict[str, Any]]:
+    try:
+        return read_json(manifest_path(root))
+    except (OSError, ValueError):
+        return None
+
+
+def placeholder(path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+    """Manifest entry (``member``, ``size``, ``crc32``, ``archive``, ``root`` and, once
+    :func:`hash_placeholders` ran, ``md5``/``sha256``) when ``path`` is a placeholder."""
+    path = Path(os.path.abspath(path))
+    for root in path.parents:
+        m = _load_manifest(str(root))
+        if m is None:
+            continue
+        entry = m["placeholders"].get(path.relative_to(root).as_posix())
+        return {**entry, "archive": m["archive"], "root": str(root)} if entry else None
+    return None
+
+
+_HASH_LOCK = threading.Lock()
+
+
+def hash_placeholders(root: Union[str, Path]) -> bool:
+    """MD5 and SHA-256 of every placeholder under ``root`` in one pass over the archive.
+
+    Members are read in archive order (a compressed tar is decompressed once)
+    and the digests are stored in the manifest, so conversion and patching
+    share them. False when the archive can no longer be read.
+    """
+    root = str(root)
+    with _HASH_LOCK:
+        m = _load_manifest(root)
+        if m is None:
+            return False
+        todo = {e["member"]: rel for rel, e in m["placeholders"].items() if not all(a in e for a in DIGESTS)}
+        if not todo:
+            return True
+        try:
+            with ArchiveFS(m["archive"]) as fs:
+                for name, _ in fs.members():
+                    rel = todo.get(name)
+                    if rel is not None:
+                        digests, size = fs.digests(name, DIGESTS)
+                        m["placeholders"][rel].update(digests, size=size)
+        except (OSError, KeyError, ValueError):
+            return False
+        write_json(manifest_path(root), m)
+        _load_manifest.cache_clear()
+        return True
+
+
+def placeholder_digest(path: Union[str, Path], entry: Dict[str, Any],
+                       algorithm: str = "sha256") -> Optional[Tuple[str, int]]:
+    """Digest (``md5`` or ``sha256``) and size of a placeholder's real content; None if the archive is gone.
+
+    The first call hashes every placeholder of the archive (see :func:`hash_placeholders`).
+    """
+    if algorithm not in entry:
+        if not hash_placeholders(entry["root"]):
+            return None
+        entry = placeholder(path) or {}
+    if algorithm not in entry:
+        return None
+    return entry[algorithm], entry["size"]
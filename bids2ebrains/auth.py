@@ -0,0 +1,132 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Optional, Union
+import abc, logging, os, threading, time
+
+from .config import TOKEN_ENDPOINT, TOKEN_CLIENT_ID
+
+log = logging.getLogger(__name__)
+
+
+class TokenProvider(abc.ABC):
+    """Source of KG bearer tokens.
+
+    ``token()`` returns the current token; ``refresh(stale)`` is called after
+    a 401 with the token that was rejected and returns a new one (or the same
+    one when nothing better is available).
+    """
+
+    @abc.abstractmethod
+    def token(self) -> str:
+        ...
+
+    def refresh(self, stale: Optional[str] = None) -> str:
+        return self.token()
+
+
+class StaticToken(TokenProvider):
+    def __init__(self, token: str):
+        if not token:
+            raise RuntimeError("Missing token. Set EBRAINS_TOKEN.")
+        self._token = token
+
+    def token(self) -> str:
+        return self._token
+
+
+class FileToken(TokenProvider):
+    """Token kept in a file that something else renews; re-read whenever it changes."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime: Optional[int] = None
+        self._token: Optional[str] = None
+
+    def token(self) -> str:
+        with self._lock:
+            mtime = self.path.stat().st_mtime_ns
+            if mtime != self._mtime or not self._token:
+                self._token = self.path.read_text().strip()
+                self._mtime = mtime
+            if not self._token:
+                raise RuntimeError(f"Token file {self.path} is empty")
+            return self._token
+
+    def refresh(self, stale: Optional[str] = None) -> str:
+        with self._lock:
+            self._mtime = None
+        return self.token()
+
+
+class RefreshToken(TokenProvider):
+    """OAuth2 refresh-token flow against ``endpoint`` (EBRAINS IAM by default).
+
+    Access tokens are renewed ``leeway`` seconds before ``expires_in`` runs
+    out and on every 401; a rotated refresh token from the response replaces
+    the old one.
+    """
+
+    def __init__(
+        self,
+        refresh_token: str,
+        client_id: str = TOKEN_CLIENT_ID,
+        client_secret: Optional[str] = None,
+        endpoint: str = TOKEN_ENDPOINT,
+        leeway: float = 60.0,
+    ):
+        self.refresh_token = refresh_token
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.endpoint = endpoint
+        self.leeway = leeway
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires = 0.0
+
+    def token(self) -> str:
+        with self._lock:
+            if not self._token or time.monotonic() >= self._expires:
+                self._fetch()
+            return self._token
+
+    def refresh(self, stale: Optional[str] = None) -> str:
+        with self._lock:
+            # another thread already replaced the rejected token
+            if self._token is None or stale is None or self._token == stale:
+                self._fetch()
+            return self._token
+
+    def _fetch(self) -> None:
+        import requests
+        data = {"grant_type": "refresh_token", "refresh_token": self.refresh_token, "client_id": self.client_id}
+        if self.client_secret:
+            data["client_secret"] = self.client_secret
+        resp = requests.post(self.endpoint, data=data, timeout=30)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"Token refresh failed: {resp.status_code} {resp.text[:200]}")
+        body = resp.json()
+        self._token = body["access_token"]
+        self.refresh_token = body.get("refresh_token") or self.refresh_token
+        ttl = float(body.get("expires_in") or 300)
+        self._expires = time.monotonic() + max(ttl - self.leeway, ttl / 2)
+        log.info("KG access token refreshed (valid for %ds)", int(ttl))
+
+
+def token_provider(token: Optional[str] = None, token_file: Optional[Union[str, Path]] = None) -> TokenProvider:
+    """Provider for an explicit token or token file, else from the environment:
+    ``EBRAINS_TOKEN_FILE``, ``EBRAINS_REFRESH_TOKEN`` (with ``EBRAINS_CLIENT_ID``/
+    ``EBRAINS_CLIENT_SECRET``), then ``EBRAINS_TOKEN``."""
+    if token:
+        return StaticToken(token)
+    token_file = token_file or os.getenv("EBRAINS_TOKEN_FILE")
+    if token_file:
+        return FileToken(token_file)
+    if os.getenv("EBRAINS_REFRESH_TOKEN"):
+        return RefreshToken(
+            os.environ["EBRAINS_REFRESH_TOKEN"],
+            client_id=os.getenv("EBRAINS_CLIENT_ID", TOKEN_CLIENT_ID),
+            client_secret=os.getenv("EBRAINS_CLIENT_SECRET"),
+        )
+    from .uploader import resolve_token
+    return StaticToken(resolve_token())
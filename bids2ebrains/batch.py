@@ -0,0 +1,307 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import contextlib, os, re, time, traceback
+
+import yaml
+
+from .utils import tree_fingerprint, read_json, write_json
+from .vfs import is_archive
+
+STAGES = ("convert", "patch", "validate", "upload")
+REPORT_NAME = "batch-report.json"
+STATUS_NAME = "status.json"
+LOG_NAME = "log.txt"
+
+
+def _slug(s: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", s).strip("-") or "dataset"
+
+
+def discover(root: Path) -> List[Dict[str, Any]]:
+    """Every immediate sub-directory of ``root`` holding a ``dataset_description.json``, and every zip/tar."""
+    return [
+        {"name": d.name.split(".")[0] if d.is_file() else d.name, "bids": str(d)}
+        for d in sorted(Path(root).iterdir())
+        if (d.is_dir() and (d / "dataset_description.json").exists()) or is_archive(d)
+    ]
+
+
+def load_manifest(path: Path) -> List[Dict[str, Any]]:
+    """Read a YAML/JSON manifest: a list of datasets, or ``{"defaults": {...}, "datasets": [...]}``.
+
+    Each entry needs ``bids`` and may set ``name``, ``answers``, ``space`` and
+    ``repo_iri``; relative paths are resolved against the manifest's directory.
+    """
+    path = Path(path)
+    text = path.read_text()
+    data = yaml.safe_load(text) if path.suffix.lower() in (".yml", ".yaml") else read_json(path)
+    defaults: Dict[str, Any] = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults") or {}
+        data = data.get("datasets") or []
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of datasets")
+    items = []
+    for i, entry in enumerate(data):
+        if isinstance(entry, str):
+            entry = {"bids": entry}
+        entry = {**defaults, **entry}
+        if not entry.get("bids"):
+            raise ValueError(f"{path}: dataset #{i + 1} has no 'bids' path")
+        for key in ("bids", "answers"):
+            if entry.get(key):
+                entry[key] = str((path.parent / entry[key]).resolve())
+        entry.setdefault("name", Path(entry["bids"]).name)
+        items.append(entry)
+    return items
+
+
+def load_items(source: Path) -> List[Dict[str, Any]]:
+    """``source`` is a manifest file, a single BIDS dataset (directory or archive) or a directory of datasets."""
+    source = Path(source)
+    if is_archive(source):
+        return [{"name": source.name.split(".")[0], "bids": str(source)}]
+    if source.is_file():
+        return load_manifest(source)
+    if (source / "dataset_description.json").exists():
+        return [{"name": source.name, "bids": str(source)}]
+    return discover(source)
+
+
+def _unique_names(items: List[Dict[str, Any]]) -> None:
+    seen: Dict[str, int] = {}
+    for item in items:
+        name = _slug(str(item.get("name") or Path(item["bids"]).name))
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}-{seen[name]}"
+        else:
+            seen[name] = 0
+        item["name"] = name
+
+
+def _init_worker() -> None:
+    # Pay the bids2openminds/openMINDS import once per worker, not once per dataset.
+    try:
+        from . import converter  # noqa: F401
+        import openminds  # noqa: F401
+    except Exception:
+        pass
+
+
+def process_dataset(item: Dict[str, Any], opts: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the pipeline for one dataset; never raises, returns its status record.
+
+    Output printed by the stages goes to ``<workdir>/<name>/log.txt``.
+    """
+    out = Path(opts["workdir"]) / item["name"]
+    status: Dict[str, Any] = {
+        "name": item["name"], "bids": item["bids"], "jsonld": str(out / "jsonld"),
+        "space": item.get("space") or opts.get("space"),
+        "requested": list(opts.get("stages") or STAGES), "dry_run": bool(opts.get("dry_run")),
+        "status": "ok", "stages": {}, "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "fingerprint": None, "pid": os.getpid(),
+    }
+    try:
+        status["fingerprint"] = tree_fingerprint(item["bids"])
+        out.mkdir(parents=True, exist_ok=True)
+        with open(out / LOG_NAME, "w") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            _pipeline(item, opts, status)
+    except Exception as e:
+        status["status"] = "failed"
+        status["error"] = f"{type(e).__name__}: {e}"
+
+    status["seconds"] = round(sum(s.get("seconds", 0) for s in status["stages"].values()), 3)
+    try:
+        write_json(out / STATUS_NAME, status)
+    except Exception:
+        pass
+    return status
+
+
+def _pipeline(item: Dict[str, Any], opts: Dict[str, Any], status: Dict[str, Any]) -> None:
+    from . import core
+    from .cache import PersonCache, HashCache, ValidationCache
+
+    jsonld = Path(status["jsonld"])
+    stages = opts.get("stages") or STAGES
+    caches = opts.get("use_caches", True)
+
+    def run(name: str, fn: Callable[[], Any]) -> Any:
+        t0 = time.perf_counter()
+        rec = status["stages"][name] = {"status": "ok"}
+        try:
+            return fn()
+        except Exception as e:
+            rec["status"] = "failed"
+            rec["error"] = f"{type(e).__name__}: {e}"
+            rec["traceback"] = traceback.format_exc(limit=5)
+            status["status"] = "failed"
+            return None
+        finally:
+            rec["seconds"] = round(time.perf_counter() - t0, 3)
+
+    if "convert" in stages:
+        if jsonld.exists():
+            for fp in jsonld.glob("*.jsonld"):
+                fp.unlink()
+        run("convert", lambda: core.convert_bids(Path(item["bids"]), jsonld))
+
+    if "patch" in stages and status["status"] == "ok":
+        run("patch", lambda: core.patch_openminds(
+            jsonld,
+            repo_iri=item.get("repo_iri") or opts.get("repo_iri") or "",
+            answers_file=Path(item["answers"]) if item.get("answers") else None,
+            resolve_persons=opts.get("resolve_persons", False),
+            token=opts.get("token"),
+            person_cache=PersonCache() if caches else None,
+            use_person_cache=caches,
+            person_index=Path(opts["person_index"]) if opts.get("person_index") else None,
+            hash_cache=HashCache() if caches else None,
+        ))
+
+    if "validate" in stages and status["status"] == "ok":
+        errs = run("validate", lambda: core.validate_jsonld(jsonld, cache=ValidationCache() if caches else None))
+        if errs:
+            status["stages"]["validate"]["status"] = "invalid"
+            status["stages"]["validate"]["errors"] = [f"{getattr(fp, 'name', fp)}: {msg}" for fp, msg in errs]
+            status["status"] = "invalid"
+
+    if "upload" in stages:
+        if not status["space"]:
+            status["stages"]["upload"] = {"status": "skipped", "reason": "no space"}
+        elif status["status"] == "invalid" and not opts.get("upload_invalid"):
+            status["stages"]["upload"] = {"status": "skipped", "reason": "validation errors"}
+        elif status["status"] in ("ok", "invalid") and opts.get("dry_run"):
+            # nothing is sent, so no token is needed: record the cost plan instead
+            est = run("upload", lambda: core.estimate_upload(jsonld))
+            if est:
+                status["stages"]["upload"].update(dry_run=True, requests=est["requests"],
+                                                  estimated_wall_s=est["estimated_wall_s"])
+        elif status["status"] in ("ok", "invalid"):
+            res = run("upload", lambda: core.upload_to_kg(jsonld, space=status["space"], token=opts.get("token")))
+            if res:
+                status["stages"]["upload"].update(uploaded=res["uploaded"], failed=len(res["failed"]))
+                if res["failed"]:
+                    status["stages"]["upload"]["status"] = "failed"
+                    status["stages"]["upload"]["error"] = "KG rejected " + ", ".join(
+                        f"{n} ({code})" for n, code in res["failed"])
+                    status["status"] = "failed"
+
+
+def _completed(prev: Dict[str, Any], stage: str, opts: Dict[str, Any], space: Optional[str]) -> bool:
+    rec = prev.get("stages", {}).get(stage) or {}
+    if stage != "upload":
+        return rec.get("status") == "ok"
+    if rec.get("status") == "skipped":
+        # still nothing to upload to
+        return rec.get("reason") == "no space" and not space
+    # a dry run does not stand in for a real upload
+    return rec.get("status") == "ok" and prev.get("space") == space \
+        and (bool(opts.get("dry_run")) or not rec.get("dry_run"))
+
+
+def _previous(workdir: Path, item: Dict[str, Any], opts: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    fp = workdir / item["name"] / STATUS_NAME
+    try:
+        prev = read_json(fp)
+    except Exception:
+        return None
+    if prev.get("status") != "ok" or prev.get("fingerprint") != tree_fingerprint(item["bids"]):
+        return None
+    space = item.get("space") or opts.get("space")
+    if all(_completed(prev, stage, opts, space) for stage in opts["stages"]):
+        return prev
+    return None
+
+
+def run_batch(
+    items: List[Dict[str, Any]],
+    workdir: Path,
+    workers: Optional[int] = None,
+    stages=STAGES,
+    space: Optional[str] = None,
+    answers: Optional[Path] = None,
+    repo_iri: str = "",
+    token: Optional[str] = None,
+    resolve_persons: bool = False,
+    person_index: Optional[Path] = None,
+    dry_run: bool = False,
+    upload_invalid: bool = False,
+    use_caches: bool = True,
+    resume: bool = False,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Process ``items`` (see :func:`discover` / :func:`load_manifest`) on a process pool.
+
+    Each dataset gets ``<workdir>/<name>/jsonld`` and a ``status.json``; the
+    combined report is written to ``<workdir>/batch-report.json`` and returned.
+    Person, hash and validation caches live in ``CACHE_DIR`` and are shared by
+    all workers. With ``resume`` a dataset is not processed again when its BIDS
+    tree is unchanged and its last run completed every requested stage (a
+    dry-run or skipped upload does not count as an upload). With ``dry_run``
+    the upload stage only records the cost plan; no token is needed.
+    """
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    items = [dict(i) for i in items]
+    _unique_names(items)
+    for item in items:
+        if answers and not item.get("answers"):
+            item["answers"] = str(answers)
+    opts = {
+        "workdir": str(workdir), "stages": tuple(stages), "space": space, "repo_iri": repo_iri,
+        "token": token or os.getenv("EBRAINS_TOKEN"), "resolve_persons": resolve_persons,
+        "person_index": str(person_index) if person_index else None, "dry_run": dry_run,
+        "upload_invalid": upload_invalid, "use_caches": use_caches,
+    }
+
+    results: Dict[str, Dict[str, Any]] = {}
+    todo = []
+    for item in items:
+        prev = _previous(workdir, item, opts) if resume else None
+        if prev:
+            prev["resumed"] = True
+            results[item["name"]] = prev
+            if on_result:
+                on_result(prev)
+        else:
+            todo.append(item)
+
+    t0 = time.perf_counter()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    if workers == 1:
+        for item in todo:
+            results[item["name"]] = res = process_dataset(item, opts)
+            if on_result:
+                on_result(res)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(process_dataset, item, opts): item for item in todo}
+            for fut in as_completed(futures):
+                item = futures[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:  # worker died
+                    res = {"name": item["name"], "bids": item["bids"], "status": "failed",
+                           "error": f"{type(e).__name__}: {e}", "stages": {}}
+                results[item["name"]] = res
+                if on_result:
+                    on_result(res)
+
+    datasets = [results[i["name"]] for i in items]
+    counts: Dict[str, int] = {}
+    for d in datasets:
+        counts[d["status"]] = counts.get(d["status"], 0) + 1
+    report = {
+        "workdir": str(workdir),
+        "workers": workers,
+        "stages": list(stages),
+        "wall_s": round(time.perf_counter() - t0, 3),
+        "counts": counts,
+        "datasets": datasets,
+    }
+    write_json(workdir / REPORT_NAME, report)
+    return report
@@ -0,0 +1,222 @@
+from __future__ import annotations
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+import csv, hashlib, uuid
+
+from .config import OM_VOCAB, OM_CORE
+from .utils import local_name, sniff_type, read_text, write_json
+from .refs import ReferenceIndex
+from . import jsonio, profiling, progress
+
+LEVELS = ("modality", "session", "subject")
+MANIFEST_NAME = "_file_manifest.tsv"
+
+
+def _kgid() -> str:
+    return f"https://kg.ebrains.eu/api/instances/{uuid.uuid4()}"
+
+
+def _rel_path(iri: Any) -> Optional[PurePosixPath]:
+    # BIDS-relative path from the first sub-* component; None for dataset-level files
+    if not isinstance(iri, str):
+        return None
+    parts = PurePosixPath(unquote(urlparse(iri).path)).parts
+    for i, p in enumerate(parts):
+        if p.startswith("sub-"):
+            return PurePosixPath(*parts[i:])
+    return None
+
+
+def _bundle_key(rel: PurePosixPath, by: str) -> Optional[str]:
+    dirs = rel.parts[:-1]
+    if not dirs:
+        return None
+    if by == "subject":
+        return dirs[0]
+    if by == "session":
+        return "/".join(dirs[:2]) if len(dirs) > 1 and dirs[1].startswith("ses-") else dirs[0]
+    return "/".join(dirs)
+
+
+def _first_hash(obj: dict) -> Tuple[str, str]:
+    h = obj.get("hash")
+    if isinstance(h, list):
+        h = h[0] if h else None
+    if isinstance(h, dict):
+        return h.get("algorithm", ""), h.get("digest", "")
+    return "", ""
+
+
+def _size(obj: dict) -> Optional[int]:
+    v = (obj.get("storageSize") or {}).get("value")
+    return v if isinstance(v, int) else None
+
+
+_MANIFEST_HEADER = ["bundle", "name", "path", "size", "algorithm", "digest"]
+
+
+def _read_manifest(path: Path) -> Dict[str, List[List[Any]]]:
+    # rows of an earlier run, by bundle @id (file order kept)
+    out: Dict[str, List[List[Any]]] = {}
+    try:
+        with open(path, newline="") as fh:
+            rows = list(csv.reader(fh, delimiter="\t"))
+    except FileNotFoundError:
+        return out
+    for row in rows[1:]:
+        if len(row) == len(_MANIFEST_HEADER):
+            size = int(row[3]) if row[3].isdigit() else ""
+            out.setdefault(row[0], []).append([row[0], row[1], row[2], size, row[4], row[5]])
+    return out
+
+
+def bundle_files(jsonld_dir: Path, by: str = "modality", min_files: int = 1) -> Dict[str, int]:
+    """Fold File nodes into one FileBundle per subject, session or modality directory.
+
+    Dataset-level files (outside ``sub-*``) and bundles with fewer than
+    ``min_files`` members are left alone. Each bundle gets the summed
+    ``storageSize``, a shared ``format`` when its files agree, and as
+    ``hash`` the SHA-256 of its file manifest (path, size and per-file hash,
+    one line per file), which is written to ``_file_manifest.tsv`` next to
+    the JSON-LD. Rows from an earlier run are kept and merged by bundle
+    ``@id``, so re-bundling (more files, a coarser level) extends a bundle's
+    manifest and hash instead of replacing them; bundles of a finer level
+    are folded into the coarser one even when no File nodes are left. Links
+    to removed File and sub-bundle nodes are pointed at the new bundle.
+    Returns counts of files folded, bundles written and nodes removed.
+    """
+    if by not in LEVELS:
+        raise ValueError(f"Unknown bundle level {by!r}; expected one of {LEVELS}")
+    files: List[Tuple[Path, dict]] = []
+    bundles: Dict[str, Tuple[Path, dict]] = {}
+    others: List[Path] = []
+    texts: Dict[Path, str] = {}
+
+    # only File/FileBundle nodes are parsed; the rest is sniffed
+    for fp in jsonld_dir.glob("*.jsonld"):
+        try:
+            text = read_text(fp)
+        except Exception:
+            continue
+        t = sniff_type(text)
+        if t is None or t in ("File", "FileBundle"):
+            try:
+                with profiling.stage("json-parse"):
+                    obj = jsonio.loads(text)
+            except Exception:
+                continue
+            t = obj.get("@type")
+            if isinstance(t, list): t = t[-1]
+            if isinstance(t, str): t = local_name(t)
+            if t == "File":
+                files.append((fp, obj))
+                continue
+            if t == "FileBundle" and isinstance(obj.get("name"), str):
+                bundles[obj["name"]] = (fp, obj)
+        texts[fp] = text
+        others.append(fp)
+
+    groups: Dict[str, List[Tuple[Path, dict, PurePosixPath]]] = {}
+    for fp, obj in files:
+        rel = _rel_path(obj.get("IRI"))
+        key = _bundle_key(rel, by) if rel else None
+        if key is not None:
+            groups.setdefault(key, []).append((fp, obj, rel))
+    # bundles of a finer level (sub-01/anat when bundling by subject) whose files all move up
+    sub_bundles: Dict[str, List[Tuple[Path, dict]]] = {}
+    for name, (fp, obj) in bundles.items():
+        key = _bundle_key(PurePosixPath(name) / "_", by) if name.startswith("sub-") else None
+        if key is not None and key != name and "@id" in obj:
+            sub_bundles.setdefault(key, []).append((fp, obj))
+    manifest = _read_manifest(jsonld_dir / MANIFEST_NAME)
+    groups = {
+        k: groups.get(k, []) for k in set(groups) | set(sub_bundles)
+        if len(groups.get(k, [])) + sum(len(manifest.get(sub["@id"], [])) for _, sub in sub_bundles.get(k, []))
+        >= max(min_files, 1)
+    }
+
+    mapping: Dict[str, str] = {}
+    removed: List[Path] = []
+    n_files = 0
+    progress.report("bundle", total=len(groups), unit="bundles")
+    for n, (key, members) in enumerate(sorted(groups.items())):
+        progress.report(done=n)
+        subs = sorted(sub_bundles.get(key, []), key=lambda s: s[1]["name"])
+        if key in bundles:
+            bfp, bundle = bundles[key]
+        else:
+            parent = bundles.get(str(PurePosixPath(key).parent))
+            part_of = members[0][1].get("fileRepository") if members else subs[0][1].get("isPartOf")
+            bundle = {
+                "@context": {"@vocab": OM_VOCAB},
+                "@id": _kgid(),
+                "@type": f"{OM_CORE}FileBundle",
+                "contentDescription": f"File bundle created for {key}",
+                "name": key,
+                "isPartOf": {"@id": parent[1]["@id"]} if parent else part_of,
+            }
+            bfp = jsonld_dir / f"file_bundle_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}.jsonld"
+            others.append(bfp)
+
+        # files folded in by earlier runs (this bundle's and its sub-bundles' manifest rows) plus the new ones
+        rows: Dict[str, List[Any]] = {}
+        for bid in [bundle["@id"]] + [sub["@id"] for _, sub in subs]:
+            for row in manifest.pop(bid, []):
+                rows[row[2]] = [bundle["@id"], key] + row[2:]
+        formats = set()
+        if rows:
+            fmt = bundle.get("format")
+            formats.add(fmt.get("@id") if isinstance(fmt, dict) else None)
+        for fp, obj, rel in members:
+            algo, digest = _first_hash(obj)
+            size = _size(obj)
+            fmt = obj.get("format")
+            formats.add(fmt.get("@id") if isinstance(fmt, dict) else None)
+            rows[str(rel)] = [bundle["@id"], key, str(rel), size if size is not None else "", algo, digest]
+            if "@id" in obj:
+                mapping[obj["@id"]] = bundle["@id"]
+            removed.append(fp)
+        n_files += len(members)
+        rows = dict(sorted(rows.items()))
+        manifest[bundle["@id"]] = list(rows.values())
+        lines = [f"{path}\t{size}\t{algo}\t{digest}" for _, _, path, size, algo, digest in rows.values()]
+        sizes = [size if isinstance(size, int) else None for _, _, _, size, _, _ in rows.values()]
+
+        if None not in sizes:
+            bundle["storageSize"] = {
+                "@type": f"{OM_CORE}QuantitativeValue",
+                "unit": {"@id": "https://openminds.ebrains.eu/instances/unitOfMeasurement/byte"},
+                "value": sum(sizes),
+            }
+        if len(formats) == 1 and None not in formats:
+            bundle["format"] = {"@id": formats.pop()}
+        else:
+            bundle.pop("format", None)
+        bundle["hash"] = {
+            "@type": f"{OM_CORE}Hash",
+            "algorithm": "SHA-256",
+            "digest": hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest(),
+        }
+        desc = str(bundle.get("contentDescription") or f"File bundle created for {key}").split(" (", 1)[0]
+        bundle["contentDescription"] = f"{desc} ({len(rows)} files; hash is the SHA-256 of {MANIFEST_NAME})"
+        write_json(bfp, bundle)
+        texts.pop(bfp, None)
+
+        for sfp, sub in subs:
+            mapping[sub["@id"]] = bundle["@id"]
+            removed.append(sfp)
+    progress.report(done=len(groups))
+
+    if mapping:
+        gone = set(removed)
+        ReferenceIndex.build([fp for fp in others if fp not in gone], targets=set(mapping), texts=texts).rewrite(mapping)
+    for fp in removed:
+        fp.unlink(missing_ok=True)
+    if manifest:
+        with open(jsonld_dir / MANIFEST_NAME, "w", newline="") as fh:
+            w = csv.writer(fh, delimiter="\t", lineterminator="\n")
+            w.writerow(_MANIFEST_HEADER)
+            for bundle_rows in manifest.values():
+                w.writerows(bundle_rows)
+    return {"files": n_files, "bundles": len(groups), "nodes_removed": len(removed)}
@@ -0,0 +1,155 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+from contextlib import contextmanager
+import os, sqlite3, time, threading
+
+from .config import CACHE_DIR, PERSON_CACHE_TTL, PERSON_CACHE_NEGATIVE_TTL
+from . import jsonio
+
+
+class _SqliteCache:
+    """One SQLite file under ``CACHE_DIR``; safe to share between threads and processes."""
+
+    FILENAME = ""
+    SCHEMA = ""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else Path(CACHE_DIR) / self.FILENAME
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+
+class PersonCache(_SqliteCache):
+    """On-disk cache of person resolution results (shared by CLI and Streamlit).
+
+    A stored ``None`` is a negative result ("no match in the KG") and expires
+    after ``negative_ttl`` rather than ``ttl``.
+    """
+
+    FILENAME = "persons.sqlite"
+    SCHEMA = "CREATE TABLE IF NOT EXISTS persons (key TEXT PRIMARY KEY, iri TEXT, ts REAL NOT NULL)"
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl: float = PERSON_CACHE_TTL,
+        negative_ttl: float = PERSON_CACHE_NEGATIVE_TTL,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        super().__init__(path)
+
+    def get(self, key: str) -> Tuple[bool, Optional[str]]:
+        with self._lock, self._connect() as con:
+            row = con.execute("SELECT iri, ts FROM persons WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False, None
+        iri, ts = row
+        ttl = self.ttl if iri else self.negative_ttl
+        if ttl <= 0 or time.time() - ts > ttl:
+            return False, None
+        return True, iri
+
+    def put(self, key: str, iri: Optional[str]) -> None:
+        with self._lock, self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO persons (key, iri, ts) VALUES (?, ?, ?)",
+                (key, iri, time.time()),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as con:
+            con.execute("DELETE FROM persons")
+
+    def prune(self) -> int:
+        now = time.time()
+        with self._lock, self._connect() as con:
+            cur = con.execute(
+                "DELETE FROM persons WHERE (iri IS NOT NULL AND ts < ?) OR (iri IS NULL AND ts < ?)",
+                (now - self.ttl, now - self.negative_ttl),
+            )
+            return cur.rowcount
+
+
+class HashCache(_SqliteCache):
+    """File digests keyed on ``(path, size, mtime)``; a changed file is simply a miss."""
+
+    FILENAME = "hashes.sqlite"
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS hashes ("
+        " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL)"
+    )
+
+    def get(self, path: str) -> Optional[Tuple[str, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock, self._connect() as con:
+            row = con.execute(
+                "SELECT digest FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (os.path.abspath(path), st.st_size, st.st_mtime_ns),
+            ).fetchone()
+        return (row[0], st.st_size) if row else None
+
+    def put(self, path: str, digest: str, size: int, st: Optional[os.stat_result] = None) -> None:
+        """Store ``digest``; pass the ``os.stat`` taken *before* hashing to avoid racing writers."""
+        st = st or os.stat(path)
+        if st.st_size != size:
+            return
+        with self._lock, self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO hashes (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(path), size, st.st_mtime_ns, digest),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as con:
+            con.execute("DELETE FROM hashes")
+
+
+class ValidationCache(_SqliteCache):
+    """Validation results keyed on a digest of the JSON-LD directory content."""
+
+    FILENAME = "validation.sqlite"
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS validations ("
+        " key TEXT PRIMARY KEY, mode TEXT, errors TEXT NOT NULL, ts REAL NOT NULL)"
+    )
+
+    def get(self, key: str) -> Optional[Tuple[str, List[Any]]]:
+        with self._lock, self._connect() as con:
+            row = con.execute("SELECT mode, errors FROM validations WHERE key = ?", (key,)).fetchone()
+        return (row[0], jsonio.loads(row[1])) if row else None
+
+    def put(self, key: str, mode: str, errors: List[Any]) -> None:
+        with self._lock, self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO validations (key, mode, errors, ts) VALUES (?, ?, ?, ?)",
+                (key, mode, jsonio.dumps(errors, jsonio.COMPACT).decode("utf-8"), time.time()),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as con:
+            con.execute("DELETE FROM validations")
+
+
+_DEFAULT: Optional[PersonCache] = None
+
+def default_person_cache() -> PersonCache:
+    global _DEFAULT
+    if _DEFAULT is None:
+        _DEFAULT = PersonCache()
+    return _DEFAULT
@@ -2,7 +2,19 @@ from __future__ import annotations
 import argparse, sys, json, logging
 import os
 from pathlib import Path
-from .core import convert_bids, scan_missing, patch_openminds, upload_to_kg, group_subjects, validate_jsonld
+from .core import (convert_bids, scan_missing, patch_openminds, upload_to_kg, group_subjects, validate_jsonld,
+                   index_persons, import_jsonld, export_jsonld, batch_process, bundle_files, plan_upload,
+                   estimate_upload, sample_scan, sample_validate)
+from .batch import STAGES as BATCH_STAGES
+from .cache import PersonCache
+from .person_index import SIMILARITY_THRESHOLD
+from .profiling import profile
+from . import jsonio
+from .reconcile import print_plan
+from .estimate import print_estimate
+from .sampling import print_sample_report
+from .utils import write_json
+from .instrumentation import HttpStats, TraceLog, add_observer, remove_observer
 
 def parse_sets(items):
     result = {}
@@ -20,22 +32,53 @@ def parse_sets(items):
 def main(argv=None):
     p = argparse.ArgumentParser(prog="bids2ebrains", description="BIDS - openMINDS - EBRAINS KG")
     p.add_argument("-v", "--verbose", action="store_true", help="Verbose logging")
+    p.add_argument("--profile", action="store_true",
+                   help="Print per-stage timings, file/hash/HTTP counters and peak memory to stderr")
+    p.add_argument("--metrics-json", type=Path, help="Write the profiling metrics to this JSON file")
+    p.add_argument("--trace-memory", action="store_true",
+                   help="With --profile, also trace peak Python heap (slower)")
+    p.add_argument("--http-trace", type=Path, help="Append one JSON line per KG request to this file")
+    p.add_argument("--json-style", choices=jsonio.STYLES,
+                   help="Layout of written JSON-LD: 'pretty' (indent=2, default) or 'compact' (sorted keys, "
+                        "no whitespace); also BIDS2EBRAINS_JSON_STYLE")
     sub = p.add_subparsers(dest="cmd", required=True)
 
     # convert
     pc = sub.add_parser("convert", help="Convert BIDS - openMINDS JSON-LD")
-    pc.add_argument("--bids", required=True, type=Path)
-    pc.add_argument("--out",  required=True, type=Path)
+    pc.add_argument("--bids", required=True, type=Path, help="BIDS dataset directory, or a zip/tar(.gz) archive of one")
+    pc.add_argument("--out", type=Path, help="Write one .jsonld file per node into this folder")
+    pc.add_argument("--pack", type=Path, help="Also/instead write all nodes into one packed graph file "
+                         "(output only: export it before patch/scan/upload)")
+
+    # import / export between the per-file layout and a packed graph file
+    pim = sub.add_parser("import", help="Pack a folder of .jsonld files into one graph file")
+    pim.add_argument("--jsonld", required=True, type=Path)
+    pim.add_argument("--pack", required=True, type=Path)
+    pex = sub.add_parser("export", help="Unpack a graph file into one .jsonld file per node")
+    pex.add_argument("--pack", required=True, type=Path)
+    pex.add_argument("--jsonld", required=True, type=Path)
 
     # scan
     ps = sub.add_parser("scan", help="Scan JSON-LD for missing mandatory fields")
     ps.add_argument("--jsonld", required=True, type=Path)
+    ps.add_argument("--sample", type=int, metavar="N",
+                    help="Quick preview: scan N random files per type and estimate the missing-field counts")
+    ps.add_argument("--seed", type=int, default=0, help="--sample: random seed")
 
     # patch
     pp = sub.add_parser("patch", help="Patch missing fields (answers + repo)")
     pp.add_argument("--resolve-persons", action="store_true",
                 help="Try to match existing Person entries in EBRAINS (fairgraph) before creating new ones.")
     pp.add_argument("--token", help="EBRAINS token for fairgraph lookups (or set EBRAINS_TOKEN env var)")
+    pp.add_argument("--person-cache-ttl", type=float,
+                help="Seconds a cached person match is reused (default: BIDS2EBRAINS_PERSON_TTL or 7 days).")
+    pp.add_argument("--person-index", type=Path,
+                help="Match custodians offline against a local Person index (see index-persons).")
+    pp.add_argument("--match-threshold", type=float, default=SIMILARITY_THRESHOLD,
+                help="Minimum similarity (0-1) of both given and family name to accept an existing Person "
+                     f"(default: {SIMILARITY_THRESHOLD:.2f}).")
+    pp.add_argument("--no-person-cache", dest="use_person_cache", action="store_false",
+                help="Always query the KG instead of the on-disk person cache.")
 
     pp.add_argument("--jsonld", required=True, type=Path)
     pp.add_argument("--repo-iri", default="", help="Optional. Only used for error handling.")
@@ -45,32 +88,155 @@ def main(argv=None):
     pp.add_argument("--answers-file", type=Path)
     pp.add_argument("--interactive", action="store_true")
 
+    # index-persons
+    pi = sub.add_parser("index-persons", help="Snapshot KG Person entries into a local index for offline matching")
+    pi.add_argument("--out", required=True, type=Path)
+    pi.add_argument("--token", help="EBRAINS token (or set EBRAINS_TOKEN env var)")
+    pi.add_argument("--scope", default="released", choices=["released", "in progress", "any"])
+    pi.add_argument("--space", help="Restrict the snapshot to one KG space")
+
     # group
     pg = sub.add_parser("group", help="Convert Subject/SubjectState to GroupSubject/SubjectGroupState")
     pg.add_argument("--jsonld", required=True, type=Path)
     pg.add_argument("--label", help="Label for the group (default: cohort-1)")
     pg.add_argument("--keep-individuals", action="store_true", help="Keep original Subject/SubjectState files")
+    pg.add_argument("--by", help="participants.tsv column to partition subjects on (one group per value)")
+    pg.add_argument("--participants", type=Path, help="Path to participants.tsv (required with --by)")
+
+    # bundle
+    pbu = sub.add_parser("bundle", help="Fold File nodes into one FileBundle per subject/session/modality")
+    pbu.add_argument("--jsonld", required=True, type=Path)
+    pbu.add_argument("--by", choices=["modality", "session", "subject"], default="modality",
+                     help="Directory level to bundle at (default: modality, e.g. sub-01/ses-1/anat)")
+    pbu.add_argument("--min-files", type=int, default=1, help="Leave directories with fewer files unbundled")
 
     # validate
     pv = sub.add_parser("validate", help="Validate JSON-LD against openMINDS schema")
     pv.add_argument("--jsonld", required=True, type=Path)
+    pv.add_argument("--sample", type=int, metavar="N",
+                    help="Quick preview: validate N random files per type and estimate the error counts")
+    pv.add_argument("--seed", type=int, default=0, help="--sample: random seed")
+
+    # watch
+    pw = sub.add_parser("watch", help="Rescan and revalidate changed JSON-LD files, with a live summary")
+    pw.add_argument("--jsonld", required=True, type=Path)
+    pw.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify")
+    pw.add_argument("--interval", type=float, default=0.5, help="Polling interval in seconds (default: 0.5)")
+    pw.add_argument("--json", action="store_true", help="Print one JSON summary line per update")
 
     # upload
     pu = sub.add_parser("upload", help="Upload JSON-LD to EBRAINS KG")
     pu.add_argument("--jsonld", required=True, type=Path)
     pu.add_argument("--space", required=True)
     pu.add_argument("--token")
+    pu.add_argument("--token-file", type=Path,
+                    help="File holding the token; re-read when the KG rejects the current one (long uploads)")
     pu.add_argument("--no-overwrite", dest="overwrite", action="store_false")
     pu.add_argument("--dry-run", action="store_true")
     pu.add_argument("--keep-controlled", dest="skip_controlled", action="store_false")
+    pu.add_argument("--latency", type=float, help="--dry-run: seconds per KG request for the time estimate")
+    pu.add_argument("--latency-from", type=Path, metavar="TRACE",
+                    help="--dry-run: take the per-request latency from an earlier --http-trace file")
+    pu.add_argument("--measure", action="store_true", help="--dry-run: probe the KG for the per-request latency")
+    pu.add_argument("--estimate-out", type=Path, help="--dry-run: also write the cost plan as JSON")
+    pu.add_argument("--min-concurrency", type=int,
+                    help="Lower bound of the adaptive request concurrency (default: $BIDS2EBRAINS_KG_MIN_CONCURRENCY or 1)")
+    pu.add_argument("--max-concurrency", type=int,
+                    help="Upper bound of the adaptive request concurrency (default: $BIDS2EBRAINS_KG_MAX_CONCURRENCY or 8)")
+    pu.add_argument("--reconcile", action="store_true",
+                    help="Fetch the current KG instances first; only create new and update changed nodes")
+    pu.add_argument("--plan", nargs="?", const="-", metavar="FILE",
+                    help="Only print what --reconcile would create/update/leave alone (and write it as JSON to FILE)")
+
+    # batch
+    pb = sub.add_parser("batch", help="Run convert/patch/validate/upload over many BIDS datasets")
+    pb.add_argument("--datasets", required=True, type=Path,
+                    help="Directory of BIDS datasets, a single dataset, or a YAML/JSON manifest "
+                         "(entries: bids, answers, space, repo_iri, name)")
+    pb.add_argument("--workdir", required=True, type=Path, help="Per-dataset outputs and batch-report.json")
+    pb.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    pb.add_argument("--stages", default=",".join(BATCH_STAGES), help="Comma-separated subset of stages")
+    pb.add_argument("--space", help="Default KG space (upload is skipped for datasets without one)")
+    pb.add_argument("--answers-file", type=Path, help="Default answers file for datasets without their own")
+    pb.add_argument("--repo-iri", default="")
+    pb.add_argument("--token")
+    pb.add_argument("--resolve-persons", action="store_true")
+    pb.add_argument("--person-index", type=Path)
+    pb.add_argument("--dry-run", action="store_true", help="Do not send anything to the KG")
+    pb.add_argument("--upload-invalid", action="store_true", help="Upload datasets even with validation errors")
+    pb.add_argument("--no-cache", dest="use_caches", action="store_false",
+                    help="Do not use the shared person/hash/validation caches")
+    pb.add_argument("--resume", action="store_true",
+                    help="Skip datasets whose last run succeeded and whose BIDS tree is unchanged")
+
+    # serve
+    ps = sub.add_parser("serve", help="Run a local job service with warm imports and caches")
+    ps.add_argument("--host", default="127.0.0.1")
+    ps.add_argument("--port", type=int, default=8766)
+    ps.add_argument("--socket", type=Path, help="Listen on this Unix socket instead of TCP")
+    ps.add_argument("--secret-file", type=Path,
+                    help="TCP: where to write the bearer secret clients must send "
+                         "(default: <cache dir>/service.secret, owner-readable only)")
+    ps.add_argument("--workers", type=int, default=2, help="Concurrent jobs")
+    ps.add_argument("--no-cache", dest="use_caches", action="store_false",
+                    help="Do not use the shared person/hash/validation caches")
 
     args = p.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(levelname)s %(name)s: %(message)s")
+    if args.json_style:
+        jsonio.set_style(args.json_style)
+
+    observers = []
+    if args.http_trace:
+        observers.append(TraceLog(args.http_trace))
+    stats = HttpStats() if (args.profile or args.metrics_json) else None
+    if stats:
+        observers.append(stats)
+    for o in observers:
+        add_observer(o)
+    try:
+        if not (args.profile or args.metrics_json):
+            return _run(args)
+        with profile(trace_memory=args.trace_memory) as prof:
+            rc = _run(args)
+    finally:
+        for o in observers:
+            remove_observer(o)
+            if isinstance(o, TraceLog):
+                o.close()
+    if args.profile:
+        print(prof.summary(), file=sys.stderr)
+        if stats.endpoints:
+            print(stats.summary(), file=sys.stderr)
+    if args.metrics_json:
+        metrics = prof.as_dict()
+        metrics["http"]["endpoints"] = stats.as_dict()
+        args.metrics_json.write_text(json.dumps(metrics, indent=2))
+    return rc
 
+
+def _run(args):
     if args.cmd == "convert":
-        convert_bids(args.bids, args.out)
+        if not args.out and not args.pack:
+            raise SystemExit("convert needs --out <DIR> and/or --pack <FILE>")
+        convert_bids(args.bids, args.out, pack=args.pack)
+        return 0
+
+    if args.cmd == "import":
+        n = import_jsonld(args.jsonld, args.pack)
+        print(f"Packed {n} nodes into {args.pack}")
+        return 0
+
+    if args.cmd == "export":
+        n = export_jsonld(args.pack, args.jsonld)
+        print(f"Wrote {n} .jsonld files to {args.jsonld}")
         return 0
 
     if args.cmd == "scan":
+        if args.sample:
+            print(json.dumps(sample_scan(args.jsonld, args.sample, seed=args.seed), indent=2))
+            return 0
         report, prompts = scan_missing(args.jsonld)
         missing = {str(fp): miss for fp, miss in report.items()}
         print(json.dumps({"missing": missing, "prompts": prompts}, indent=2))
@@ -78,6 +244,9 @@ def main(argv=None):
 
     if args.cmd == "patch":
         answers = parse_sets(args.set)
+        person_cache = None
+        if args.use_person_cache and args.person_cache_ttl is not None:
+            person_cache = PersonCache(ttl=args.person_cache_ttl)
         patch_openminds(
         args.jsonld,
         repo_iri=args.repo_iri,
@@ -87,14 +256,40 @@ def main(argv=None):
         interactive=args.interactive,
         resolve_persons=args.resolve_persons,
         token=(args.token or os.getenv("EBRAINS_TOKEN")),
+        person_cache=person_cache,
+        use_person_cache=args.use_person_cache,
+        person_index=args.person_index,
+        match_threshold=args.match_threshold,
     )
         return 0
+
+    if args.cmd == "index-persons":
+        n = index_persons(args.out, token=(args.token or os.getenv("EBRAINS_TOKEN")),
+                          scope=args.scope, space=args.space)
+        print(f"Indexed {n} persons into {args.out}")
+        return 0
     
     if args.cmd == "group":
-        group_subjects(args.jsonld, label=args.label, keep_individuals=args.keep_individuals)
+        if args.by and not args.participants:
+            raise SystemExit("--by needs --participants <BIDS_DIR>/participants.tsv")
+        try:
+            group_subjects(args.jsonld, label=args.label, keep_individuals=args.keep_individuals,
+                           by=args.by, participants=args.participants)
+        except ValueError as e:
+            raise SystemExit(f"ERROR: {e}")
         return 0
     
+    if args.cmd == "bundle":
+        res = bundle_files(args.jsonld, by=args.by, min_files=args.min_files)
+        print(f"Folded {res['files']} File node(s) into {res['bundles']} FileBundle(s); "
+              f"{res['nodes_removed']} node(s) removed")
+        return 0
+
     if args.cmd == "validate":
+        if args.sample:
+            rep = sample_validate(args.jsonld, args.sample, seed=args.seed)
+            print_sample_report(rep)
+            return 1 if rep["estimates"] else 0
         errs = validate_jsonld(args.jsonld)
         if not errs:
             print("OK: no schema validation errors")
@@ -103,18 +298,80 @@ def main(argv=None):
             print(f"[invalid] {fp}: {msg}")
         return 1
 
+    if args.cmd == "watch":
+        from .watch import watch, render
+        emit = (lambda s: print(json.dumps(s), flush=True)) if args.json else render
+        watch(args.jsonld, emit, poll=args.poll, interval=args.interval)
+        return 0
+
     if args.cmd == "upload":
         try:
-            upload_to_kg(
+            if args.plan:
+                plan = plan_upload(args.jsonld, token=args.token, skip_controlled_terms=args.skip_controlled,
+                                   space=args.space, token_file=args.token_file)
+                print_plan(plan)
+                if args.plan != "-":
+                    write_json(args.plan, plan)
+                return 0
+            if args.dry_run:
+                est = estimate_upload(
+                    args.jsonld, skip_controlled_terms=args.skip_controlled, latency_s=args.latency,
+                    latency_trace=args.latency_from, measure=args.measure, token=args.token,
+                    min_concurrency=args.min_concurrency, max_concurrency=args.max_concurrency,
+                    token_file=args.token_file, overwrite=args.overwrite,
+                )
+                print_estimate(est)
+                if args.estimate_out:
+                    write_json(args.estimate_out, est)
+                return 0
+            res = upload_to_kg(
                 args.jsonld, space=args.space, token=args.token,
                 overwrite=args.overwrite, dry_run=args.dry_run,
-                skip_controlled_terms=not args.keep_controlled
+                skip_controlled_terms=args.skip_controlled, reconcile=args.reconcile,
+                min_concurrency=args.min_concurrency, max_concurrency=args.max_concurrency,
+                token_file=args.token_file,
             )
-            return 0
+            print(f"{res['uploaded']} uploaded, {res['unchanged']} unchanged, {res['skipped']} skipped, "
+                  f"{len(res['failed'])} failed")
+            conc = res.get("concurrency")
+            if conc:
+                print(f"concurrency: {conc['floor']}-{conc['ceiling']}, peak {conc['peak']}, "
+                      f"final {conc['limit']} after {conc['changes']} change(s)")
+            return 1 if res["failed"] else 0
         except Exception as e:
             logging.error("Upload failed: %s", e)
             print(f"ERROR: {e}", file=sys.stderr)
             return 1
 
+    if args.cmd == "batch":
+        stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+        unknown = set(stages) - set(BATCH_STAGES)
+        if unknown:
+            raise SystemExit(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+        def show(res):
+            failed = [n for n, s in res.get("stages", {}).items() if s.get("status") not in ("ok", "skipped")]
+            note = " (resumed)" if res.get("resumed") else ""
+            detail = f" [{', '.join(failed)}]" if failed else ""
+            print(f"{res['status']:<8}{res['name']}{detail}{note}", flush=True)
+
+        report = batch_process(
+            args.datasets, args.workdir, workers=args.workers, stages=stages, space=args.space,
+            answers=args.answers_file, repo_iri=args.repo_iri, token=args.token,
+            resolve_persons=args.resolve_persons, person_index=args.person_index, dry_run=args.dry_run,
+            upload_invalid=args.upload_invalid, use_caches=args.use_caches, resume=args.resume,
+            on_result=show,
+        )
+        counts = ", ".join(f"{v} {k}" for k, v in sorted(report["counts"].items()))
+        print(f"{len(report['datasets'])} datasets in {report['wall_s']:.1f}s: {counts or 'none'}")
+        print(f"Report: {args.workdir / 'batch-report.json'}")
+        return 0 if set(report["counts"]) <= {"ok"} else 1
+
+    if args.cmd == "serve":
+        from .service import serve
+        serve(host=args.host, port=args.port, socket_path=args.socket, workers=args.workers,
+              use_caches=args.use_caches, secret_file=args.secret_file)
+        return 0
+
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -24,3 +24,20 @@ def _detect_openminds_namespaces():
 OM_VOCAB, OM_CORE = _detect_openminds_namespaces()
 
 KG_BASE = os.getenv("EBRAINS_KG_BASE", "https://core.kg.ebrains.eu/v3/instances")
+
+CACHE_DIR = os.getenv(
+    "BIDS2EBRAINS_CACHE_DIR",
+    os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "bids2ebrains"),
+)
+PERSON_CACHE_TTL = float(os.getenv("BIDS2EBRAINS_PERSON_TTL", 7 * 24 * 3600))
+PERSON_CACHE_NEGATIVE_TTL = float(os.getenv("BIDS2EBRAINS_PERSON_NEGATIVE_TTL", 24 * 3600))
+
+# Adaptive (AIMD) concurrency bounds for KG uploads and person lookups
+KG_MIN_CONCURRENCY = int(os.getenv("BIDS2EBRAINS_KG_MIN_CONCURRENCY", "1"))
+KG_MAX_CONCURRENCY = int(os.getenv("BIDS2EBRAINS_KG_MAX_CONCURRENCY", "8"))
+
+# OAuth2 token endpoint for EBRAINS_REFRESH_TOKEN (point at a local stub for tests)
+TOKEN_ENDPOINT = os.getenv(
+    "BIDS2EBRAINS_TOKEN_ENDPOINT", "https://iam.ebrains.eu/auth/realms/hbp/protocol/openid-connect/token"
+)
+TOKEN_CLIENT_ID = os.getenv("EBRAINS_CLIENT_ID", "kg")
@@ -1,17 +1,74 @@
 from __future__ import annotations
 from pathlib import Path
+from typing import Iterator, Optional, Tuple
 import bids2openminds.converter as bm
-import uuid
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+import logging, uuid
+
+from . import archive, progress, vfs
+from .packstore import write_pack
+from .utils import write_json
+
+log = logging.getLogger(__name__)
 
 def _kgid() -> str:
     return f"https://kg.ebrains.eu/api/instances/{uuid.uuid4()}"
 
+def _placeholder_hashes(collection) -> None:
+    # bids2openminds MD5s every file; for metadata-only placeholders that would hash the sparse
+    # stand-in, so take the real MD5 from the archive (one pass, shared with patch) or leave it out.
+    unhashed = 0
+    for obj in collection:
+        iri = getattr(obj, "iri", None)
+        if type(obj).__name__ != "File" or iri is None or obj.hashes is None:
+            continue
+        path = url2pathname(urlparse(str(iri.value)).path)
+        entry = archive.placeholder(path)
+        if not entry:
+            continue
+        res = archive.placeholder_digest(path, entry, "md5")
+        if res:
+            obj.hashes = type(obj.hashes)(algorithm="MD5", digest=res[0])
+        else:
+            obj.hashes = None
+            unhashed += 1
+    if unhashed:
+        log.warning("%d placeholder file(s) left without hash: their archive is no longer readable", unhashed)
+
+def _pack_nodes(collection) -> Iterator[Tuple[str, dict]]:
+    # the (file name, node) pairs Collection.save(individual_files=True) would write; we write
+    # them ourselves so --out goes through jsonio like every other JSON this package emits
+    from openminds.base import LinkedNodeEmbedding
+    collection.add(*list(collection))  # pulls in child nodes linked after they were added, as save() does
+    # blank ids were replaced after conversion, so a node can sit in the collection under two keys
+    unique = {node.id: node for node in collection}
+    for _, node in sorted(unique.items()):
+        name = node.uuid if node.id.startswith("http") else node.id[2:]
+        yield f"{name}.jsonld", node.to_jsonld(embed_linked_nodes=LinkedNodeEmbedding.NEVER,
+                                               include_empty_properties=False)
+
 class Converter:
     @staticmethod
-    def convert(bids_root: Path, out_dir: Path) -> None:
-        out_dir.mkdir(exist_ok=True, parents=True)
+    def convert(bids_root: Path, out_dir: Optional[Path] = None, pack: Optional[Path] = None) -> None:
+        """Write one ``.jsonld`` per node into ``out_dir`` and/or all nodes into the ``pack`` file.
+
+        ``bids_root`` may also be a zip or tar archive; it is read without a full extraction.
+        """
+        from_archive = vfs.is_archive(bids_root)
+        if from_archive:
+            bids_root = archive.materialize(bids_root)
+        progress.report("convert", unit="datasets", total=1, message=str(bids_root))
         collection = bm.convert(str(bids_root), save_output=False, multiple_files=True)
         for obj in collection:
             if isinstance(obj.id, str) and obj.id.startswith("_:"):
                 obj.id = _kgid()
-        collection.save(out_dir, individual_files=True)
+        _placeholder_hashes(collection)
+        progress.report(done=1)
+        if out_dir is not None:
+            out_dir = Path(out_dir)
+            out_dir.mkdir(exist_ok=True, parents=True)
+            for name, node in _pack_nodes(collection):
+                write_json(out_dir / name, node)
+        if pack is not None:
+            write_pack(pack, _pack_nodes(collection))
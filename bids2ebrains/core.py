@@ -1,23 +1,53 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 
 from .converter import Converter
-from .scanner import Scanner
+from .scanner import Scanner, ScanReport
 from .patcher import Patcher as _PatcherClass
 from .uploader import Uploader as _UploaderClass
 from .grouper import group_subjects as _group_subjects
+from .bundler import bundle_files as _bundle_files
 from .validator import validate_dir as _validate_dir
+from .cache import PersonCache, HashCache, ValidationCache
+from .person_index import build_person_index, SIMILARITY_THRESHOLD
+from .profiling import stage
+from .packstore import pack_dir, unpack
+from .batch import load_items, run_batch as _run_batch
 
-def group_subjects(jsonld_dir: Path, label: Optional[str] = None, keep_individuals: bool = False) -> None:
-    return _group_subjects(jsonld_dir, label=label, keep_individuals=keep_individuals)
+@stage("group")
+def group_subjects(
+    jsonld_dir: Path,
+    label: Optional[str] = None,
+    keep_individuals: bool = False,
+    by: Optional[str] = None,
+    participants: Optional[Path] = None,
+) -> None:
+    return _group_subjects(
+        jsonld_dir, label=label, keep_individuals=keep_individuals, by=by, participants=participants
+    )
+
+@stage("bundle")
+def bundle_files(jsonld_dir: Path, by: str = "modality", min_files: int = 1) -> Dict[str, int]:
+    return _bundle_files(jsonld_dir, by=by, min_files=min_files)
+
+@stage("convert")
+def convert_bids(bids_root: Path, out_dir: Optional[Path] = None, pack: Optional[Path] = None) -> None:
+    return Converter.convert(bids_root, out_dir, pack=pack)
 
-def convert_bids(bids_root: Path, out_dir: Path) -> None:
-    return Converter.convert(bids_root, out_dir)
+@stage("import")
+def import_jsonld(jsonld_dir: Path, pack: Path) -> int:
+    return pack_dir(jsonld_dir, pack)
 
-def scan_missing(jsonld_dir: Path) -> Tuple[Dict[Path, List[str]], Dict[str, str]]:
+@stage("export")
+def export_jsonld(pack: Path, jsonld_dir: Path) -> int:
+    return unpack(pack, jsonld_dir)
+
+@stage("scan")
+def scan_missing(jsonld_dir: Path) -> Tuple[ScanReport, Dict[str, str]]:
     return Scanner.scan(jsonld_dir)
 
+@stage("patch")
 def patch_openminds(
     jsonld_dir: Path,
     repo_iri: str,
@@ -27,6 +57,11 @@ def patch_openminds(
     interactive: bool = False,
     resolve_persons: bool = False,
     token: Optional[str] = None,
+    person_cache: Optional[PersonCache] = None,
+    use_person_cache: bool = True,
+    person_index: Optional[Path] = None,
+    match_threshold: float = SIMILARITY_THRESHOLD,
+    hash_cache: Optional[HashCache] = None,
 ) -> None:
     return _PatcherClass(jsonld_dir).patch(
         repo_iri=repo_iri,
@@ -36,11 +71,42 @@ def patch_openminds(
         interactive=interactive,
         resolve_persons=resolve_persons,
         token=token,
+        person_cache=person_cache,
+        use_person_cache=use_person_cache,
+        person_index=person_index,
+        match_threshold=match_threshold,
+        hash_cache=hash_cache,
     )
 
-def validate_jsonld(jsonld_dir: Path):
-    return _validate_dir(jsonld_dir)
+@stage("batch")
+def batch_process(source: Path, workdir: Path, **kwargs) -> Dict[str, Any]:
+    """Convert, patch, validate and upload every dataset of a directory or manifest."""
+    return _run_batch(load_items(source), workdir, **kwargs)
+
+@stage("index-persons")
+def index_persons(
+    out: Path,
+    token: Optional[str] = None,
+    scope: str = "released",
+    space: Optional[str] = None,
+) -> int:
+    return build_person_index(out, token=token, scope=scope, space=space)
+
+@stage("validate")
+def validate_jsonld(jsonld_dir: Path, cache: Optional[ValidationCache] = None):
+    return _validate_dir(jsonld_dir, cache=cache)
 
+@stage("scan")
+def sample_scan(jsonld_dir: Path, per_type: int, seed: int = 0) -> Dict[str, Any]:
+    from .sampling import sample_scan as _sample_scan
+    return _sample_scan(jsonld_dir, per_type, seed)
+
+@stage("validate")
+def sample_validate(jsonld_dir: Path, per_type: int, seed: int = 0) -> Dict[str, Any]:
+    from .sampling import sample_validate as _sample_validate
+    return _sample_validate(jsonld_dir, per_type, seed)
+
+@stage("upload")
 def upload_to_kg(
     jsonld_dir: Path,
     space: str,
@@ -48,10 +114,53 @@ def upload_to_kg(
     overwrite: bool = True,
     skip_controlled_terms: bool = True,
     dry_run: bool = False,
-) -> None:
-    return _UploaderClass(space=space, token=token).upload_dir(
+    reconcile: bool = False,
+    min_concurrency: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    token_file: Optional[Path] = None,
+) -> Dict[str, Any]:
+    from .auth import token_provider
+    return _UploaderClass(
+        space=space, token=token, min_concurrency=min_concurrency, max_concurrency=max_concurrency,
+        token_provider=token_provider(token, token_file),
+    ).upload_dir(
         jsonld_dir=jsonld_dir,
         overwrite=overwrite,
         skip_controlled_terms=skip_controlled_terms,
         dry_run=dry_run,
+        reconcile=reconcile,
     )
+
+@stage("estimate")
+def estimate_upload(
+    jsonld_dir: Path,
+    skip_controlled_terms: bool = True,
+    latency_s: Optional[float] = None,
+    latency_trace: Optional[Path] = None,
+    measure: bool = False,
+    token: Optional[str] = None,
+    min_concurrency: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    token_file: Optional[Path] = None,
+    overwrite: bool = True,
+) -> Dict[str, Any]:
+    """Upload cost plan; latency from ``latency_s``, else an ``--http-trace`` file, else a live probe."""
+    from .auth import token_provider
+    from .estimate import estimate_upload as _estimate, latency_from_trace, measure_latency
+    from .uploader import kg_headers
+    source = "configured"
+    if latency_s is None and latency_trace:
+        latency_s, source = latency_from_trace(latency_trace), f"trace {latency_trace}"
+    if latency_s is None and measure:
+        latency_s, source = measure_latency(kg_headers(token_provider(token, token_file).token())), "measured"
+    return _estimate(jsonld_dir, skip_controlled_terms, latency_s, source, min_concurrency, max_concurrency,
+                     overwrite=overwrite)
+
+@stage("plan")
+def plan_upload(jsonld_dir: Path, token: Optional[str] = None, skip_controlled_terms: bool = True,
+                space: Optional[str] = None, token_file: Optional[Path] = None) -> Dict[str, Any]:
+    from .auth import token_provider
+    from .reconcile import plan_upload as _plan_upload
+    from .uploader import KGSession
+    with KGSession(token_provider(token, token_file)) as session:
+        return _plan_upload(jsonld_dir, session, skip_controlled_terms, space=space)
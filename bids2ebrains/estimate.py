@@ -0,0 +1,164 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import os, statistics, sys, time
+
+from .config import KG_BASE, KG_MIN_CONCURRENCY, KG_MAX_CONCURRENCY
+from .refs import iter_refs
+from .utils import local_name, read_json
+from . import jsonio
+from .instrumentation import endpoint_of
+
+DEFAULT_LATENCY_S = float(os.getenv("BIDS2EBRAINS_KG_LATENCY", "0.25"))
+_ZERO_ID = "00000000-0000-0000-0000-000000000000"
+# the uploader's writes: POST /v3/instances and PUT /v3/instances/{id} (not instancesByIds & co.)
+WRITE_ENDPOINTS = (endpoint_of("POST", KG_BASE), endpoint_of("PUT", f"{KG_BASE}/{_ZERO_ID}"))
+
+
+def latency_from_trace(path: Union[str, Path]) -> Optional[float]:
+    """Median seconds of the successful instance writes in an ``--http-trace`` file."""
+    secs = []
+    with open(path) as fh:
+        for line in fh:
+            try:
+                ev = jsonio.loads(line)
+            except ValueError:
+                continue
+            if ev.get("endpoint") in WRITE_ENDPOINTS and isinstance(ev.get("status"), int) \
+                    and ev["status"] < 400:
+                secs.append(ev["seconds"])
+    return statistics.median(secs) if secs else None
+
+
+def measure_latency(headers: dict, samples: int = 3) -> Optional[float]:
+    """Median round trip of a few cheap KG lookups (unknown id, so nothing is transferred)."""
+    import requests
+    secs = []
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        try:
+            requests.get(f"{KG_BASE}/{_ZERO_ID}", headers=headers, timeout=10)
+        except Exception:
+            continue
+        secs.append(time.perf_counter() - t0)
+    return statistics.median(secs) if secs else None
+
+
+def _levels(deps: Dict[str, List[str]]) -> Dict[str, int]:
+    # level = 1 + deepest local dependency; back edges of cycles are ignored
+    level: Dict[str, int] = {}
+    for start in deps:
+        if start in level:
+            continue
+        stack: List[Tuple[str, int]] = [(start, 0)]
+        on_path = set()
+        while stack:
+            node, i = stack.pop()
+            if i == 0:
+                on_path.add(node)
+            children = [d for d in deps.get(node, ()) if d not in on_path]
+            if i < len(children):
+                stack.append((node, i + 1))
+                if children[i] not in level:
+                    stack.append((children[i], 0))
+                continue
+            level[node] = 1 + max((level.get(d, 0) for d in children), default=0)
+            on_path.discard(node)
+    return level
+
+
+def _round_trips(requests: int, floor: int, ceiling: int) -> int:
+    # AIMD ramp without overload: ``limit`` requests per round trip, one more slot each time
+    limit, trips = floor, 0
+    while requests > 0:
+        requests -= limit
+        trips += 1
+        limit = min(ceiling, limit + 1)
+    return trips
+
+
+def estimate_upload(
+    jsonld_dir: Path,
+    skip_controlled_terms: bool = True,
+    latency_s: Optional[float] = None,
+    latency_source: str = "configured",
+    min_concurrency: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    overwrite: bool = True,
+) -> Dict[str, Any]:
+    """Dry-run cost plan: what an upload would send and roughly how long it takes.
+
+    The uploader sends nodes in no particular order, so the wall time is the
+    number of round trips at ``latency_s`` each; requests in flight follow
+    the adaptive limit without overload: ``min_concurrency`` at first, one
+    more per round trip, up to ``max_concurrency``. One request per node
+    when every node is new; with ``overwrite`` each node that already exists
+    costs a POST (409) and a PUT, so the upper bound doubles the requests.
+    The dependency depth is reported for information only.
+    """
+    from .uploader import is_controlled
+
+    # keyed by file, like the uploader sends them: nodes without or with a repeated @id still cost a request
+    by_type: Dict[str, int] = {}
+    sizes: Dict[str, Tuple[str, int]] = {}
+    deps: Dict[str, List[str]] = {}
+    file_of: Dict[str, str] = {}
+    skipped = 0
+    for fp in sorted(Path(jsonld_dir).glob("*.jsonld")):
+        payload = read_json(fp)
+        node_id = payload.get("@id", "")
+        if skip_controlled_terms and is_controlled(node_id):
+            skipped += 1
+            continue
+        t = local_name(str(payload.get("@type", ""))) or "?"
+        by_type[t] = by_type.get(t, 0) + 1
+        sizes[fp.name] = (fp.name, len(jsonio.dumps(payload, jsonio.COMPACT)))
+        deps[fp.name] = [target for _, target in iter_refs(payload) if target != node_id]
+        if node_id:
+            file_of.setdefault(node_id, fp.name)
+    for k in deps:
+        deps[k] = [file_of[d] for d in dict.fromkeys(deps[k]) if d in file_of and file_of[d] != k]
+
+    level = _levels(deps)
+    per_level: Dict[int, int] = {}
+    for lv in level.values():
+        per_level[lv] = per_level.get(lv, 0) + 1
+    if latency_s is None:
+        latency_s, latency_source = DEFAULT_LATENCY_S, "default"
+    floor = max(1, min_concurrency or KG_MIN_CONCURRENCY)
+    ceiling = max(floor, max_concurrency or KG_MAX_CONCURRENCY)
+    requests_max = 2 * len(sizes) if overwrite else len(sizes)
+    largest = max(sizes.values(), key=lambda x: x[1], default=(None, 0))
+    return {
+        "nodes": len(sizes),
+        "by_type": dict(sorted(by_type.items(), key=lambda x: (-x[1], x[0]))),
+        "controlled_skipped": skipped,
+        "bytes_total": sum(s for _, s in sizes.values()),
+        "largest": {"file": largest[0], "bytes": largest[1]},
+        "depth": max(per_level, default=0),
+        "nodes_per_level": [per_level[k] for k in sorted(per_level)],
+        "requests": len(sizes),
+        "requests_max": requests_max,
+        "latency_s": round(latency_s, 4),
+        "latency_source": latency_source,
+        "concurrency": {"min": floor, "max": ceiling},
+        "estimated_wall_s": round(_round_trips(len(sizes), floor, ceiling) * latency_s, 1),
+        "estimated_wall_max_s": round(_round_trips(requests_max, floor, ceiling) * latency_s, 1),
+        "requests_per_s": round(ceiling / latency_s, 2) if latency_s else None,
+    }
+
+
+def print_estimate(est: Dict[str, Any], out=None) -> None:
+    out = out or sys.stdout
+    print(f"{est['nodes']} node(s) to upload, {est['controlled_skipped']} controlled term(s) skipped", file=out)
+    for t, n in est["by_type"].items():
+        print(f"  {t:<24}{n:>7}", file=out)
+    print(f"payload: {est['bytes_total']} bytes total, largest {est['largest']['bytes']} bytes "
+          f"({est['largest']['file']})", file=out)
+    print(f"dependency depth: {est['depth']} (nodes per level: {est['nodes_per_level']})", file=out)
+    print(f"estimate: {est['requests']} request(s) at {est['latency_s']}s ({est['latency_source']}) x "
+          f"{est['concurrency']['min']}-{est['concurrency']['max']} in flight = ~{est['estimated_wall_s']}s, "
+          f"up to {est['requests_per_s']} req/s", file=out)
+    if est["requests_max"] > est["requests"]:
+        print(f"  up to {est['requests_max']} request(s), ~{est['estimated_wall_max_s']}s, "
+              f"if the nodes already exist (POST 409 + PUT)", file=out)
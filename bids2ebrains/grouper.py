@@ -1,81 +1,155 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Optional
-import json, uuid
+from typing import Optional, Dict, List, Tuple
+import csv, hashlib, re, uuid
 from .config import OM_VOCAB, OM_CORE
-from .utils import local_name
+from .utils import local_name, sniff_type, read_text, write_json
+from .refs import ReferenceIndex
+from . import profiling, jsonio
 
 def _kgid() -> str:
     return f"https://kg.ebrains.eu/api/instances/{uuid.uuid4()}"
 
-def group_subjects(jsonld_dir: Path, label: Optional[str] = None, keep_individuals: bool = False) -> None:
-    label = label or "cohort-1"
+def _sub_label(s) -> Optional[str]:
+    if not isinstance(s, str):
+        return None
+    m = re.search(r"sub-([A-Za-z0-9]+)", s)
+    return m.group(1) if m else (s.strip() or None)
+
+def _read_participants(path: Path, column: str) -> Dict[str, str]:
+    with open(path, newline="") as fh:
+        reader = csv.DictReader(fh, delimiter="\t")
+        rows = list(reader)
+        header = reader.fieldnames or []
+    for name in ("participant_id", column):
+        if name not in header:
+            raise ValueError(f"Column '{name}' not found in {path} (columns: {', '.join(header) or 'none'})")
+    if not rows:
+        raise ValueError(f"{path} lists no participants")
+    out = {}
+    for row in rows:
+        sub = _sub_label(row.get("participant_id"))
+        value = (row.get(column) or "").strip()
+        if sub and value and value.lower() != "n/a":
+            out[sub] = value
+    return out
+
+def _ids(v) -> List[str]:
+    if isinstance(v, dict) and "@id" in v:
+        return [v["@id"]]
+    if isinstance(v, list):
+        return [i for x in v for i in _ids(x)]
+    return []
+
+def _slug(s: str) -> str:
+    # readable part plus a hash of the raw value, so "F"/"f" or "a b"/"a-b" get distinct files
+    slug = re.sub(r"[^a-z0-9]+", "-", s.lower()).strip("-") or "group"
+    return f"{slug}-{hashlib.sha1(s.encode('utf-8')).hexdigest()[:8]}"
+
+def group_subjects(
+    jsonld_dir: Path,
+    label: Optional[str] = None,
+    keep_individuals: bool = False,
+    by: Optional[str] = None,
+    participants: Optional[Path] = None,
+) -> None:
+    """Collapse Subject/SubjectState nodes into GroupSubject/SubjectGroupState nodes.
+
+    Without ``by`` all subjects form one group (``label``, default ``cohort-1``).
+    With ``by`` subjects are partitioned on that ``participants.tsv`` column,
+    one group per distinct value, labelled ``<label or by>-<value>``.
+    """
+    if by and not participants:
+        raise ValueError("Grouping by a participants column needs the participants.tsv path")
     subjects, states, others = [], [], []
+    texts: Dict[Path, str] = {}
 
+    # only Subject/SubjectState files are parsed up front; the rest is sniffed
     for fp in jsonld_dir.glob("*.jsonld"):
         try:
-            obj = json.loads(fp.read_text())
+            text = read_text(fp)
         except Exception:
             continue
-        t = obj.get("@type")
-        if isinstance(t, list): t = t[-1]
-        if isinstance(t, str): t = local_name(t)
-        if t == "Subject":
-            subjects.append((fp, obj))
-        elif t == "SubjectState":
-            states.append((fp, obj))
-        else:
-            others.append((fp, obj))
+        t = sniff_type(text)
+        if t is None or t in ("Subject", "SubjectState"):
+            try:
+                with profiling.stage("json-parse"):
+                    obj = jsonio.loads(text)
+            except Exception:
+                continue
+            t = obj.get("@type")
+            if isinstance(t, list): t = t[-1]
+            if isinstance(t, str): t = local_name(t)
+            if t == "Subject":
+                subjects.append((fp, obj))
+                continue
+            if t == "SubjectState":
+                states.append((fp, obj))
+                continue
+        texts[fp] = text
+        others.append(fp)
 
     if not subjects and not states:
         return
 
-    species = next((s[1].get("species") for s in subjects if s[1].get("species")), None)
-
-    group_id = _kgid()
-    group = {
-        "@context": {"@vocab": OM_VOCAB},
-        "@id": group_id,
-        "@type": f"{OM_CORE}GroupSubject",
-        "label": label,
-    }
-    if species:
-        group["species"] = species
-
-    state_id = _kgid()
-    age = next((st[1].get("ageCategory") for st in states if st[1].get("ageCategory")), None)
-    group_state = {
-        "@context": {"@vocab": OM_VOCAB},
-        "@id": state_id,
-        "@type": f"{OM_CORE}SubjectGroupState",
-        "label": f"{label}_state",
-    }
-    if age:
-        group_state["ageCategory"] = age
-
-    (jsonld_dir / "group_subject.jsonld").write_text(json.dumps(group, indent=2))
-    (jsonld_dir / "group_subject_state.jsonld").write_text(json.dumps(group_state, indent=2))
-
-    subject_ids = {o["@id"] for _, o in subjects if "@id" in o}
-    state_ids   = {o["@id"] for _, o in states if "@id" in o}
-
-    def retarget(v):
-        if isinstance(v, dict) and "@id" in v:
-            if v["@id"] in subject_ids: return {"@id": group_id}
-            if v["@id"] in state_ids:   return {"@id": state_id}
-        if isinstance(v, list): return [retarget(x) for x in v]
-        return v
-
-    for fp, obj in others:
-        changed = False
-        for k,v in list(obj.items()):
-            nv = retarget(v)
-            if nv is not v:
-                obj[k] = nv
-                changed = True
-        if changed:
-            fp.write_text(json.dumps(obj, indent=2))
+    # partition: group label -> (subjects, states)
+    groups: Dict[str, Tuple[list, list]] = {}
+    if by:
+        values = _read_participants(participants, by)
+        state_by_id = {o.get("@id"): (fp, o) for fp, o in states}
+        prefix = label or by
+        for fp, obj in subjects:
+            value = values.get(_sub_label(obj.get("internalIdentifier") or obj.get("lookupLabel")))
+            if value is None:
+                continue
+            members = groups.setdefault(f"{prefix}-{value}", ([], []))
+            members[0].append((fp, obj))
+            for sid in _ids(obj.get("studiedState")):
+                if sid in state_by_id:
+                    members[1].append(state_by_id[sid])
+    else:
+        groups[label or "cohort-1"] = (subjects, states)
+
+    mapping: Dict[str, str] = {}
+    grouped: List[Tuple[Path, dict]] = []
+    for glabel, (g_subjects, g_states) in groups.items():
+        group_id, state_id = _kgid(), _kgid()
+        species = next((s[1].get("species") for s in g_subjects if s[1].get("species")), None)
+        group = {
+            "@context": {"@vocab": OM_VOCAB},
+            "@id": group_id,
+            "@type": f"{OM_CORE}GroupSubject",
+            "label": glabel,
+        }
+        if species:
+            group["species"] = species
+        if by:
+            # several groups: say how big each is and which state belongs to it
+            group["quantity"] = len(g_subjects)
+            group["studiedState"] = [{"@id": state_id}]
+
+        age = next((st[1].get("ageCategory") for st in g_states if st[1].get("ageCategory")), None)
+        group_state = {
+            "@context": {"@vocab": OM_VOCAB},
+            "@id": state_id,
+            "@type": f"{OM_CORE}SubjectGroupState",
+            "label": f"{glabel}_state",
+        }
+        if age:
+            group_state["ageCategory"] = age
+
+        suffix = f"_{_slug(glabel)}" if by else ""
+        write_json(jsonld_dir / f"group_subject{suffix}.jsonld", group)
+        write_json(jsonld_dir / f"group_subject_state{suffix}.jsonld", group_state)
+
+        mapping.update({o["@id"]: group_id for _, o in g_subjects if "@id" in o})
+        mapping.update({o["@id"]: state_id for _, o in g_states if "@id" in o})
+        grouped.extend(g_subjects + g_states)
+
+    # links at any depth, only in files that actually contain a grouped @id
+    if mapping:
+        ReferenceIndex.build(others, targets=set(mapping), texts=texts).rewrite(mapping)
 
     if not keep_individuals:
-        for fp,_ in subjects + states:
+        for fp,_ in grouped:
             fp.unlink(missing_ok=True)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from contextlib import contextmanager
+import re, threading, time
+
+from . import jsonio, profiling
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Observer = Callable[[Dict[str, Any]], None]
+
+_OBSERVERS: List[Observer] = []
+_LOCK = threading.Lock()
+
+_UUID_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+
+def endpoint_of(method: str, url: str) -> str:
+    """``"PUT https://host/v3/instances/<uuid>?space=x"`` -> ``"PUT /v3/instances/{id}"``."""
+    path = url.split("?", 1)[0]
+    path = re.sub(r"^[a-z]+://[^/]+", "", path)
+    return f"{method.upper()} {_UUID_RE.sub('{id}', path) or '/'}"
+
+
+def add_observer(observer: Observer) -> None:
+    with _LOCK:
+        _OBSERVERS.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    with _LOCK:
+        if observer in _OBSERVERS:
+            _OBSERVERS.remove(observer)
+
+
+@contextmanager
+def observe(*observers: Observer):
+    """Attach observers to every KG call made inside the block."""
+    for o in observers:
+        add_observer(o)
+    try:
+        yield observers[0] if len(observers) == 1 else observers
+    finally:
+        for o in observers:
+            remove_observer(o)
+
+
+def emit(
+    method: str,
+    url: str,
+    status: Optional[int],
+    seconds: float,
+    bytes_sent: int = 0,
+    bytes_received: int = 0,
+    *,
+    endpoint: Optional[str] = None,
+    retry: bool = False,
+    reason: Optional[str] = None,
+    error: Optional[str] = None,
+) -> None:
+    """Report one KG call to the active profile and all observers."""
+    endpoint = endpoint or endpoint_of(method, url)
+    profiling.record_http(endpoint, status, seconds, bytes_sent)
+    if not _OBSERVERS:
+        return
+    event = {
+        "ts": time.time(),
+        "method": method.upper(),
+        "endpoint": endpoint,
+        "url": url,
+        "status": status,
+        "seconds": seconds,
+        "bytes_sent": bytes_sent,
+        "bytes_received": bytes_received,
+        "retry": retry,
+        "reason": reason,
+        "error": error,
+    }
+    for o in list(_OBSERVERS):
+        try:
+            o(event)
+        except Exception:
+            pass
+
+
+@contextmanager
+def timed_call(method: str, endpoint: str, url: str = ""):
+    """Instrument a non-HTTP-level KG call (e.g. a fairgraph query) as one request."""
+    t0 = time.perf_counter()
+    err = None
+    try:
+        yield
+    except Exception as e:
+        err = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        emit(method, url or endpoint, None if err else 200, time.perf_counter() - t0,
+             endpoint=endpoint, error=err)
+
+
+class HttpStats:
+    """Observer aggregating per-endpoint latency histograms, status codes, retries and sizes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints: Dict[str, Dict[str, Any]] = {}
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            e = self.endpoints.setdefault(event["endpoint"], {
+                "requests": 0, "seconds": 0.0, "max_s": 0.0,
+                "histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+                "status": {}, "retries": 0, "reasons": {}, "errors": 0,
+                "bytes_sent": 0, "max_bytes_sent": 0, "bytes_received": 0,
+            })
+            s = event["seconds"]
+            e["requests"] += 1
+            e["seconds"] += s
+            e["max_s"] = max(e["max_s"], s)
+            e["histogram"][next((i for i, b in enumerate(LATENCY_BUCKETS) if s <= b), len(LATENCY_BUCKETS))] += 1
+            code = str(event["status"]) if event["status"] is not None else "error"
+            e["status"][code] = e["status"].get(code, 0) + 1
+            if event["retry"]:
+                e["retries"] += 1
+            if event["reason"]:
+                e["reasons"][event["reason"]] = e["reasons"].get(event["reason"], 0) + 1
+            if event["error"]:
+                e["errors"] += 1
+            e["bytes_sent"] += event["bytes_sent"]
+            e["max_bytes_sent"] = max(e["max_bytes_sent"], event["bytes_sent"])
+            e["bytes_received"] += event["bytes_received"]
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "buckets_s": list(LATENCY_BUCKETS) + [None],
+                "endpoints": jsonio.loads(jsonio.dumps(self.endpoints, jsonio.COMPACT)),
+            }
+
+    def summary(self) -> str:
+        lines = [f"{'endpoint':<36}{'reqs':>6}{'mean s':>9}{'max s':>8}{'retry':>6}  status"]
+        for name, e in sorted(self.endpoints.items(), key=lambda x: -x[1]["seconds"]):
+            mean = e["seconds"] / e["requests"] if e["requests"] else 0.0
+            codes = " ".join(f"{k}:{v}" for k, v in sorted(e["status"].items()))
+            lines.append(f"{name[:35]:<36}{e['requests']:>6}{mean:>9.3f}{e['max_s']:>8.3f}{e['retries']:>6}  {codes}")
+        return "\n".join(lines)
+
+
+class TraceLog:
+    """Observer appending one JSON line per KG call to ``path``."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._fh = open(self.path, "a", buffering=1)
+
+    def __call__(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self._fh.write(jsonio.dumps(event, jsonio.COMPACT).decode("utf-8") + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
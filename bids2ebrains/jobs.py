@@ -0,0 +1,209 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import importlib, threading, time, traceback, uuid
+
+from .cache import PersonCache, HashCache, ValidationCache
+from .progress import Progress, Cancelled, tracking
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_SECRET_PARAMS = ("token",)
+
+
+# fairgraph is deliberately not pre-imported: it re-registers the openMINDS classes, after which
+# bids2openminds' own collection validation fails. It is still imported lazily for person lookups.
+WARM_MODULES = ("bids2openminds.converter", "openminds", "bids2ebrains.mappings", "bids2ebrains.core")
+
+
+def warm() -> Dict[str, Optional[float]]:
+    """Import the heavy dependencies (and build the controlled-term maps) once; seconds per module."""
+    out: Dict[str, Optional[float]] = {}
+    for mod in WARM_MODULES:
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(mod)
+            out[mod] = round(time.perf_counter() - t0, 3)
+        except Exception:
+            out[mod] = None
+    return out
+
+
+def _path(params: Dict[str, Any], key: str) -> Optional[Path]:
+    v = params.get(key)
+    return Path(v) if v else None
+
+
+def _convert(params, caches):
+    from .core import convert_bids
+    convert_bids(Path(params["bids"]), _path(params, "out"), pack=_path(params, "pack"))
+    return {"out": params.get("out"), "pack": params.get("pack")}
+
+
+def _scan(params, caches):
+    from .core import scan_missing
+    report, prompts = scan_missing(Path(params["jsonld"]))
+    return {
+        "missing": {str(fp): miss for fp, miss in report.items()},
+        "prompts": prompts,
+        "types": {str(fp): t for fp, t in report.types.items()},
+    }
+
+
+def _patch(params, caches):
+    from .core import patch_openminds
+    from .person_index import SIMILARITY_THRESHOLD
+    patch_openminds(
+        Path(params["jsonld"]),
+        repo_iri=params.get("repo_iri", ""),
+        answers=params.get("answers"),
+        answers_file=_path(params, "answers_file"),
+        resolve_persons=params.get("resolve_persons", False),
+        token=params.get("token"),
+        person_cache=caches.get("person"),
+        use_person_cache=params.get("use_person_cache", True),
+        person_index=_path(params, "person_index"),
+        match_threshold=params.get("match_threshold", SIMILARITY_THRESHOLD),
+        hash_cache=caches.get("hash"),
+    )
+    return {"jsonld": params["jsonld"]}
+
+
+def _validate(params, caches):
+    from .core import validate_jsonld
+    from .validator import get_last_validation_mode
+    errs = validate_jsonld(Path(params["jsonld"]), cache=caches.get("validation"))
+    return {"mode": get_last_validation_mode(), "errors": [[str(fp), msg] for fp, msg in errs]}
+
+
+def _upload(params, caches):
+    from .core import upload_to_kg
+    return upload_to_kg(
+        Path(params["jsonld"]),
+        space=params["space"],
+        token=params.get("token"),
+        overwrite=params.get("overwrite", True),
+        skip_controlled_terms=params.get("skip_controlled_terms", True),
+        dry_run=params.get("dry_run", False),
+    )
+
+
+JOB_KINDS: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Any]] = {
+    "convert": _convert,
+    "scan": _scan,
+    "patch": _patch,
+    "validate": _validate,
+    "upload": _upload,
+}
+
+
+class Job:
+    def __init__(self, kind: str, params: Dict[str, Any], fn: Callable[[], Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.fn = fn
+        self.state = QUEUED
+        self.progress = Progress()
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.traceback: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in FINISHED
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id, "kind": self.kind, "state": self.state,
+            "params": {k: ("***" if k in _SECRET_PARAMS and v else v) for k, v in self.params.items()},
+            "progress": self.progress.as_dict(),
+            "result": self.result, "error": self.error,
+            "created": self.created, "started": self.started, "finished": self.finished,
+        }
+
+
+class JobManager:
+    """Queue of pipeline jobs run by a thread pool that shares warm imports and caches.
+
+    Jobs report progress through :mod:`bids2ebrains.progress` and can be
+    cancelled while queued or at the next progress checkpoint.
+    """
+
+    def __init__(self, workers: int = 2, keep: int = 500, use_caches: bool = True):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="b2e-job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self.workers = workers
+        self.keep = keep
+        self.caches: Dict[str, Any] = {}
+        if use_caches:
+            self.caches = {"person": PersonCache(), "hash": HashCache(), "validation": ValidationCache()}
+
+    def submit(self, kind: str, params: Optional[Dict[str, Any]] = None,
+               fn: Optional[Callable[[], Any]] = None) -> Job:
+        """Queue a registered ``kind`` (see ``JOB_KINDS``) or, with ``fn``, any callable."""
+        params = dict(params or {})
+        if fn is None:
+            if kind not in JOB_KINDS:
+                raise ValueError(f"Unknown job kind {kind!r}; expected one of {sorted(JOB_KINDS)}")
+            runner = JOB_KINDS[kind]
+            fn = lambda: runner(params, self.caches)  # noqa: E731
+        job = Job(kind, params, fn)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._pool.submit(self._run, job)
+        return job
+
+    def _run(self, job: Job) -> None:
+        if job.progress.cancelled:
+            job.state, job.finished = CANCELLED, time.time()
+            return
+        job.state, job.started = RUNNING, time.time()
+        try:
+            with tracking(job.progress):
+                job.result = job.fn()
+            job.state = DONE
+        except Cancelled:
+            job.state = CANCELLED
+        except Exception as e:
+            job.state = FAILED
+            job.error = f"{type(e).__name__}: {e}"
+            job.traceback = traceback.format_exc()
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job.progress.cancel()
+        if job.future is not None and job.future.cancel():
+            job.state, job.finished = CANCELLED, time.time()
+        return True
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.done]
+        for j in sorted(finished, key=lambda j: j.created)[:max(0, len(self._jobs) - self.keep)]:
+            del self._jobs[j.id]
+
+    def shutdown(self, cancel: bool = True) -> None:
+        if cancel:
+            for job in self.list():
+                self.cancel(job.id)
+        self._pool.shutdown(wait=True)
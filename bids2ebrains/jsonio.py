@@ -0,0 +1,69 @@
+from __future__ import annotations
+from typing import Any, Optional, Union
+import json, os
+
+try:  # optional fast backend
+    import orjson as _orjson
+except Exception:
+    _orjson = None
+
+PRETTY = "pretty"       # indent=2, key order preserved (human-editable, the historic format)
+COMPACT = "compact"     # sorted keys, no whitespace: canonical, stable for hashing and diffing
+STYLES = (PRETTY, COMPACT)
+
+_STYLE = os.getenv("BIDS2EBRAINS_JSON_STYLE", PRETTY)
+if _STYLE not in STYLES:
+    _STYLE = PRETTY
+
+_USE_ORJSON = _orjson is not None and os.getenv("BIDS2EBRAINS_JSON_BACKEND", "auto") != "stdlib"
+
+
+def backend() -> str:
+    return "orjson" if _USE_ORJSON else "json"
+
+
+def set_backend(name: str) -> None:
+    """Select ``"orjson"`` (if installed), ``"json"``/``"stdlib"`` or ``"auto"``."""
+    global _USE_ORJSON
+    if name == "orjson" and _orjson is None:
+        raise ValueError("orjson is not installed")
+    _USE_ORJSON = _orjson is not None and name in ("orjson", "auto")
+
+
+def get_style() -> str:
+    return _STYLE
+
+
+def set_style(style: str) -> None:
+    """Default style used by ``dumps`` and the JSON-LD writers."""
+    global _STYLE
+    if style not in STYLES:
+        raise ValueError(f"Unknown JSON style {style!r}; expected one of {STYLES}")
+    _STYLE = style
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    if _USE_ORJSON:
+        return _orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, style: Optional[str] = None) -> bytes:
+    """Serialise to UTF-8 bytes in ``style`` (default: the configured style)."""
+    style = style or _STYLE
+    if _USE_ORJSON:
+        opt = _orjson.OPT_INDENT_2 if style == PRETTY else _orjson.OPT_SORT_KEYS
+        try:
+            return _orjson.dumps(obj, option=opt)
+        except TypeError:
+            pass  # e.g. non-str keys or out-of-range ints: let the stdlib handle it
+    if style == PRETTY:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def canonical(obj: Any) -> bytes:
+    """Compact canonical bytes for hashing/diffing, identical whichever backend is active."""
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,121 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+import logging, threading, time
+
+from .config import KG_MIN_CONCURRENCY, KG_MAX_CONCURRENCY
+
+log = logging.getLogger(__name__)
+
+OVERLOAD_STATUS = (429, 502, 503, 504)
+
+
+class _Slot:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status: Optional[int] = None
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for KG requests.
+
+    Starts at ``floor`` and adds one slot after every ``limit`` healthy
+    responses (about once per round trip at full load). An overload status
+    (429/5xx gateway), a transport error or a latency above ``slow_factor``
+    times the healthy baseline (and at least ``min_slow_s`` above it)
+    multiplies the limit by ``backoff``, at most once per round trip. After
+    ``rebaseline_after`` latency cuts in a row the slow latency becomes the
+    new baseline, so a lasting latency rise does not pin the limit to the
+    floor. The limit stays within ``[floor, ceiling]``; each change is
+    logged and kept in ``changes``.
+    """
+
+    def __init__(
+        self,
+        floor: int = KG_MIN_CONCURRENCY,
+        ceiling: int = KG_MAX_CONCURRENCY,
+        backoff: float = 0.5,
+        slow_factor: float = 2.0,
+        min_slow_s: float = 0.1,
+        rebaseline_after: int = 3,
+        name: str = "kg",
+    ):
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.backoff = backoff
+        self.slow_factor = slow_factor
+        self.min_slow_s = min_slow_s
+        self.rebaseline_after = max(1, rebaseline_after)
+        self.name = name
+        self.limit = float(self.floor)
+        self.in_flight = 0
+        self.peak = self.floor
+        self.baseline: Optional[float] = None
+        self.changes: List[Tuple[float, int, int, str]] = []
+        self._healthy = 0
+        self._last_cut = 0.0
+        self._slow_cuts = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, status: Optional[int], seconds: float) -> None:
+        """Return a slot with the outcome of its request (``status`` None = transport error)."""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if status is None or status in OVERLOAD_STATUS:
+                reason = f"status {status}" if status else "error"
+            elif self.baseline is not None and seconds > max(self.slow_factor * self.baseline,
+                                                             self.baseline + self.min_slow_s):
+                reason = f"latency {seconds:.2f}s > {self.slow_factor:g}x {self.baseline:.2f}s"
+            else:
+                reason = None
+                self._slow_cuts = 0
+                self.baseline = seconds if self.baseline is None else 0.9 * self.baseline + 0.1 * seconds
+                self._healthy += 1
+                if self._healthy >= int(self.limit) and self.limit < self.ceiling:
+                    self._set(self.limit + 1, "healthy")
+            if reason and now - self._last_cut >= max(seconds, self.baseline or 0.0):
+                self._last_cut = now
+                self._set(max(self.floor, self.limit * self.backoff), reason)
+                if reason.startswith("latency"):
+                    self._slow_cuts += 1
+                    if self._slow_cuts >= self.rebaseline_after:
+                        log.info("%s latency baseline %.2fs -> %.2fs", self.name, self.baseline, seconds)
+                        self.baseline = seconds
+                        self._slow_cuts = 0
+            self._cond.notify_all()
+
+    def _set(self, new: float, reason: str) -> None:
+        old = int(self.limit)
+        self.limit = min(float(self.ceiling), new)
+        self._healthy = 0
+        if int(self.limit) != old:
+            self.peak = max(self.peak, int(self.limit))
+            self.changes.append((time.time(), old, int(self.limit), reason))
+            log.info("%s concurrency %d -> %d (%s)", self.name, old, int(self.limit), reason)
+
+    @contextmanager
+    def slot(self):
+        """``with limiter.slot() as s: resp = ...; s.status = resp.status_code``"""
+        self.acquire()
+        s = _Slot()
+        t0 = time.perf_counter()
+        try:
+            yield s
+        finally:
+            self.release(s.status, time.perf_counter() - t0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": int(self.limit), "floor": self.floor, "ceiling": self.ceiling, "peak": self.peak,
+                "changes": len(self.changes),
+                "baseline_s": round(self.baseline, 4) if self.baseline is not None else None,
+            }
@@ -0,0 +1,145 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import mmap, struct
+
+from .utils import read_json, write_json, local_name
+from . import profiling, jsonio
+
+# Layout: MAGIC | record\n ... | index JSON | FOOTER(magic, index offset, index length)
+MAGIC = b"B2EPACK1\n"
+_FOOTER = struct.Struct("<8sQQ")
+_FOOTER_MAGIC = b"B2EPIDX1"
+
+
+def _type_name(obj: dict) -> Optional[str]:
+    t = obj.get("@type")
+    if isinstance(t, list) and t:
+        t = t[-1]
+    return local_name(t) if isinstance(t, str) else None
+
+
+def write_pack(path: Path, nodes: Iterable[Tuple[str, dict]]) -> int:
+    """Write ``(file name, node)`` pairs into one packed file; returns the node count.
+
+    Each record is compact JSON; the trailing index maps ``@id`` to
+    ``[type, offset, length, file name]`` so readers can seek straight to a node.
+    """
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    index: Dict[str, List[Any]] = {}
+    anon = 0
+    try:
+        with open(tmp, "wb") as fh:
+            fh.write(MAGIC)
+            for name, obj in nodes:
+                data = jsonio.dumps(obj, jsonio.COMPACT)
+                key = obj.get("@id") if isinstance(obj, dict) else None
+                if not isinstance(key, str) or key in index:
+                    anon += 1
+                    key = f"_:pack{anon}"
+                index[key] = [_type_name(obj) if isinstance(obj, dict) else None, fh.tell(), len(data), name]
+                fh.write(data + b"\n")
+            idx_off = fh.tell()
+            idx = jsonio.dumps({"version": 1, "nodes": index}, jsonio.COMPACT)
+            fh.write(idx)
+            fh.write(_FOOTER.pack(_FOOTER_MAGIC, idx_off, len(idx)))
+        tmp.replace(path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    profiling.count("files_written")
+    profiling.count("bytes_written", path.stat().st_size)
+    return len(index)
+
+
+class PackedGraph:
+    """Read-only, memory-mapped view of a packed graph file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fh = open(self.path, "rb")
+        try:
+            size = self.path.stat().st_size
+            if size < len(MAGIC) + _FOOTER.size:
+                raise ValueError(f"{self.path} is too short ({size} bytes) for a packed graph")
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+            if self._mm[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{self.path} is not a packed graph")
+            magic, off, length = _FOOTER.unpack(self._mm[-_FOOTER.size:])
+            if magic != _FOOTER_MAGIC or off + length > size - _FOOTER.size:
+                raise ValueError(f"{self.path} has no index footer (truncated?)")
+            self.index: Dict[str, List[Any]] = jsonio.loads(self._mm[off:off + length])["nodes"]
+        except BaseException:
+            self.close()
+            raise
+        self._by_type: Dict[Optional[str], List[str]] = {}
+        for key, (typ, *_rest) in self.index.items():
+            self._by_type.setdefault(typ, []).append(key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        mm = getattr(self, "_mm", None)
+        if mm is not None and not mm.closed:
+            mm.close()
+        self._fh.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.index
+
+    def ids(self) -> List[str]:
+        return list(self.index)
+
+    def types(self) -> Dict[Optional[str], int]:
+        return {t: len(v) for t, v in self._by_type.items()}
+
+    def type_of(self, node_id: str) -> Optional[str]:
+        return self.index[node_id][0]
+
+    def raw(self, node_id: str) -> bytes:
+        _, off, length, _ = self.index[node_id]
+        return self._mm[off:off + length]
+
+    def get(self, node_id: str) -> dict:
+        with profiling.stage("json-parse"):
+            return jsonio.loads(self.raw(node_id))
+
+    def by_type(self, type_name: str) -> Iterator[dict]:
+        for key in self._by_type.get(type_name, []):
+            yield self.get(key)
+
+    def __iter__(self) -> Iterator[Tuple[str, dict]]:
+        """``(file name, node)`` pairs in pack order."""
+        for key, (_, _, _, name) in sorted(self.index.items(), key=lambda kv: kv[1][1]):
+            yield name, self.get(key)
+
+
+def pack_dir(jsonld_dir: Path, pack_path: Path) -> int:
+    """Import a per-file ``*.jsonld`` directory into one packed file."""
+    def nodes():
+        for fp in sorted(Path(jsonld_dir).glob("*.jsonld")):
+            try:
+                yield fp.name, read_json(fp)
+            except Exception:
+                continue
+    return write_pack(pack_path, nodes())
+
+
+def unpack(pack_path: Path, out_dir: Path) -> int:
+    """Export a packed file back to the per-file ``*.jsonld`` layout."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n = 0
+    with PackedGraph(pack_path) as g:
+        for name, obj in g:
+            write_json(out_dir / Path(name).name, obj)
+            n += 1
+    return n
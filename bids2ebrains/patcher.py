@@ -1,15 +1,20 @@
 from __future__ import annotations
 
-import json, os, uuid, re, yaml
+import json, logging, os, uuid, re, yaml
 from pathlib import Path
 from typing import Optional, Dict, List, Union, Any
 
 from .config import OM_VOCAB, OM_CORE
 from .mappings import resolve_known_iri
-from .utils import sha256_and_size, local_name, is_iri
-from .resolver import resolve_person_iri
+from .utils import sha256_and_size, local_name, is_iri, read_json, write_json
+from . import archive, jsonio, progress
+from .resolver import resolve_persons_batch
+from .person_index import PersonIndex, SIMILARITY_THRESHOLD
+from .cache import PersonCache, HashCache
 from .scanner import Scanner 
 
+log = logging.getLogger(__name__)
+
 
 class Patcher:
     def __init__(self, jsonld_dir: Path):
@@ -42,7 +47,7 @@ class Patcher:
     def _compute_dsv_suffix(cls, jsonld_dir: Path) -> str:
         try:
             for fp in jsonld_dir.glob("*.jsonld"):
-                payload = json.loads(fp.read_text())
+                payload = read_json(fp)
                 t = payload.get("@type")
                 if isinstance(t, list) and t:
                     t = t[-1]
@@ -122,7 +127,7 @@ class Patcher:
             person["orcid"] = orcid_id
         fname = f"person_{re.sub(r'[^a-z0-9]+','-', last.strip().lower())}_" \
                 f"{re.sub(r'[^a-z0-9]+','-', first.strip().lower())}.jsonld"
-        (out_dir / fname).write_text(json.dumps(person, indent=2))
+        write_json(out_dir / fname, person)
         return {"@id": pid}
 
     @staticmethod
@@ -132,7 +137,7 @@ class Patcher:
         text = answers_file.read_text()
         if answers_file.suffix.lower() in (".yml", ".yaml"):
             return yaml.safe_load(text) or {}
-        return json.loads(text)
+        return jsonio.loads(text)
 
     @staticmethod
     def _apply_answers_to_value(type_key: str, raw: str):
@@ -155,14 +160,21 @@ class Patcher:
         interactive: bool = False,
         resolve_persons: bool = False,
         token: Optional[str] = None,
+        person_cache: Optional[PersonCache] = None,
+        use_person_cache: bool = True,
+        person_index: Optional[Path] = None,
+        match_threshold: float = SIMILARITY_THRESHOLD,
+        hash_cache: Optional[HashCache] = None,
     ):
 
+        if person_index is not None and not isinstance(person_index, PersonIndex):
+            PersonIndex(person_index)  # fail before patching, not per custodian
         repo_iri = (repo_iri or "file://local-placeholder").strip()
         answers = {**(self._load_answers(answers_file)), **(answers or {})}
 
         for fp in self.jsonld_dir.glob("*.jsonld"):
             try:
-                obj = json.loads(fp.read_text())
+                obj = read_json(fp)
                 if isinstance(obj, dict) and obj.get("@type", "").endswith("FileRepository"):
                     fp.unlink(missing_ok=True)
             except Exception:
@@ -179,7 +191,7 @@ class Patcher:
             "hostedBy": {"@id": hosted_by_iri},
             "label": label,
         }
-        (self.jsonld_dir / "_file_repository_stub.jsonld").write_text(json.dumps(repo_stub, indent=2))
+        write_json(self.jsonld_dir / "_file_repository_stub.jsonld", repo_stub)
 
         report, prompts = Scanner.scan(self.jsonld_dir)
 
@@ -193,9 +205,12 @@ class Patcher:
         cust_specs = self._parse_custodian_specs(
             answers.get("custodians", answers.get("Dataset.custodian"))
         )
+        resolved_persons: Optional[List[Optional[str]]] = None
 
-        for fp, missing in report.items():
-            obj = json.loads(Path(fp).read_text())
+        progress.report("patch", total=len(report))
+        for i, (fp, missing) in enumerate(report.items()):
+            progress.report(done=i)
+            obj = read_json(fp)
             typ = self._type_name(obj)
             if not typ:
                 continue
@@ -209,8 +224,19 @@ class Patcher:
                 obj["fileRepository"] = {"@id": repo_id}
                 if "IRI" in obj and isinstance(obj["IRI"], str):
                     real = obj["IRI"].replace("file://", "")
+                    res = None
                     if os.path.exists(real):
-                        digest, size = sha256_and_size(real)
+                        # metadata-only placeholders are hashed from their archive, if it is still there
+                        entry = archive.placeholder(real)
+                        if entry:
+                            res = archive.placeholder_digest(real, entry)
+                            if res is None:
+                                log.warning("%s: archive %s is gone; left without storageSize and hash",
+                                            real, entry["archive"])
+                        else:
+                            res = sha256_and_size(real, hash_cache)
+                    if res:
+                        digest, size = res
                         obj["storageSize"] = {
                             "@type": f"{OM_CORE}QuantitativeValue",
                             "unit": {"@id": "https://openminds.ebrains.eu/instances/unitOfMeasurement/byte"},
@@ -239,8 +265,25 @@ class Patcher:
                     if not isinstance(current, list):
                         current = [] if current is None else [current]
 
+                    if resolved_persons is None:
+                        resolved_persons = [None] * len(cust_specs)
+                        if resolve_persons or person_index:
+                            idx = [
+                                i for i, spec in enumerate(cust_specs)
+                                if isinstance(spec, dict)
+                                and (spec.get("first") or spec.get("given"))
+                                and (spec.get("last") or spec.get("family"))
+                            ]
+                            found = resolve_persons_batch(
+                                [cust_specs[i] for i in idx], token=token,
+                                cache=person_cache, use_cache=use_person_cache,
+                                index=person_index, threshold=match_threshold,
+                            )
+                            for i, iri in zip(idx, found):
+                                resolved_persons[i] = iri
+
                     new_links: List[Dict[str, str]] = []
-                    for spec in cust_specs:
+                    for spec, iri in zip(cust_specs, resolved_persons):
                         if isinstance(spec, str) and (spec.startswith("http://") or spec.startswith("https://")):
                             new_links.append({"@id": spec})
                             continue
@@ -252,11 +295,7 @@ class Patcher:
                             if not first or not last:
                                 continue
 
-                            linked = None
-                            if resolve_persons:
-                                iri = resolve_person_iri(first, last, orcid_raw, token=token)
-                                if iri:
-                                    linked = {"@id": iri}
+                            linked = {"@id": iri} if iri else None
                             if linked is None:
                                 linked = self._create_person_jsonld(first, last, orcid_raw, self.jsonld_dir)
                             new_links.append(linked)
@@ -271,4 +310,5 @@ class Patcher:
             except Exception:
                 pass
 
-            Path(fp).write_text(json.dumps(obj, indent=2))
+            write_json(fp, obj)
+        progress.report(done=len(report))
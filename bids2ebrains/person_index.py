@@ -0,0 +1,279 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Optional, Iterable, Tuple, Any, Iterator, List, Dict, Set
+from collections import Counter
+from contextlib import contextmanager
+from difflib import SequenceMatcher
+import sqlite3, time
+
+from .utils import normalize_name
+from .instrumentation import timed_call
+
+# each name part must reach it: "Jon"/"John" 0.86, "Smith"/"Smyth" 0.80, "John"/"Jane" 0.50
+SIMILARITY_THRESHOLD = 0.70
+
+
+def name_trigrams(s: Optional[str]) -> Set[str]:
+    norm = normalize_name(s or "")
+    if not norm:
+        return set()
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+def _part_similarity(a: Optional[str], b: Optional[str]) -> float:
+    a, b = normalize_name(a or ""), normalize_name(b or "")
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def name_similarity(first: Optional[str], last: Optional[str], given: Optional[str], family: Optional[str]) -> float:
+    """Similarity of two names: the weaker of the family- and given-name scores.
+
+    Trigrams only select candidates; each part is scored on its own, so an
+    exact family name cannot carry an unrelated given name past the threshold.
+    """
+    fam = _part_similarity(last, family)
+    if not normalize_name(first or ""):
+        return fam
+    return min(fam, _part_similarity(first, given))
+
+
+class TrigramIndex:
+    """In-memory inverted trigram index over (given, family) names."""
+
+    def __init__(self):
+        self._names: Dict[Any, Tuple[str, str]] = {}
+        self._postings: Dict[str, List[Any]] = {}
+
+    def add(self, key: Any, given: Optional[str], family: Optional[str]) -> None:
+        self._names[key] = (given or "", family or "")
+        for g in name_trigrams(given) | name_trigrams(family):
+            self._postings.setdefault(g, []).append(key)
+
+    def search(
+        self,
+        first: Optional[str],
+        last: Optional[str],
+        threshold: float = SIMILARITY_THRESHOLD,
+        limit: int = 10,
+    ) -> List[Tuple[Any, float]]:
+        shared: Counter = Counter()
+        for g in name_trigrams(first) | name_trigrams(last):
+            shared.update(self._postings.get(g, ()))
+        return _rank(
+            ((k, *self._names[k]) for k, _ in shared.most_common(max(limit, 1) * 20)),
+            first, last, threshold, limit,
+        )
+
+
+def _rank(rows, first, last, threshold: float, limit: int) -> List[Tuple[Any, float]]:
+    scored = [(key, name_similarity(first, last, given, family)) for key, given, family in rows]
+    scored = [(k, sc) for k, sc in scored if sc >= threshold]
+    scored.sort(key=lambda x: -x[1])
+    return scored[:limit]
+
+
+def _orcid_key(orcid: Optional[str]) -> str:
+    return str(orcid or "").strip().rstrip("/").rsplit("/", 1)[-1].upper()
+
+
+class PersonIndex:
+    """Local SQLite snapshot of KG Person entries for offline disambiguation."""
+
+    def __init__(self, path: Path, create: bool = False):
+        """Open an index written by :func:`build_person_index`; ``create`` starts an empty one.
+
+        A missing or foreign file raises instead of silently matching nothing
+        (which would create duplicate Person nodes).
+        """
+        self.path = Path(path)
+        if create:
+            self.create()
+            return
+        if not self.path.is_file():
+            raise FileNotFoundError(f"Person index {self.path} does not exist (see index-persons)")
+        try:
+            with self._connect() as con:
+                ok = con.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'persons'"
+                ).fetchone()
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"{self.path} is not a person index: {e}") from e
+        if not ok:
+            raise ValueError(f"{self.path} is not a person index (no persons table)")
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(str(self.path), timeout=10)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def create(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.executescript(
+                "CREATE TABLE IF NOT EXISTS persons ("
+                "  id TEXT PRIMARY KEY, given TEXT, family TEXT,"
+                "  given_norm TEXT, family_norm TEXT, orcid TEXT);"
+                "CREATE INDEX IF NOT EXISTS persons_family ON persons (family_norm);"
+                "CREATE INDEX IF NOT EXISTS persons_orcid ON persons (orcid);"
+                "CREATE TABLE IF NOT EXISTS person_grams (gram TEXT NOT NULL, id TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS person_grams_gram ON person_grams (gram);"
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);"
+            )
+
+    def add(self, rows: Iterable[Tuple[str, str, str, Optional[str]]]) -> int:
+        """Insert ``(iri, given, family, orcid)`` rows; returns the number written."""
+        n = 0
+        with self._connect() as con:
+            for iri, given, family, orcid in rows:
+                con.execute(
+                    "INSERT OR REPLACE INTO persons VALUES (?, ?, ?, ?, ?, ?)",
+                    (iri, given or "", family or "", normalize_name(given), normalize_name(family),
+                     _orcid_key(orcid) or None),
+                )
+                con.execute("DELETE FROM person_grams WHERE id = ?", (iri,))
+                con.executemany(
+                    "INSERT INTO person_grams VALUES (?, ?)",
+                    [(g, iri) for g in name_trigrams(given) | name_trigrams(family)],
+                )
+                n += 1
+        return n
+
+    def _ensure_grams(self, con) -> None:
+        # indexes written before trigram support only have the persons table
+        has = con.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'person_grams'"
+        ).fetchone()
+        if has:
+            return
+        con.execute("CREATE TABLE person_grams (gram TEXT NOT NULL, id TEXT NOT NULL)")
+        con.execute("CREATE INDEX person_grams_gram ON person_grams (gram)")
+        for iri, given, family in con.execute("SELECT id, given, family FROM persons").fetchall():
+            con.executemany(
+                "INSERT INTO person_grams VALUES (?, ?)",
+                [(g, iri) for g in name_trigrams(given) | name_trigrams(family)],
+            )
+
+    def set_meta(self, **values: str) -> None:
+        with self._connect() as con:
+            con.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", list(values.items()))
+
+    def meta(self) -> dict:
+        with self._connect() as con:
+            return dict(con.execute("SELECT key, value FROM meta").fetchall())
+
+    def __len__(self) -> int:
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM persons").fetchone()[0]
+
+    def search(
+        self,
+        first: Optional[str],
+        last: Optional[str],
+        orcid: Optional[str] = None,
+        threshold: float = SIMILARITY_THRESHOLD,
+        limit: int = 10,
+    ) -> List[Tuple[str, float]]:
+        """Ranked ``(iri, score)`` candidates; an ORCID hit is returned alone with score 1.0."""
+        with self._connect() as con:
+            key = _orcid_key(orcid)
+            if key:
+                row = con.execute("SELECT id FROM persons WHERE orcid = ? LIMIT 1", (key,)).fetchone()
+                if row:
+                    return [(row[0], 1.0)]
+            grams = sorted(name_trigrams(first) | name_trigrams(last))
+            if not last or not grams:
+                return []
+            self._ensure_grams(con)
+            marks = ",".join("?" * len(grams))
+            rows = con.execute(
+                "SELECT p.id, p.given, p.family FROM persons p JOIN ("
+                f"  SELECT id, COUNT(*) AS shared FROM person_grams WHERE gram IN ({marks})"
+                "  GROUP BY id ORDER BY shared DESC LIMIT ?"
+                ") g ON g.id = p.id",
+                (*grams, max(limit, 1) * 20),
+            ).fetchall()
+        return _rank(rows, first, last, threshold, limit)
+
+    def lookup(
+        self,
+        first: Optional[str],
+        last: Optional[str],
+        orcid: Optional[str] = None,
+        threshold: float = SIMILARITY_THRESHOLD,
+    ) -> Optional[str]:
+        ranked = self.search(first, last, orcid, threshold=threshold, limit=1)
+        return ranked[0][0] if ranked else None
+
+
+def _iter_kg_persons(client, omcore, scope: str, space: Optional[str], page_size: int) -> Iterator[Any]:
+    offset = 0
+    while True:
+        with timed_call("GET", "fairgraph Person.list[page]"):
+            page = omcore.Person.list(
+                client, size=page_size, from_index=offset, scope=scope, space=space,
+                follow_links={"digital_identifiers": {}},
+            )
+        if not page:
+            return
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+
+def _person_orcid(p) -> Optional[str]:
+    ids = getattr(p, "digital_identifiers", None) or []
+    if not isinstance(ids, (list, tuple)):
+        ids = [ids]
+    for d in ids:
+        ident = getattr(d, "identifier", None)
+        if isinstance(ident, str) and "orcid.org" in ident:
+            return ident
+    return None
+
+
+def build_person_index(
+    out: Path,
+    *,
+    token: Optional[str] = None,
+    host: str = "core.kg.ebrains.eu",
+    scope: str = "released",
+    space: Optional[str] = None,
+    page_size: int = 500,
+) -> int:
+    """Snapshot Person entries (id, names, ORCID) from the KG into ``out``."""
+    from fairgraph import KGClient
+    import fairgraph.openminds.core as omcore
+    from .resolver import _best_iri_from_person_obj
+
+    omcore.set_error_handling(None)
+    client = KGClient(host=host, token=token)
+
+    tmp = Path(out).with_suffix(Path(out).suffix + ".tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        index = PersonIndex(tmp, create=True)
+        rows = (
+            (_best_iri_from_person_obj(p, host="kg.ebrains.eu"),
+             getattr(p, "given_name", None), getattr(p, "family_name", None), _person_orcid(p))
+            for p in _iter_kg_persons(client, omcore, scope, space, page_size)
+        )
+        n = index.add(r for r in rows if r[0])
+        index.set_meta(host=host, scope=scope, space=space or "", created=str(int(time.time())))
+        tmp.replace(out)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return n
@@ -0,0 +1,210 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+from contextlib import contextmanager
+import functools, random, sys, threading, time
+
+from . import jsonio
+
+_ACTIVE: List["Profile"] = []
+_LOCK = threading.Lock()
+_STACK = threading.local()
+
+# latencies kept for the percentiles (uniform reservoir beyond this many requests)
+HTTP_SAMPLES = 10000
+
+
+def _peak_rss_kb() -> Optional[int]:
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss // 1024 if sys.platform == "darwin" else rss
+    except ImportError:
+        return None
+
+
+class Profile:
+    """Per-run metrics: stage timings, file/hash counters, HTTP calls per endpoint, peak memory.
+
+    Stages record total and self time (minus stages nested in the same
+    thread); shares of the wall time are computed from self time so nested
+    stages are not counted twice.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.http: Dict[str, Dict[str, Any]] = {}
+        self._latencies: List[float] = []
+        self._requests = 0
+        self.trace_memory = trace_memory
+        self.started = time.time()
+        self.wall_s = 0.0
+        self.peak_rss_kb: Optional[int] = None
+        self.peak_traced_kb: Optional[int] = None
+
+    def add_stage(self, name: str, seconds: float, self_seconds: Optional[float] = None) -> None:
+        with _LOCK:
+            s = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "self_seconds": 0.0})
+            s["calls"] += 1
+            s["seconds"] += seconds
+            s["self_seconds"] += seconds if self_seconds is None else self_seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        with _LOCK:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_http(self, endpoint: str, status: Optional[int], seconds: float, sent: int = 0) -> None:
+        with _LOCK:
+            e = self.http.setdefault(endpoint, {"requests": 0, "seconds": 0.0, "max_s": 0.0,
+                                                "status": {}, "bytes_sent": 0})
+            e["requests"] += 1
+            e["seconds"] += seconds
+            e["max_s"] = max(e["max_s"], seconds)
+            code = str(status) if status is not None else "error"
+            e["status"][code] = e["status"].get(code, 0) + 1
+            e["bytes_sent"] += sent
+            self._requests += 1
+            if len(self._latencies) < HTTP_SAMPLES:
+                self._latencies.append(seconds)
+            else:
+                i = random.randrange(self._requests)
+                if i < HTTP_SAMPLES:
+                    self._latencies[i] = seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        with _LOCK:
+            lat = sorted(self._latencies)
+            by_endpoint = jsonio.loads(jsonio.dumps(self.http, jsonio.COMPACT))
+        return {
+            "wall_s": round(self.wall_s, 6),
+            "stages": {k: {"calls": v["calls"], "seconds": round(v["seconds"], 6),
+                           "self_seconds": round(v["self_seconds"], 6)} for k, v in self.stages.items()},
+            "counters": dict(self.counters),
+            "http": {
+                "requests": self._requests,
+                "seconds": round(sum(e["seconds"] for e in by_endpoint.values()), 6),
+                "p50_s": lat[len(lat) // 2] if lat else None,
+                "p95_s": lat[min(len(lat) - 1, int(len(lat) * 0.95))] if lat else None,
+                "max_s": max((e["max_s"] for e in by_endpoint.values()), default=None),
+                "latency_samples": len(lat),
+                "by_endpoint": by_endpoint,
+            },
+            "peak_rss_kb": self.peak_rss_kb,
+            "peak_traced_kb": self.peak_traced_kb,
+        }
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<24}{'calls':>8}{'seconds':>12}{'self':>12}{'share':>8}"]
+        for name, s in sorted(self.stages.items(), key=lambda x: -x[1]["self_seconds"]):
+            share = s["self_seconds"] / self.wall_s * 100 if self.wall_s else 0.0
+            lines.append(f"{name:<24}{s['calls']:>8}{s['seconds']:>12.3f}{s['self_seconds']:>12.3f}{share:>7.1f}%")
+        lines.append(f"{'total wall time':<32}{self.wall_s:>12.3f}")
+        for k, v in sorted(self.counters.items()):
+            lines.append(f"{k:<32}{v:>12}")
+        d = self.as_dict()["http"]
+        if d["requests"]:
+            lines.append(f"{'http requests':<32}{d['requests']:>12}")
+            lines.append(f"{'http latency p50/p95/max (s)':<32}{d['p50_s']:>.3f}/{d['p95_s']:.3f}/{d['max_s']:.3f}")
+        if self.peak_rss_kb is not None:
+            lines.append(f"{'peak RSS (MiB)':<32}{self.peak_rss_kb / 1024:>12.1f}")
+        if self.peak_traced_kb is not None:
+            lines.append(f"{'peak traced Python heap (MiB)':<32}{self.peak_traced_kb / 1024:>12.1f}")
+        return "\n".join(lines)
+
+    def write_json(self, path: Path) -> None:
+        Path(path).write_bytes(jsonio.dumps(self.as_dict(), jsonio.PRETTY))
+
+
+@contextmanager
+def profile(trace_memory: bool = False):
+    """Collect metrics for everything run inside the block::
+
+        with profile() as prof:
+            patch_openminds(...)
+        print(prof.summary())
+    """
+    prof = Profile(trace_memory=trace_memory)
+    tracing = False
+    if trace_memory:
+        import tracemalloc
+        tracing = not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+    with _LOCK:
+        _ACTIVE.append(prof)
+    t0 = time.perf_counter()
+    try:
+        yield prof
+    finally:
+        prof.wall_s = time.perf_counter() - t0
+        with _LOCK:
+            _ACTIVE.remove(prof)
+        prof.peak_rss_kb = _peak_rss_kb()
+        if trace_memory:
+            import tracemalloc
+            prof.peak_traced_kb = tracemalloc.get_traced_memory()[1] // 1024
+            if tracing:
+                tracemalloc.stop()
+
+
+class stage:
+    """Time a block (or decorated function) as ``name`` in every active profile.
+
+    Time spent in stages nested inside it on the same thread is subtracted
+    from its self time.
+    """
+
+    __slots__ = ("name", "t0", "nested")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.t0 = 0.0
+        self.nested = 0.0
+
+    def __enter__(self):
+        if _ACTIVE:
+            self.t0 = time.perf_counter()
+            self.nested = 0.0
+            stack = getattr(_STACK, "stages", None)
+            if stack is None:
+                stack = _STACK.stages = []
+            stack.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        if self.t0:
+            dt = time.perf_counter() - self.t0
+            stack = getattr(_STACK, "stages", None) or []
+            # normally the top; interleaved coroutines may close stages out of order
+            i = next((i for i in range(len(stack) - 1, -1, -1) if stack[i] is self), None)
+            if i is not None:
+                del stack[i]
+                if i:
+                    stack[i - 1].nested += dt
+            self.t0 = 0.0
+            for p in list(_ACTIVE):
+                p.add_stage(self.name, dt, dt - self.nested)
+        return False
+
+    def __call__(self, fn):
+        name = self.name
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+def count(name: str, n: int = 1) -> None:
+    if _ACTIVE:
+        for p in list(_ACTIVE):
+            p.count(name, n)
+
+
+def record_http(endpoint: str, status: Optional[int], seconds: float, sent: int = 0) -> None:
+    if _ACTIVE:
+        for p in list(_ACTIVE):
+            p.add_http(endpoint, status, seconds, sent)
@@ -0,0 +1,103 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+import threading, time
+
+
+class Cancelled(BaseException):
+    """Raised at the next progress checkpoint after :meth:`Progress.cancel`.
+
+    A ``BaseException`` (like ``asyncio.CancelledError``) so the pipeline's
+    broad ``except Exception`` fallbacks don't swallow it.
+    """
+
+
+class Progress:
+    """Live progress of one job: current stage, ``done``/``total`` items, ETA, cancellation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self.stage: Optional[str] = None
+        self.unit = "files"
+        self.done = 0
+        self.total: Optional[int] = None
+        self.message = ""
+        self.started = time.time()
+        self.stage_started = self.started
+
+    def update(
+        self,
+        stage: Optional[str] = None,
+        done: Optional[int] = None,
+        total: Optional[int] = None,
+        advance: int = 0,
+        unit: Optional[str] = None,
+        message: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            if stage is not None and stage != self.stage:
+                self.stage, self.done, self.total, self.unit = stage, 0, None, "files"
+                self.stage_started = time.time()
+            if total is not None:
+                self.total = total
+            if done is not None:
+                self.done = done
+            self.done += advance
+            if unit is not None:
+                self.unit = unit
+            if message is not None:
+                self.message = message
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def eta_s(self) -> Optional[float]:
+        if not self.total or not self.done:
+            return None
+        rate = self.done / max(time.time() - self.stage_started, 1e-9)
+        return max(self.total - self.done, 0) / rate
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            eta = self.eta_s()
+            return {
+                "stage": self.stage, "done": self.done, "total": self.total, "unit": self.unit,
+                "message": self.message, "elapsed_s": round(time.time() - self.started, 3),
+                "eta_s": round(eta, 1) if eta is not None else None, "cancelled": self.cancelled,
+            }
+
+
+_CURRENT: ContextVar[Optional[Progress]] = ContextVar("bids2ebrains_progress", default=None)
+
+
+@contextmanager
+def tracking(progress: Progress):
+    """Route :func:`report` calls made in this thread/task to ``progress``."""
+    token = _CURRENT.set(progress)
+    try:
+        yield progress
+    finally:
+        _CURRENT.reset(token)
+
+
+def current() -> Optional[Progress]:
+    return _CURRENT.get()
+
+
+def report(stage: Optional[str] = None, **kwargs) -> None:
+    """Progress checkpoint for long loops; a no-op outside :func:`tracking`.
+
+    Raises :class:`Cancelled` once the tracked job has been cancelled.
+    """
+    p = _CURRENT.get()
+    if p is None:
+        return
+    if p.cancelled:
+        raise Cancelled()
+    p.update(stage, **kwargs)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+import sys
+
+from .config import KG_BASE, OM_VOCAB
+from .utils import local_name, read_json
+from . import jsonio, progress
+
+if TYPE_CHECKING:
+    from .uploader import KGSession
+
+FETCH_CHUNK = 100
+FETCH_WORKERS = 4
+ACTIONS = ("create", "update", "unchanged", "elsewhere", "skipped")
+SPACE_KEY = "https://core.kg.ebrains.eu/vocab/meta/space"
+
+# KG bookkeeping added to every stored instance; never part of our payloads
+_KG_META = ("https://core.kg.ebrains.eu/vocab/", "https://schema.hbp.eu/", "http://schema.org/identifier")
+
+
+def _uuid(node_id: str) -> str:
+    return node_id.rstrip("/").rsplit("/", 1)[-1]
+
+
+def normalize(node: Any, vocab: str = OM_VOCAB) -> Any:
+    """Comparable form of a local or KG payload: expanded property IRIs, no KG metadata,
+    one-element lists unwrapped, and no ``@id`` on the node itself or embedded objects."""
+    if isinstance(node, list):
+        items = [normalize(v, vocab) for v in node]
+        return items[0] if len(items) == 1 else items
+    if not isinstance(node, dict):
+        return node
+    if set(node) == {"@id"}:
+        return {"@id": node["@id"]}
+    ctx = node.get("@context")
+    if isinstance(ctx, dict) and isinstance(ctx.get("@vocab"), str):
+        vocab = ctx["@vocab"]
+    out = {}
+    for k, v in node.items():
+        if k == "@context" or k == "@id" or k.startswith(_KG_META):
+            continue
+        key = k if k.startswith("@") or ":" in k else vocab + k
+        out[key] = normalize(v, vocab)
+    return out
+
+
+def fetch_remote(ids: Iterable[str], session: "KGSession", workers: int = FETCH_WORKERS,
+                 chunk: int = FETCH_CHUNK) -> Dict[str, Optional[dict]]:
+    """Current KG payload for each ``@id`` (None when it does not exist), ``chunk`` ids per request."""
+    ids = list(dict.fromkeys(ids))
+    by_uuid = {_uuid(i): i for i in ids}
+    chunks = [list(by_uuid)[i:i + chunk] for i in range(0, len(by_uuid), chunk)]
+    root = KG_BASE.rsplit("/instances", 1)[0]
+    url = f"{root}/instancesByIds?stage=IN_PROGRESS&returnPayload=true&returnEmbedded=true"
+    out: Dict[str, Optional[dict]] = {i: None for i in ids}
+
+    def fetch(uuids: List[str]) -> Dict[str, Any]:
+        resp = session.request("POST", url, uuids)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"KG lookup failed: {resp.status_code} {resp.text[:200]}")
+        return (jsonio.loads(resp.content) or {}).get("data") or {}
+
+    progress.report("reconcile", total=len(chunks), unit="requests")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks) or 1))) as pool:
+        for n, found in enumerate(pool.map(fetch, chunks)):
+            progress.report(done=n + 1)
+            for uid, entry in found.items():
+                data = entry.get("data") if isinstance(entry, dict) else None
+                if data and uid in by_uuid:
+                    out[by_uuid[uid]] = data
+    return out
+
+
+def plan_upload(jsonld_dir: Path, session: "KGSession", skip_controlled_terms: bool = True,
+                workers: int = FETCH_WORKERS, space: Optional[str] = None) -> Dict[str, Any]:
+    """Diff local JSON-LD against the KG: which nodes to create, update or leave alone.
+
+    Each action maps to ``[{"file", "id", "type"}]``; updates also list the
+    ``changed`` properties. Lookups go through ``session``, so a rejected
+    token is renewed like during the upload. With ``space``, nodes whose ``@id`` already exists
+    in another KG space are not diffed but listed under ``elsewhere`` together
+    with that ``space``.
+    """
+    from .uploader import is_controlled
+
+    plan: Dict[str, Any] = {a: [] for a in ACTIONS}
+    local = []
+    for fp in sorted(Path(jsonld_dir).glob("*.jsonld")):
+        payload = read_json(fp)
+        entry = {"file": fp.name, "id": payload.get("@id", ""), "type": local_name(str(payload.get("@type", "")))}
+        if skip_controlled_terms and is_controlled(entry["id"]):
+            plan["skipped"].append(entry)
+        else:
+            local.append((entry, payload))
+
+    remote = fetch_remote([e["id"] for e, _ in local], session, workers=workers)
+    for entry, payload in local:
+        current = remote.get(entry["id"])
+        if current is None:
+            plan["create"].append(entry)
+            continue
+        where = current.get(SPACE_KEY)
+        if space and where and where != space:
+            plan["elsewhere"].append({**entry, "space": where})
+            continue
+        ctx = payload.get("@context")
+        vocab = ctx.get("@vocab", OM_VOCAB) if isinstance(ctx, dict) else OM_VOCAB
+        mine, theirs = normalize(payload, vocab), normalize(current, vocab)
+        changed = sorted(local_name(k) for k in set(mine) | set(theirs)
+                         if jsonio.canonical(mine.get(k)) != jsonio.canonical(theirs.get(k)))
+        if changed:
+            plan["update"].append({**entry, "changed": changed})
+        else:
+            plan["unchanged"].append(entry)
+    return plan
+
+
+def print_plan(plan: Dict[str, Any], out=None) -> None:
+    out = out or sys.stdout
+    for action in ("create", "update"):
+        for e in plan[action]:
+            extra = f"  ({', '.join(e['changed'])})" if e.get("changed") else ""
+            print(f"{action:<9} {e['type'] or '?':<20} {e['file']}{extra}", file=out)
+    for e in plan.get("elsewhere", []):
+        print(f"{'elsewhere':<9} {e['type'] or '?':<20} {e['file']}  (in space {e['space']})", file=out)
+    print(", ".join(f"{len(plan.get(a, []))} {a}" for a in ACTIONS), file=out)
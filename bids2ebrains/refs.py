@@ -0,0 +1,121 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import re
+
+from .utils import read_text, write_json
+from . import profiling, jsonio
+
+Path_ = Tuple[Union[str, int], ...]
+
+_ID_RE = re.compile(r'"@id"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def raw_ids(text: str) -> Set[str]:
+    """All ``@id`` string values in raw JSON text (own id included)."""
+    out = set()
+    for m in _ID_RE.finditer(text):
+        v = m.group(1)
+        out.add(jsonio.loads(f'"{v}"') if "\\" in v else v)
+    return out
+
+
+def iter_refs(value, path: Path_ = ()) -> Iterable[Tuple[Path_, str]]:
+    """Yield ``(path, target)`` for every ``{"@id": ...}`` link at any depth.
+
+    ``path`` addresses the dict holding the ``@id``; the node's own top-level
+    ``@id`` is not a link and is skipped.
+    """
+    if isinstance(value, dict):
+        if path and isinstance(value.get("@id"), str):
+            yield path, value["@id"]
+        for k, v in value.items():
+            if not k.startswith("@"):
+                yield from iter_refs(v, path + (k,))
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            yield from iter_refs(v, path + (i,))
+
+
+def _get(obj, path: Path_):
+    for p in path:
+        obj = obj[p]
+    return obj
+
+
+class ReferenceIndex:
+    """Reverse-reference index: target ``@id`` -> ``[(file, json path), ...]``.
+
+    Files are first filtered on the raw ``@id`` strings they contain, so only
+    files that link to one of ``targets`` are parsed.
+    """
+
+    def __init__(self):
+        self.refs: Dict[str, List[Tuple[Path, Path_]]] = {}
+        self.nodes: Dict[Path, dict] = {}
+
+    @classmethod
+    def build(
+        cls,
+        files: Iterable[Path],
+        targets: Optional[Set[str]] = None,
+        texts: Optional[Dict[Path, str]] = None,
+    ) -> "ReferenceIndex":
+        index = cls()
+        for fp in files:
+            try:
+                text = texts[fp] if texts and fp in texts else read_text(fp)
+            except Exception:
+                continue
+            if targets is not None and not (raw_ids(text) & targets):
+                continue
+            try:
+                with profiling.stage("json-parse"):
+                    obj = jsonio.loads(text)
+            except Exception:
+                continue
+            if not isinstance(obj, dict):
+                continue
+            found = False
+            for path, target in iter_refs(obj):
+                if targets is None or target in targets:
+                    index.refs.setdefault(target, []).append((fp, path))
+                    found = True
+            if found:
+                index.nodes[fp] = obj
+        return index
+
+    def referencing(self, target: str) -> List[Tuple[Path, Path_]]:
+        return self.refs.get(target, [])
+
+    def rewrite(self, mapping: Dict[str, str], dedupe: bool = True) -> List[Path]:
+        """Point every indexed link to ``mapping[target]`` and save the touched files.
+
+        With ``dedupe`` repeated ``{"@id"}`` links left in a list by the rewrite
+        are collapsed. Returns the files written.
+        """
+        touched: Dict[Path, Set[Path_]] = {}
+        for old, new in mapping.items():
+            for fp, path in self.refs.get(old, []):
+                obj = self.nodes[fp]
+                _get(obj, path)["@id"] = new
+                parents = touched.setdefault(fp, set())
+                if path and isinstance(path[-1], int):
+                    parents.add(path[:-1])
+
+        for fp, lists in touched.items():
+            obj = self.nodes[fp]
+            if dedupe:
+                for lp in sorted(lists, key=len, reverse=True):
+                    seq = _get(obj, lp)
+                    seen, out = set(), []
+                    for x in seq:
+                        key = x.get("@id") if isinstance(x, dict) and set(x) == {"@id"} else None
+                        if key is not None:
+                            if key in seen:
+                                continue
+                            seen.add(key)
+                        out.append(x)
+                    seq[:] = out
+            write_json(fp, obj)
+        return list(touched)
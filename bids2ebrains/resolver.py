@@ -1,17 +1,19 @@
 from __future__ import annotations
 
-from typing import Optional
-from difflib import SequenceMatcher
-import unicodedata
+from typing import Optional, List, Sequence, Union, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-SIMILARITY_THRESHOLD = 0.60  
+from .cache import PersonCache, default_person_cache
+from .utils import normalize_name, strip_accents
+from .person_index import PersonIndex, TrigramIndex, SIMILARITY_THRESHOLD
+from .limiter import AdaptiveLimiter, OVERLOAD_STATUS
+from . import profiling, progress
+from .instrumentation import timed_call
 
+MAX_WORKERS = 4
 
-def _strip_accents(s: str) -> str:
-    if not s:
-        return ""
-    nfkd = unicodedata.normalize("NFKD", s)
-    return "".join(c for c in nfkd if not unicodedata.combining(c))
+PersonSpec = Union[Dict[str, str], Tuple[Optional[str], Optional[str], Optional[str]]]
 
 
 def _best_iri_from_person_obj(p, host: str = "kg.ebrains.eu") -> Optional[str]:
@@ -28,6 +30,69 @@ def _best_iri_from_person_obj(p, host: str = "kg.ebrains.eu") -> Optional[str]:
     return None
 
 
+def _normalize_orcid(orcid: Optional[str]) -> Optional[str]:
+    norm = str(orcid or "").strip()
+    if not norm:
+        return None
+    if not norm.startswith("http"):
+        norm = f"https://orcid.org/{norm}"
+    return norm
+
+
+def _cache_key(first, last, orcid, scope: str, host: str, threshold: float = SIMILARITY_THRESHOLD) -> str:
+    orcid_id = (_normalize_orcid(orcid) or "").rsplit("/", 1)[-1].upper()
+    return "|".join((normalize_name(first), normalize_name(last), orcid_id, scope, host.lower(), f"{threshold:.2f}"))
+
+
+@profiling.stage("kg-person-query")
+def _rank(client, omcore, first, last, orcid, scope: str, threshold: float, limit: int) -> List[Tuple[str, float]]:
+    """Query the KG: ORCID first, then trigram-ranked candidates sharing the family name."""
+    norm = _normalize_orcid(orcid)
+    if norm:
+        try:
+            with timed_call("GET", "fairgraph Person.list[orcid]"):
+                matches = omcore.Person.list(client, size=25, scope=scope, orcid=norm)
+            if matches:
+                iri = _best_iri_from_person_obj(matches[0], host="kg.ebrains.eu")
+                if iri:
+                    return [(iri, 1.0)]
+        except Exception:
+            pass
+
+    if not last:
+        return []
+
+    # errors here propagate so that the caller does not cache a failed lookup.
+    # The KG filters on the family name as given (plus its accent-free spelling), so
+    # misspelt family names are only matched by the offline index (see build_person_index).
+    candidates = []
+    for family in dict.fromkeys((last.strip(), strip_accents(last.strip()))):
+        with timed_call("GET", "fairgraph Person.list[family_name]"):
+            candidates += omcore.Person.list(client, size=500, scope=scope, family_name=family) or []
+    if not candidates:
+        return []
+
+    idx = TrigramIndex()
+    seen = set()
+    for p in candidates:
+        iri = _best_iri_from_person_obj(p, host="kg.ebrains.eu")
+        if iri and iri not in seen:
+            seen.add(iri)
+            given = getattr(p, "given_name", None) or getattr(p, "first_name", None) or ""
+            idx.add(iri, given, getattr(p, "family_name", None) or last)
+    return idx.search(first, last, threshold=threshold, limit=limit)
+
+
+def _lookup(client, omcore, first, last, orcid, scope: str, threshold: float = SIMILARITY_THRESHOLD) -> Optional[str]:
+    ranked = _rank(client, omcore, first, last, orcid, scope, threshold, 1)
+    return ranked[0][0] if ranked else None
+
+
+def _open_index(index: Union[str, Path, PersonIndex]) -> PersonIndex:
+    return index if isinstance(index, PersonIndex) else PersonIndex(Path(index))
+
+
+@profiling.stage("person-resolve")
 def resolve_person_iri(
     first: Optional[str],
     last: Optional[str],
@@ -36,57 +101,178 @@ def resolve_person_iri(
     token: Optional[str] = None,
     host: str = "core.kg.ebrains.eu",
     scope: str = "released",
+    cache: Optional[PersonCache] = None,
+    use_cache: bool = True,
+    index: Optional[Union[str, Path, PersonIndex]] = None,
+    threshold: float = SIMILARITY_THRESHOLD,
 ) -> Optional[str]:
+    """Find an existing KG Person: ORCID first, then family name + fuzzy given name.
+
+    With ``index`` (a snapshot from ``build_person_index``) the lookup is done
+    offline against that file and neither the network nor the cache is used.
+    """
+    if index is not None:
+        idx = _open_index(index)
+        try:
+            return idx.lookup(first, last, orcid, threshold=threshold)
+        except Exception:
+            return None
+
+    key = _cache_key(first, last, orcid, scope, host, threshold)
+    if use_cache:
+        try:
+            cache = cache or default_person_cache()
+            hit, iri = cache.get(key)
+            if hit:
+                return iri
+        except Exception:
+            cache = None
+    else:
+        cache = None
+
     try:
         from fairgraph import KGClient
         import fairgraph.openminds.core as omcore
 
         omcore.set_error_handling(None)
         client = KGClient(host=host, token=token)
+        iri = _lookup(client, omcore, first, last, orcid, scope, threshold)
+    except Exception:
+        return None
+
+    if cache is not None:
+        try:
+            cache.put(key, iri)
+        except Exception:
+            pass
+    return iri
+
+
+def _spec_fields(spec: PersonSpec) -> Tuple[str, str, str]:
+    if isinstance(spec, dict):
+        first = spec.get("first") or spec.get("given") or ""
+        last = spec.get("last") or spec.get("family") or ""
+        orcid = spec.get("orcid") or ""
+    else:
+        first, last, orcid = (tuple(spec) + ("", "", ""))[:3]
+    return (first or "").strip(), (last or "").strip(), (orcid or "").strip()
+
+
+@profiling.stage("person-resolve")
+def resolve_persons_batch(
+    specs: Sequence[PersonSpec],
+    *,
+    token: Optional[str] = None,
+    host: str = "core.kg.ebrains.eu",
+    scope: str = "released",
+    cache: Optional[PersonCache] = None,
+    use_cache: bool = True,
+    max_workers: int = MAX_WORKERS,
+    index: Optional[Union[str, Path, PersonIndex]] = None,
+    threshold: float = SIMILARITY_THRESHOLD,
+) -> List[Optional[str]]:
+    """Resolve many ``{"first", "last", "orcid"}`` specs with one KG client.
 
-        if orcid:
-            norm = str(orcid).strip()
-            if norm and not norm.startswith("http"):
-                norm = f"https://orcid.org/{norm}"
+    Identical queries are looked up once, distinct ones concurrently on a
+    bounded pool. Results are returned in input order (``None`` = no match).
+    """
+    fields = [_spec_fields(s) for s in specs]
+    if index is not None:
+        idx = _open_index(index)
+        try:
+            return [idx.lookup(f, l, o, threshold=threshold) for f, l, o in fields]
+        except Exception:
+            return [None] * len(fields)
+
+    keys = [_cache_key(f, l, o, scope, host, threshold) for f, l, o in fields]
+    results: Dict[str, Optional[str]] = {}
 
+    pending: Dict[str, Tuple[str, str, str]] = {}
+    if use_cache:
+        try:
+            cache = cache or default_person_cache()
+        except Exception:
+            cache = None
+    else:
+        cache = None
+    for key, f in zip(keys, fields):
+        if key in results or key in pending:
+            continue
+        if cache is not None:
             try:
-                matches = omcore.Person.list(client, size=25, scope=scope, orcid=norm)
-                if matches:
-                    iri = _best_iri_from_person_obj(matches[0], host="kg.ebrains.eu")
-                    if iri:
-                        return iri
+                hit, iri = cache.get(key)
+                if hit:
+                    results[key] = iri
+                    continue
             except Exception:
                 pass
+        pending[key] = f
 
-        if not last:
-            return None
-
-        candidates = []
+    if pending:
         try:
-            candidates = omcore.Person.list(client, size=500, scope=scope, family_name=last)
+            from fairgraph import KGClient
+            import fairgraph.openminds.core as omcore
+
+            omcore.set_error_handling(None)
+            client = KGClient(host=host, token=token)
         except Exception:
-            return None
+            client = None
 
-        if not candidates:
-            return None
+        if client is not None:
+            workers = max(1, min(max_workers, len(pending)))
+            limiter = AdaptiveLimiter(ceiling=workers, name="person-resolve")
 
-        first_norm = _strip_accents(first or "").lower()
-        best = None
-        best_score = 0.0
+            def work(item):
+                key, (first, last, orcid) = item
+                with limiter.slot() as slot:
+                    try:
+                        iri = _lookup(client, omcore, first, last, orcid, scope, threshold)
+                        slot.status = 200
+                        return key, iri, True
+                    except Exception as e:
+                        # fairgraph only surfaces the HTTP status in the message
+                        slot.status = next((c for c in OVERLOAD_STATUS if str(c) in str(e)), 500)
+                        return key, None, False
 
-        for p in candidates:
-            gn = getattr(p, "given_name", None) or getattr(p, "first_name", None) or ""
-            score = SequenceMatcher(None, _strip_accents(gn).lower(), first_norm).ratio()
-            if score > best_score:
-                best = p
-                best_score = score
+            pool = ThreadPoolExecutor(max_workers=workers)
+            try:
+                for key, iri, ok in pool.map(work, pending.items()):
+                    progress.report()
+                    results[key] = iri
+                    if ok and cache is not None:
+                        try:
+                            cache.put(key, iri)
+                        except Exception:
+                            pass
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
 
-        if best is not None and best_score >= SIMILARITY_THRESHOLD:
-            iri = _best_iri_from_person_obj(best, host="kg.ebrains.eu")
-            if iri:
-                return iri
+    return [results.get(k) for k in keys]
 
-    except Exception:
-        return None
 
-    return None
+def rank_person_candidates(
+    first: Optional[str],
+    last: Optional[str],
+    orcid: Optional[str] = None,
+    *,
+    token: Optional[str] = None,
+    host: str = "core.kg.ebrains.eu",
+    scope: str = "released",
+    index: Optional[Union[str, Path, PersonIndex]] = None,
+    threshold: float = SIMILARITY_THRESHOLD,
+    limit: int = 10,
+) -> List[Tuple[str, float]]:
+    """Ranked ``(iri, score)`` Person candidates, best first, scores in [0, 1]."""
+    idx = _open_index(index) if index is not None else None
+    try:
+        if idx is not None:
+            return idx.search(first, last, orcid, threshold=threshold, limit=limit)
+
+        from fairgraph import KGClient
+        import fairgraph.openminds.core as omcore
+
+        omcore.set_error_handling(None)
+        client = KGClient(host=host, token=token)
+        return _rank(client, omcore, first, last, orcid, scope, threshold, limit)
+    except Exception:
+        return []
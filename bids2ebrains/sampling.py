@@ -0,0 +1,158 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import math, os, random, sys
+
+from .utils import read_json, read_text, sniff_type
+from . import jsonio, profiling, progress
+
+HEAD_BYTES = 4096
+MAX_TYPED = 20000
+Z = 1.96
+
+
+def _head_type(fp: Path) -> str:
+    # @type sits near the top of our files; only read the whole file if the head doesn't show it
+    try:
+        with open(fp, "rb") as fh:
+            head = fh.read(HEAD_BYTES)
+        profiling.count("bytes_read", len(head))
+        t = sniff_type(head.decode("utf-8", "ignore"))
+        if t:
+            return t
+        from .scanner import Scanner
+        return Scanner._type_name(jsonio.loads(read_text(fp))) or "Unknown"
+    except Exception:
+        return "Unreadable"
+
+
+def sample_files(
+    jsonld_dir: Path, per_type: int, seed: int = 0, max_typed: int = MAX_TYPED,
+) -> Tuple[Dict[str, List[Path]], Dict[str, float], int, int]:
+    """Up to ``per_type`` random files of every type.
+
+    Types come from the first bytes of each file. Directories with more than
+    ``max_typed`` files are typed on a uniform random subset of that size and
+    the type sizes scaled up. Returns the sample, the (estimated) number of
+    files per type, the file count and how many files were typed.
+    """
+    rng = random.Random(seed)
+    with os.scandir(jsonld_dir) as it:
+        names = sorted(e.name for e in it if e.name.endswith(".jsonld") and e.is_file())
+    typed = names if len(names) <= max_typed else rng.sample(names, max_typed)
+    by_type: Dict[str, List[Path]] = {}
+    progress.report("sample", total=len(typed))
+    for i, name in enumerate(typed):
+        if i % 500 == 0:
+            progress.report(done=i)
+        fp = Path(jsonld_dir) / name
+        by_type.setdefault(_head_type(fp), []).append(fp)
+    progress.report(done=len(typed))
+    scale = len(names) / len(typed) if typed else 0.0
+    sample = {t: rng.sample(fps, min(per_type, len(fps))) for t, fps in sorted(by_type.items())}
+    population = {t: len(fps) * scale for t, fps in by_type.items()}
+    return sample, population, len(names), len(typed)
+
+
+def wilson(k: int, n: int, population: Optional[float] = None, z: float = Z) -> Tuple[float, float]:
+    """95% Wilson interval of a proportion ``k/n``, narrowed by the finite-population correction."""
+    if n == 0:
+        return 0.0, 1.0
+    p = k / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    lo, hi = max(0.0, centre - half), min(1.0, centre + half)
+    if population:
+        f = math.sqrt(max(0.0, (population - n) / max(population - 1, 1.0)))
+        lo, hi = p - (p - lo) * f, p + (hi - p) * f
+    return lo, hi
+
+
+def _report(kind: str, hits: Dict[str, Dict[str, int]], sample: Dict[str, List[Path]],
+            population: Dict[str, float], files: int, typed: int) -> Dict[str, Any]:
+    # hits: finding -> {type: sampled files with that finding}
+    exact = typed == files and all(len(sample[t]) >= population[t] for t in sample)
+    n_all = sum(len(v) for v in sample.values())
+    estimates: Dict[str, Any] = {}
+    for key, per_type in sorted(hits.items()):
+        est = low = high = 0.0
+        k_total = 0
+        for t, k in per_type.items():
+            # findings that can't be traced to a file are scaled over the whole sample
+            n, pop = (len(sample[t]), population[t]) if t in sample else (n_all, float(files))
+            lo, hi = wilson(k, n, pop)
+            est += pop * k / n if n else 0.0
+            low, high, k_total = low + pop * lo, high + pop * hi, k_total + k
+        estimates[key] = {"sampled": k_total, "estimate": round(est), "low": math.floor(low + 1e-9),
+                         "high": math.ceil(high - 1e-9)}
+    return {
+        "kind": kind,
+        "files": files,
+        "typed": typed,
+        "sampled": n_all,
+        "exact": exact,
+        "types": {t: {"files": round(population[t]), "sampled": len(v)} for t, v in sample.items()},
+        "estimates": estimates,
+    }
+
+
+def sample_scan(jsonld_dir: Path, per_type: int, seed: int = 0) -> Dict[str, Any]:
+    """Estimated number of files missing each mandatory ``Type.key``, with 95% bounds."""
+    from .scanner import Scanner
+
+    sample, population, files, typed = sample_files(Path(jsonld_dir), per_type, seed)
+    hits: Dict[str, Dict[str, int]] = {}
+    for t, fps in sample.items():
+        for fp in fps:
+            try:
+                _, miss = Scanner.missing(read_json(fp))
+            except Exception:
+                continue
+            for k in miss:
+                per_type = hits.setdefault(f"{t}.{k}", {})
+                per_type[t] = per_type.get(t, 0) + 1
+    return _report("scan", hits, sample, population, files, typed)
+
+
+def sample_validate(jsonld_dir: Path, per_type: int, seed: int = 0) -> Dict[str, Any]:
+    """Validate a stratified sample; estimated number of files per error, with 95% bounds.
+
+    Links to nodes outside the sample are not followed, so reference errors
+    are not estimated.
+    """
+    from .validator import _validate_dir
+
+    jsonld_dir = Path(jsonld_dir)
+    sample, population, files, typed = sample_files(jsonld_dir, per_type, seed)
+    # errors name the file (Path) or, for openMINDS failures, the node @id (str)
+    type_of: Dict[Union[Path, str], str] = {}
+    for t, fps in sample.items():
+        for fp in fps:
+            type_of[fp] = t
+            try:
+                type_of[str(read_json(fp).get("@id", ""))] = t
+            except Exception:
+                pass
+    errors = _validate_dir(jsonld_dir, [fp for fps in sample.values() for fp in fps])
+    seen: Dict[str, set] = {}
+    for where, msg in errors:
+        t = type_of.get(where, "?")
+        key = msg.split("Missing mandatory field: ", 1)[1] if msg.startswith("Missing mandatory field: ") \
+            else f"{t}: {msg}"
+        seen.setdefault(key, {}).setdefault(t, set()).add(str(where))
+    hits = {key: {t: len(w) for t, w in per_type.items()} for key, per_type in seen.items()}
+    return _report("validate", hits, sample, population, files, typed)
+
+
+def print_sample_report(rep: Dict[str, Any], out=None) -> None:
+    out = out or sys.stdout
+    basis = "all files" if rep["exact"] else f"{rep['sampled']} sampled of {rep['files']} files"
+    print(f"{rep['kind']} preview ({basis}; types from {rep['typed']} file heads)", file=out)
+    for t, v in rep["types"].items():
+        print(f"  {t:<24}{v['sampled']:>6} / {v['files']}", file=out)
+    if not rep["estimates"]:
+        print("no findings in the sample", file=out)
+    for key, e in rep["estimates"].items():
+        bounds = "" if rep["exact"] else f"  (95%: {e['low']}-{e['high']})"
+        print(f"{key:<48} ~{e['estimate']}{bounds}", file=out)
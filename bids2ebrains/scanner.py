@@ -1,7 +1,22 @@
 from __future__ import annotations
 from pathlib import Path
 from typing import Dict, List, Tuple
-import json
+
+from .utils import read_json, read_text, sniff_type
+from . import jsonio, progress
+
+class ScanReport(dict):
+    """``{file: [missing keys]}`` plus ``types``: the openMINDS type of every scanned file."""
+
+    def __init__(self):
+        super().__init__()
+        self.types: Dict[Path, str] = {}
+
+    def type_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for t in self.types.values():
+            counts[t] = counts.get(t, 0) + 1
+        return counts
 
 class Scanner:
     MANDATORY: Dict[str, List[str]] = {
@@ -33,18 +48,39 @@ class Scanner:
         return None
 
     @classmethod
-    def scan(cls, jsonld_dir: Path) -> Tuple[Dict[Path, List[str]], Dict[str, str]]:
-        report: Dict[Path, List[str]] = {}
+    def types(cls, jsonld_dir: Path) -> Dict[Path, str]:
+        """Type name of every ``*.jsonld`` file, sniffed from the raw text (full parse only as fallback)."""
+        out: Dict[Path, str] = {}
+        for fp in Path(jsonld_dir).glob("*.jsonld"):
+            try:
+                text = read_text(fp)
+                out[fp] = sniff_type(text) or cls._type_name(jsonio.loads(text)) or "Unknown"
+            except Exception:
+                out[fp] = "Unreadable"
+        return out
+
+    @classmethod
+    def missing(cls, payload) -> Tuple[str | None, List[str]]:
+        """Type name of a node and its empty mandatory keys."""
+        typ = cls._type_name(payload)
+        must = cls.MANDATORY.get(typ, []) if typ else []
+        return typ, [k for k in must if k not in payload or payload[k] in ("", [], None)]
+
+    @classmethod
+    def scan(cls, jsonld_dir: Path) -> Tuple[ScanReport, Dict[str, str]]:
+        report = ScanReport()
         prompts: Dict[str, str] = {}
-        for fp in jsonld_dir.glob("*.jsonld"):
-            payload = json.loads(fp.read_text())
-            typ = cls._type_name(payload)
+        files = list(jsonld_dir.glob("*.jsonld"))
+        progress.report("scan", total=len(files))
+        for i, fp in enumerate(files):
+            progress.report(done=i)
+            typ, miss = cls.missing(read_json(fp))
             if not typ:
                 continue
-            must = cls.MANDATORY.get(typ, [])
-            miss = [k for k in must if k not in payload or payload[k] in ("", [], None)]
+            report.types[fp] = typ
             if miss:
                 report[fp] = miss
                 for k in miss:
                     prompts.setdefault(f"{typ}.{k}", f"Enter value for {typ}.{k}: ")
+        progress.report(done=len(files))
         return report, prompts
@@ -0,0 +1,197 @@
+from __future__ import annotations
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Any, Optional
+import hmac, logging, os, re, secrets, threading, time
+
+from .config import CACHE_DIR
+from . import jsonio
+from .jobs import JobManager, JOB_KINDS, warm
+
+log = logging.getLogger(__name__)
+
+_JOB_RE = re.compile(r"^/jobs/([0-9a-f]+)(/cancel)?/?$")
+
+SECRET_FILE = Path(CACHE_DIR) / "service.secret"
+
+
+def write_secret(path: Path) -> str:
+    """New random bearer secret in ``path``, readable by the owner only."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    secret = secrets.token_urlsafe(32)
+    path.unlink(missing_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as fh:
+        fh.write(secret + "\n")
+    return secret
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON API:
+
+    - ``GET /health``               warm-up timings, worker count, job counts
+    - ``POST /jobs``                ``{"kind": "convert|scan|patch|validate|upload", "params": {...}}``
+    - ``GET /jobs``                 all jobs
+    - ``GET /jobs/<id>``            state, progress (stage, done/total, ETA), result or error
+    - ``POST /jobs/<id>/cancel``    (or ``DELETE /jobs/<id>``) cancel a queued or running job
+
+    Over TCP every request needs ``Authorization: Bearer <secret>``; the Unix
+    socket relies on its file permissions.
+    """
+
+    server_version = "bids2ebrains"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def manager(self) -> JobManager:
+        return self.server.manager
+
+    def _reply(self, code: int, obj: Any) -> None:
+        body = jsonio.dumps(obj, jsonio.COMPACT)
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> Any:
+        n = int(self.headers.get("Content-Length") or 0)
+        return jsonio.loads(self.rfile.read(n)) if n else {}
+
+    def _authorized(self) -> bool:
+        secret = getattr(self.server, "secret", None)
+        if secret is None:
+            return True
+        given = self.headers.get("Authorization", "")
+        if hmac.compare_digest(given.encode("utf-8"), f"Bearer {secret}".encode("utf-8")):
+            return True
+        self._reply(401, {"error": "unauthorized"})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") == "/health":
+            states = {}
+            for job in self.manager.list():
+                states[job.state] = states.get(job.state, 0) + 1
+            return self._reply(200, {
+                "status": "ok", "pid": os.getpid(), "uptime_s": round(time.time() - self.server.started, 1),
+                "workers": self.manager.workers, "kinds": sorted(JOB_KINDS), "warm": self.server.warm,
+                "jobs": states,
+            })
+        if self.path.rstrip("/") == "/jobs":
+            return self._reply(200, [j.as_dict() for j in self.manager.list()])
+        m = _JOB_RE.match(self.path)
+        job = self.manager.get(m.group(1)) if m and not m.group(2) else None
+        if job is None:
+            return self._reply(404, {"error": "not found"})
+        out = job.as_dict()
+        if job.traceback:
+            out["traceback"] = job.traceback
+        return self._reply(200, out)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") == "/jobs":
+            try:
+                req = self._body()
+                job = self.manager.submit(req.get("kind", ""), req.get("params") or {})
+            except Exception as e:
+                return self._reply(400, {"error": f"{type(e).__name__}: {e}"})
+            return self._reply(202, job.as_dict())
+        m = _JOB_RE.match(self.path)
+        if m and m.group(2):
+            return self._cancel(m.group(1))
+        return self._reply(404, {"error": "not found"})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        m = _JOB_RE.match(self.path)
+        if m and not m.group(2):
+            return self._cancel(m.group(1))
+        return self._reply(404, {"error": "not found"})
+
+    def _cancel(self, job_id: str):
+        job = self.manager.get(job_id)
+        if job is None:
+            return self._reply(404, {"error": "not found"})
+        self.manager.cancel(job_id)
+        return self._reply(202, job.as_dict())
+
+    def log_message(self, fmt, *args):
+        log.debug("%s " + fmt, self.command, *args)
+
+
+class _UnixServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    manager: JobManager,
+    host: str = "127.0.0.1",
+    port: int = 8766,
+    socket_path: Optional[Path] = None,
+    secret: Optional[str] = None,
+):
+    """HTTP server bound to ``host:port``, or to a Unix socket when ``socket_path`` is given.
+
+    A TCP server requires ``secret`` as bearer token.
+    """
+    if socket_path:
+        socket_path = Path(socket_path)
+        if socket_path.exists():
+            socket_path.unlink()
+        server = _UnixServer(str(socket_path), _Handler)
+        os.chmod(socket_path, 0o600)
+    else:
+        if not secret:
+            raise ValueError("a TCP job service needs a secret")
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+        server.secret = secret
+    server.manager = manager
+    server.started = time.time()
+    server.warm = {}
+    return server
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8766,
+    socket_path: Optional[Path] = None,
+    workers: int = 2,
+    use_caches: bool = True,
+    secret_file: Optional[Path] = None,
+) -> None:
+    """Warm imports and caches once, then serve jobs until interrupted.
+
+    Over TCP a fresh bearer secret is written to ``secret_file`` (default
+    ``CACHE_DIR/service.secret``, mode 0600) and removed on shutdown.
+    """
+    secret = None
+    if not socket_path:
+        secret_file = Path(secret_file or SECRET_FILE)
+        secret = write_secret(secret_file)
+    manager = JobManager(workers=workers, use_caches=use_caches)
+    server = make_server(manager, host, port, socket_path, secret=secret)
+    threading.Thread(target=lambda: server.warm.update(warm()), daemon=True).start()
+    where = socket_path or f"http://{host}:{server.server_address[1]}"
+    print(f"bids2ebrains service on {where} ({workers} workers)", flush=True)
+    if secret:
+        print(f"bearer secret in {secret_file}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        manager.shutdown()
+        if socket_path and Path(socket_path).exists():
+            Path(socket_path).unlink()
+        if secret:
+            secret_file.unlink(missing_ok=True)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Sequence
+import random, struct
+
+from .utils import write_json
+
+MODALITIES = ("anat", "func", "dwi")
+
+
+def _nifti_header(shape: Sequence[int]) -> bytes:
+    """Minimal single-file NIfTI-1 header (int16 data at offset 352)."""
+    dim = [len(shape), *shape] + [1] * (7 - len(shape))
+    hdr = bytearray(348)
+    struct.pack_into("<i", hdr, 0, 348)
+    struct.pack_into("<8h", hdr, 40, *dim)
+    struct.pack_into("<hh", hdr, 70, 4, 16)                   # datatype int16, bitpix
+    struct.pack_into("<8f", hdr, 76, 1.0, *([1.0] * 7))       # pixdim
+    struct.pack_into("<f", hdr, 108, 352.0)                   # vox_offset
+    struct.pack_into("<f", hdr, 112, 1.0)                     # scl_slope
+    struct.pack_into("<h", hdr, 254, 1)                       # sform_code
+    struct.pack_into("<4f", hdr, 280, 1, 0, 0, 0)
+    struct.pack_into("<4f", hdr, 296, 0, 1, 0, 0)
+    struct.pack_into("<4f", hdr, 312, 0, 0, 1, 0)
+    hdr[344:348] = b"n+1\0"
+    return bytes(hdr) + b"\0" * 4
+
+
+def _write_nifti(path: Path, shape: Sequence[int], size: int, sparse: bool) -> None:
+    head = _nifti_header(shape)
+    size = max(size, len(head) + 2 * _prod(shape))
+    with open(path, "wb") as fh:
+        fh.write(head)
+        if sparse:
+            fh.truncate(size)
+        else:
+            remaining = size - len(head)
+            block = b"\0" * (1024 * 1024)
+            while remaining > 0:
+                n = min(remaining, len(block))
+                fh.write(block[:n])
+                remaining -= n
+
+
+def _prod(xs: Sequence[int]) -> int:
+    n = 1
+    for x in xs:
+        n *= x
+    return n
+
+
+def generate_bids(
+    root: Path,
+    subjects: int = 10,
+    sessions: int = 1,
+    runs: int = 1,
+    modalities: Sequence[str] = MODALITIES,
+    file_size: int = 0,
+    sparse: bool = True,
+    seed: int = 0,
+) -> Path:
+    """Write a synthetic BIDS dataset under ``root`` and return ``root``.
+
+    Imaging files are uncompressed ``.nii`` padded to ``file_size`` bytes; with
+    ``sparse`` the padding is a hole, so multi-GB datasets cost no disk space.
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    write_json(root / "dataset_description.json", {
+        "Name": f"Synthetic dataset ({subjects} subjects)",
+        "BIDSVersion": "1.8.0",
+        "License": "CC0",
+        "Authors": ["Jane Doe", "John Roe"],
+    })
+    (root / "README").write_text("Synthetic BIDS dataset generated by bids2ebrains.synthetic.\n")
+
+    rows = ["participant_id\tage\tsex\tgroup"]
+    for s in range(1, subjects + 1):
+        rows.append(f"sub-{s:03d}\t{rng.randint(18, 80)}\t{rng.choice('MF')}\t{rng.choice(['control', 'patient'])}")
+    (root / "participants.tsv").write_text("\n".join(rows) + "\n")
+
+    if "func" in modalities:
+        write_json(root / "task-rest_bold.json", {"TaskName": "rest", "RepetitionTime": 2.0})
+
+    for s in range(1, subjects + 1):
+        sub = f"sub-{s:03d}"
+        for ses_i in range(1, sessions + 1):
+            ses = f"ses-{ses_i:02d}" if sessions > 1 else None
+            base = root / sub / ses if ses else root / sub
+            prefix = f"{sub}_{ses}" if ses else sub
+            for mod in modalities:
+                d = base / mod
+                d.mkdir(parents=True, exist_ok=True)
+                for r in range(1, runs + 1):
+                    run = f"_run-{r:02d}" if runs > 1 else ""
+                    if mod == "anat":
+                        _write_nifti(d / f"{prefix}{run}_T1w.nii", (4, 4, 4), file_size, sparse)
+                    elif mod == "func":
+                        stem = f"{prefix}_task-rest{run}_bold"
+                        _write_nifti(d / f"{stem}.nii", (4, 4, 4, 3), file_size, sparse)
+                        write_json(d / f"{stem}.json", {"TaskName": "rest", "RepetitionTime": 2.0})
+                    elif mod == "dwi":
+                        stem = f"{prefix}{run}_dwi"
+                        _write_nifti(d / f"{stem}.nii", (4, 4, 4, 3), file_size, sparse)
+                        (d / f"{stem}.bval").write_text("0 1000 1000\n")
+                        (d / f"{stem}.bvec").write_text("0 1 0\n0 0 1\n0 0 0\n")
+    return root
@@ -1,14 +1,172 @@
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
-import os, json, requests
+from typing import Any, Optional, Tuple
+import os, threading, time, requests
 
-from .config import KG_BASE
+from .config import KG_BASE, KG_MIN_CONCURRENCY, KG_MAX_CONCURRENCY
+from .auth import TokenProvider, token_provider
+from .limiter import AdaptiveLimiter, OVERLOAD_STATUS
+from .utils import read_json
+from . import jsonio
+from . import instrumentation, progress
+
+def _send(method: str, url: str, headers: dict, payload: dict, reason: Optional[str] = None,
+          session: Optional[requests.Session] = None) -> requests.Response:
+    data = jsonio.dumps(payload, jsonio.COMPACT)
+    t0 = time.perf_counter()
+    status, received, err = None, 0, None
+    try:
+        resp = (session or requests).request(method, url, headers=headers, data=data, timeout=30)
+        status, received = resp.status_code, len(resp.content or b"")
+        return resp
+    except Exception as e:
+        err = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        instrumentation.emit(
+            method, url, status, time.perf_counter() - t0, len(data), received,
+            retry=reason is not None, reason=reason, error=err,
+        )
+
+CONTROLLED_PREFIXES = (
+    "openminds.ebrains.eu/instances/",
+    "openminds.om-i.org/instances/",
+)
+
+def is_controlled(node_id: str) -> bool:
+    return any(d in node_id for d in CONTROLLED_PREFIXES)
+
+def resolve_token(token: Optional[str] = None) -> str:
+    token = token or os.getenv("EBRAINS_TOKEN") or os.getenv("HBP_TOKEN")
+    if not token:
+        raise RuntimeError("Missing token. Set EBRAINS_TOKEN.")
+    if os.getenv("HBP_TOKEN") and not os.getenv("EBRAINS_TOKEN"):
+        print("[warning] HBP_TOKEN is deprecated; please migrate to EBRAINS_TOKEN.")
+    return token
+
+def kg_headers(token: str) -> dict:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/ld+json",
+        "Accept": "application/ld+json",
+    }
+
+class KGSession:
+    """Pooled keep-alive connections to the KG with the bearer token taken from a
+    :class:`~bids2ebrains.auth.TokenProvider`; a 401 asks the provider for a fresh
+    token and repeats the request once."""
+
+    def __init__(self, provider: TokenProvider, pool_size: int = KG_MAX_CONCURRENCY):
+        from requests.adapters import HTTPAdapter
+        self.provider = provider
+        self.auth_retries = 0
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def __enter__(self) -> "KGSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._session.close()
+
+    def headers(self) -> dict:
+        return kg_headers(self.provider.token())
+
+    def request(self, method: str, url: str, payload: dict, reason: Optional[str] = None) -> requests.Response:
+        token = self.provider.token()
+        resp = _send(method, url, kg_headers(token), payload, reason=reason, session=self._session)
+        if resp.status_code == 401:
+            fresh = self.provider.refresh(token)
+            if fresh != token:
+                self.auth_retries += 1
+                resp = _send(method, url, kg_headers(fresh), payload, reason="401-refresh", session=self._session)
+        return resp
+
+MAX_RETRIES = 5
+
+def _retry_after(resp: requests.Response, attempt: int) -> float:
+    try:
+        return min(float(resp.headers.get("Retry-After", "")), 60.0)
+    except ValueError:
+        return min(0.5 * 2 ** attempt, 30.0)
 
 class Uploader:
-    def __init__(self, space: str, token: Optional[str] = None):
+    def __init__(
+        self,
+        space: str,
+        token: Optional[str] = None,
+        min_concurrency: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        token_provider: Optional[TokenProvider] = None,
+    ):
         self.space = space
         self.token = token
+        self.token_provider = token_provider
+        self.limiter = AdaptiveLimiter(
+            floor=min_concurrency or KG_MIN_CONCURRENCY,
+            ceiling=max_concurrency or KG_MAX_CONCURRENCY,
+            name="upload",
+        )
+
+    def _request(self, session: KGSession, method: str, url: str, payload: dict,
+                 reason: Optional[str] = None) -> requests.Response:
+        # one KG call under the adaptive limit; 429/5xx gateway answers and transport errors
+        # (connection reset, timeout) are retried after backing off
+        for attempt in range(MAX_RETRIES + 1):
+            with self.limiter.slot() as slot:
+                try:
+                    resp = session.request(method, url, payload, reason=reason)
+                except requests.RequestException:
+                    # the slot goes back with status None, which the limiter counts as overload
+                    if attempt == MAX_RETRIES:
+                        raise
+                    resp = None
+                else:
+                    slot.status = resp.status_code
+            if resp is None:
+                reason = "error-retry"
+                time.sleep(min(0.5 * 2 ** attempt, 30.0))
+                continue
+            if resp.status_code not in OVERLOAD_STATUS or attempt == MAX_RETRIES:
+                return resp
+            reason = f"{resp.status_code}-retry"
+            time.sleep(_retry_after(resp, attempt))
+        return resp
+
+    def _upload_one(self, fp: Path, session: KGSession, actions, overwrite: bool, skip_controlled_terms: bool,
+                    dry_run: bool, stop: threading.Event) -> Tuple[str, Any]:
+        if stop.is_set():
+            return "cancelled", None
+        payload = read_json(fp)
+        if skip_controlled_terms and is_controlled(payload.get("@id", "")):
+            return "skipped", None
+        action = actions.get(fp.name) if actions is not None else None
+        if action == "unchanged":
+            return "unchanged", None
+        if action == "elsewhere":
+            return "elsewhere", None
+        if dry_run or (action == "update" and not overwrite):
+            return ("dry-run" if dry_run else "skipped"), None
+
+        iid = payload.get("@id", "").split("/")[-1]
+        try:
+            if action == "update":
+                resp = self._request(session, "PUT", f"{KG_BASE}/{iid}?space={self.space}", payload)
+            else:
+                resp = self._request(session, "POST", f"{KG_BASE}?space={self.space}", payload)
+                if resp.status_code == 409 and overwrite and action is None:
+                    resp = self._request(session, "PUT", f"{KG_BASE}/{iid}?space={self.space}", payload,
+                                         reason="409-put")
+        except requests.RequestException as e:
+            # still failing after MAX_RETRIES: a rejected node, not a crash of the whole upload
+            return "error", e
+        return ("uploaded" if resp.ok else "failed"), resp
 
     def upload_dir(
         self,
@@ -16,48 +174,65 @@ class Uploader:
         overwrite: bool = True,
         skip_controlled_terms: bool = True,
         dry_run: bool = False,
+        reconcile: bool = False,
     ):
-        token = self.token or os.getenv("EBRAINS_TOKEN") or os.getenv("HBP_TOKEN")
-        if not token:
-            raise RuntimeError("Missing token. Set EBRAINS_TOKEN.")
-        if os.getenv("HBP_TOKEN") and not os.getenv("EBRAINS_TOKEN"):
-            print("[warning] HBP_TOKEN is deprecated; please migrate to EBRAINS_TOKEN.")
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/ld+json",
-            "Accept": "application/ld+json",
-        }
-
-        for fp in Path(jsonld_dir).glob("*.jsonld"):
-            payload = json.loads(fp.read_text())
-
-            cid = payload.get("@id", "")
-            is_controlled = any(
-                d in cid
-                for d in (
-                    "openminds.ebrains.eu/instances/",
-                    "openminds.om-i.org/instances/",
-                )
-            )
-            if skip_controlled_terms and is_controlled:
-                continue
-
-            if dry_run:
-                print("[dry-run]", fp.stem)
-                continue
+        """POST every node (PUT on 409 when ``overwrite``).
 
-            post = requests.post(f"{KG_BASE}?space={self.space}", headers=headers, json=payload, timeout=30)
+        Requests run concurrently under :class:`~bids2ebrains.limiter.AdaptiveLimiter`;
+        after the first rejected node no further uploads start.
+        With ``reconcile`` the KG is asked first (see :func:`bids2ebrains.reconcile.plan_upload`):
+        only new nodes are POSTed, changed ones PUT, unchanged ones not sent.
+        Nodes that already live in another space are not sent either; they are
+        reported and counted as skipped.
+        The token comes from ``token_provider`` (default: :func:`bids2ebrains.auth.token_provider`)
+        and is renewed on 401, so uploads outlive a single access token.
+        """
+        provider = self.token_provider or token_provider(self.token)
+        session = KGSession(provider, pool_size=self.limiter.ceiling)
 
-            if post.status_code == 409 and overwrite:
-                iid = payload["@id"].split("/")[-1]
-                put = requests.put(f"{KG_BASE}/{iid}?space={self.space}", headers=headers, json=payload, timeout=30)
-                resp = put
-            else:
-                resp = post
-
-            if resp.ok:
-                print("✓", fp.stem)
-            else:
-                print("✗", fp.stem, resp.status_code, resp.text)
-                break
+        result = {"uploaded": 0, "skipped": 0, "unchanged": 0, "failed": []}
+        actions = None
+        if reconcile:
+            from .reconcile import plan_upload
+            plan = plan_upload(Path(jsonld_dir), session, skip_controlled_terms, space=self.space)
+            actions = {e["file"]: a for a in ("create", "update", "unchanged", "elsewhere") for e in plan[a]}
+        files = list(Path(jsonld_dir).glob("*.jsonld"))
+        progress.report("upload", total=len(files))
+        stop = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=self.limiter.ceiling, thread_name_prefix="b2e-upload")
+        try:
+            futures = {
+                pool.submit(self._upload_one, fp, session, actions, overwrite, skip_controlled_terms, dry_run, stop): fp
+                for fp in files
+            }
+            for i, fut in enumerate(as_completed(futures)):
+                progress.report(done=i)
+                fp = futures[fut]
+                outcome, resp = fut.result()
+                if outcome == "uploaded":
+                    print("✓", fp.stem)
+                    result["uploaded"] += 1
+                elif outcome == "failed":
+                    print("✗", fp.stem, resp.status_code, resp.text)
+                    result["failed"].append((fp.stem, resp.status_code))
+                    stop.set()
+                elif outcome == "error":
+                    print("✗", fp.stem, resp)
+                    result["failed"].append((fp.stem, None))
+                    stop.set()
+                elif outcome == "dry-run":
+                    print("[dry-run]", fp.stem)
+                    result["skipped"] += 1
+                elif outcome == "elsewhere":
+                    print("-", fp.stem, "exists in another space, not sent")
+                    result["skipped"] += 1
+                elif outcome in ("skipped", "unchanged"):
+                    result[outcome] += 1
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            session.close()
+        result["concurrency"] = self.limiter.as_dict()
+        result["auth_retries"] = session.auth_retries
+        progress.report(done=len(files))
+        return result
@@ -1,20 +1,127 @@
 from __future__ import annotations
 import hashlib
-from typing import Tuple
-import re
+from pathlib import Path
+from typing import Iterable, Tuple, Optional, Any, Union
+import os, re, unicodedata
 
-def sha256_and_size(path: str) -> Tuple[str, int]:
+from . import profiling, jsonio, progress
+
+@profiling.stage("hash")
+def sha256_and_size(path: str, cache=None) -> Tuple[str, int]:
+    """``cache`` is an optional :class:`~bids2ebrains.cache.HashCache`."""
+    if cache is not None:
+        hit = cache.get(path)
+        if hit:
+            profiling.count("hash_cache_hits")
+            return hit
+        st = os.stat(path)
     h = hashlib.sha256()
     size = 0
     with open(path, "rb") as fh:
         for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            progress.report()
             size += len(chunk)
             h.update(chunk)
+    profiling.count("files_hashed")
+    profiling.count("bytes_hashed", size)
+    if cache is not None:
+        cache.put(path, h.hexdigest(), size, st)
     return h.hexdigest(), size
 
+def content_digest(files: Iterable[Union[str, Path]]) -> str:
+    """SHA-256 over the names and contents of ``files`` (order-independent)."""
+    h = hashlib.sha256()
+    for fp in sorted(Path(f) for f in files):
+        h.update(fp.name.encode("utf-8") + b"\0")
+        h.update(hashlib.sha256(read_bytes(fp)).digest())
+    return h.hexdigest()
+
+def dir_fingerprint(path: Union[str, Path], pattern: str = "*.jsonld") -> str:
+    """Cheap fingerprint of the files matching ``pattern``: count, total size and newest mtime."""
+    count = size = newest = 0
+    for fp in Path(path).glob(pattern):
+        try:
+            st = fp.stat()
+        except OSError:
+            continue
+        count += 1
+        size += st.st_size
+        newest = max(newest, st.st_mtime_ns)
+    return f"{count}:{size}:{newest}"
+
+def tree_fingerprint(root: Union[str, Path]) -> str:
+    """Cheap change detector for a directory tree (or archive file): relative paths, sizes and mtimes (no reads)."""
+    root = Path(root)
+    h = hashlib.sha256()
+    if root.is_file():  # an archive
+        st = root.stat()
+        h.update(f"{root.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+        return h.hexdigest()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            fp = os.path.join(dirpath, name)
+            try:
+                st = os.stat(fp)
+            except OSError:
+                continue
+            h.update(f"{os.path.relpath(fp, root)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def read_text(fp: Union[str, Path]) -> str:
+    return read_bytes(fp).decode("utf-8")
+
+def read_bytes(fp: Union[str, Path]) -> bytes:
+    data = Path(fp).read_bytes()
+    profiling.count("files_read")
+    profiling.count("bytes_read", len(data))
+    return data
+
+def read_json(fp: Union[str, Path]) -> Any:
+    data = read_bytes(fp)
+    with profiling.stage("json-parse"):
+        return jsonio.loads(data)
+
+def write_json(fp: Union[str, Path], obj: Any, style: Optional[str] = None) -> None:
+    with profiling.stage("json-serialise"):
+        data = jsonio.dumps(obj, style)
+    Path(fp).write_bytes(data)
+    profiling.count("files_written")
+    profiling.count("bytes_written", len(data))
+
 def local_name(uri: str) -> str:
     return uri.rsplit("/", 1)[-1].rsplit("#", 1)[-1]
 
 def is_iri(s: str) -> bool:
     return isinstance(s, str) and bool(re.match(r"^https?://", s))
 
+
+def strip_accents(s: str) -> str:
+    if not s:
+        return ""
+    nfkd = unicodedata.normalize("NFKD", s)
+    return "".join(c for c in nfkd if not unicodedata.combining(c))
+
+def normalize_name(s: str) -> str:
+    return " ".join(strip_accents(s or "").lower().split())
+
+_TYPE_RE = re.compile(r'"@type"\s*:\s*(?:"([^"]*)"|\[([^\]]*)\])')
+_FLAT_CONTEXT_RE = re.compile(r'"@context"\s*:\s*\{[^{}]*\}')
+
+def sniff_type(text: str) -> Optional[str]:
+    """Local type name from raw JSON-LD text without parsing it.
+
+    Only trusted when the ``@type`` comes before any embedded object (a flat
+    ``@context`` aside), which holds for files written by bids2openminds and
+    by this package. Otherwise the match may belong to a nested node, so
+    None is returned and callers fall back to a full parse.
+    """
+    m = _TYPE_RE.search(text)
+    if not m:
+        return None
+    if _FLAT_CONTEXT_RE.sub("", text[:m.start()], count=1).count("{") > 1:
+        return None
+    if m.group(1) is not None:
+        return local_name(m.group(1)) or None
+    items = re.findall(r'"([^"]*)"', m.group(2) or "")
+    return local_name(items[-1]) if items else None
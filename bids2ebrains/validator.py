@@ -1,21 +1,25 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Tuple
-import json
+from typing import List, Optional, Tuple, Union
+from contextvars import ContextVar
+import hashlib
 
 from .scanner import Scanner
-from .utils import local_name
+from .utils import local_name, read_json, content_digest
+from .cache import ValidationCache
+from . import profiling, progress
 
-_LAST_VALIDATION_MODE = "unknown"
+# Per thread / asyncio task, so concurrent validations (service jobs, UI sessions) don't clobber each other.
+_VALIDATION_MODE: ContextVar[str] = ContextVar("bids2ebrains_validation_mode", default="unknown")
 def get_last_validation_mode() -> str:
-    return _LAST_VALIDATION_MODE
+    return _VALIDATION_MODE.get()
 
 
 def _minimal_validate_file(fp: Path) -> List[Tuple[Path, str]]:
     """Schema-light validation that never crashes and gives actionable messages."""
     errs: List[Tuple[Path, str]] = []
     try:
-        payload = json.loads(fp.read_text())
+        payload = read_json(fp)
     except Exception as e:
         errs.append((fp, f"Unreadable JSON-LD: {e}"))
         return errs
@@ -48,12 +52,57 @@ def _minimal_validate_file(fp: Path) -> List[Tuple[Path, str]]:
     return errs
 
 
-def validate_dir(jsonld_dir: Path) -> List[Tuple[Path, str]]:
-    global _LAST_VALIDATION_MODE
-    _LAST_VALIDATION_MODE = "unknown"
+def _validator_tag() -> str:
+    # results depend on the openMINDS release (or its absence -> basic checks) as much as on the files
+    try:
+        from importlib.metadata import version
+        om = version("openMINDS")
+    except Exception:
+        om = None
+    mode = "openMINDS" if om else "basic"
+    return f"mode={mode};openMINDS={om or '-'};mandatory={sorted(Scanner.MANDATORY.items())}"
+
+
+def validate_dir(jsonld_dir: Path, cache: Optional[ValidationCache] = None) -> List[Tuple[Union[Path, str], str]]:
+    """Validate every ``*.jsonld`` file; with ``cache`` an unchanged directory is not re-validated.
+
+    Errors are ``(location, message)``: the file as a Path, or the node ``@id``
+    as a string when openMINDS reports a node.
+
+    The cache key is the file contents plus the openMINDS version and validation
+    mode. Conversion mints new ``@id``s on every run, so the cache only helps
+    when the very same directory is validated again (batch ``--resume``, the
+    job service, repeated clicks in the UI), not for a fresh conversion.
+    """
+    if cache is None:
+        return _validate_dir(jsonld_dir)
 
-    files = sorted(jsonld_dir.glob("*.jsonld"))
-    errors: List[Tuple[Path, str]] = []
+    jsonld_dir = Path(jsonld_dir)
+    key = hashlib.sha256(
+        f"{content_digest(jsonld_dir.glob('*.jsonld'))}\0{_validator_tag()}".encode("utf-8")
+    ).hexdigest()
+    hit = cache.get(key)
+    if hit:
+        profiling.count("validation_cache_hits")
+        _VALIDATION_MODE.set(hit[0])
+        return [(jsonld_dir / p if local else p, msg) for local, p, msg in hit[1]]
+    errors = _validate_dir(jsonld_dir)
+    cache.put(key, _VALIDATION_MODE.get(), [
+        [_is_local(fp, jsonld_dir), fp.name if _is_local(fp, jsonld_dir) else str(fp), msg] for fp, msg in errors
+    ])
+    return errors
+
+
+def _is_local(where: Union[Path, str], jsonld_dir: Path) -> bool:
+    return isinstance(where, Path) and where.parent == jsonld_dir
+
+
+def _validate_dir(jsonld_dir: Path, files: Optional[List[Path]] = None) -> List[Tuple[Union[Path, str], str]]:
+    _VALIDATION_MODE.set("unknown")
+
+    files = sorted(files if files is not None else jsonld_dir.glob("*.jsonld"))
+    errors: List[Tuple[Union[Path, str], str]] = []
+    progress.report("validate", total=len(files))
 
     try:
         from openminds import Collection 
@@ -65,9 +114,10 @@ def validate_dir(jsonld_dir: Path) -> List[Tuple[Path, str]]:
         ingested = 0
         failed_files: List[Path] = []
 
-        for fp in files:
+        for i, fp in enumerate(files):
+            progress.report(done=i)
             try:
-                payload = json.loads(fp.read_text())
+                payload = read_json(fp)
             except Exception as e:
                 errors.append((fp, f"Unreadable JSON-LD: {e}"))
                 continue
@@ -84,11 +134,13 @@ def validate_dir(jsonld_dir: Path) -> List[Tuple[Path, str]]:
 
             if not added:
                 failed_files.append(fp)
+        progress.report(done=len(files))
 
         if ingested:
-            _LAST_VALIDATION_MODE = "full-openMINDS"
+            _VALIDATION_MODE.set("full-openMINDS")
             try:
-                failures = coll.validate() or []
+                with profiling.stage("openminds-validate"):
+                    failures = coll.validate() or []
                 for f in failures:
                     node = getattr(f, "node", None)
                     msg = getattr(f, "message", None) or str(f)
@@ -97,12 +149,13 @@ def validate_dir(jsonld_dir: Path) -> List[Tuple[Path, str]]:
                         hint = str(node)
                     else:
                         hint = getattr(node, "id", None) or getattr(node, "uuid", None) or ""
-                    errors.append((Path(hint or "unknown"), msg))
+                    # an @id is an IRI, not a path: Path() would fold "https://" into "https:/"
+                    errors.append((hint or "unknown", msg))
             except Exception:
                 failed_files = files
-                _LAST_VALIDATION_MODE = "basic-fallback"
+                _VALIDATION_MODE.set("basic-fallback")
         else:
-            _LAST_VALIDATION_MODE = "basic-fallback"
+            _VALIDATION_MODE.set("basic-fallback")
 
         for fp in failed_files:
             errors.extend(_minimal_validate_file(fp))
@@ -110,7 +163,7 @@ def validate_dir(jsonld_dir: Path) -> List[Tuple[Path, str]]:
         return errors
 
     except Exception:
-        _LAST_VALIDATION_MODE = "basic-fallback"
+        _VALIDATION_MODE.set("basic-fallback")
         for fp in files:
             errors.extend(_minimal_validate_file(fp))
         return errors
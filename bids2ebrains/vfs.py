@@ -0,0 +1,120 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+import hashlib, tarfile, zipfile
+
+from . import profiling, progress
+
+CHUNK = 1 << 20
+
+
+def is_archive(path: Union[str, Path]) -> bool:
+    """True for a zip or (optionally compressed) tar file."""
+    path = Path(path)
+    if not path.is_file():
+        return False
+    return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+
+
+class ArchiveFS:
+    """Read-only view of a zip or tar archive: member names and sizes, streamed member reads.
+
+    Names are the archive's own POSIX paths; directories are not listed.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        if zipfile.is_zipfile(self.path):
+            self.kind = "zip"
+            self._zip = zipfile.ZipFile(self.path)
+            self._infos: Dict[str, object] = {i.filename: i for i in self._zip.infolist() if not i.is_dir()}
+        elif tarfile.is_tarfile(self.path):
+            self.kind = "tar"
+            self._tar = tarfile.open(self.path, "r:*")
+            self._infos = {m.name: m for m in self._tar.getmembers() if m.isfile()}
+        else:
+            raise ValueError(f"{self.path}: not a zip or tar archive")
+
+    def __enter__(self) -> "ArchiveFS":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        (self._zip if self.kind == "zip" else self._tar).close()
+
+    def names(self) -> List[str]:
+        return list(self._infos)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._infos
+
+    def size(self, name: str) -> int:
+        info = self._infos[name]
+        return info.file_size if self.kind == "zip" else info.size
+
+    def crc32(self, name: str) -> Optional[str]:
+        """CRC-32 from the zip central directory (tar archives record none)."""
+        return f"{self._infos[name].CRC:08x}" if self.kind == "zip" else None
+
+    def open(self, name: str) -> BinaryIO:
+        if self.kind == "zip":
+            return self._zip.open(self._infos[name])
+        return self._tar.extractfile(self._infos[name])
+
+    def read(self, name: str) -> bytes:
+        with self.open(name) as fh:
+            return fh.read()
+
+    def digests(self, name: str, algorithms: Tuple[str, ...] = ("md5", "sha256")) -> Tuple[Dict[str, str], int]:
+        """Hex digests of a member for several algorithms in one streamed read, and its size."""
+        hs = {a: hashlib.new(a) for a in algorithms}
+        size = 0
+        with self.open(name) as fh:
+            for chunk in iter(lambda: fh.read(CHUNK), b""):
+                progress.report()
+                size += len(chunk)
+                for h in hs.values():
+                    h.update(chunk)
+        profiling.count("files_hashed")
+        profiling.count("bytes_hashed", size)
+        return {a: h.hexdigest() for a, h in hs.items()}, size
+
+    def digest(self, name: str, algorithm: str = "sha256") -> Tuple[str, int]:
+        """Hex digest and size of a member, streamed in 1 MiB chunks.
+
+        Reading members out of archive order restarts decompression of a
+        compressed tar; hash many members through :meth:`members` order instead.
+        """
+        out, size = self.digests(name, (algorithm,))
+        return out[algorithm], size
+
+    def members(self) -> Iterator[Tuple[str, int]]:
+        """``(name, size)`` in archive order, which is the cheap read order for compressed tars."""
+        for name in self._infos:
+            yield name, self.size(name)
+
+
+class ArchivePool:
+    """One open :class:`ArchiveFS` per archive, so many member reads don't re-index the archive."""
+
+    def __init__(self):
+        self._open: Dict[str, ArchiveFS] = {}
+
+    def __enter__(self) -> "ArchivePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def get(self, path: Union[str, Path]) -> ArchiveFS:
+        key = str(path)
+        if key not in self._open:
+            self._open[key] = ArchiveFS(path)
+        return self._open[key]
+
+    def close(self) -> None:
+        for fs in self._open.values():
+            fs.close()
+        self._open.clear()
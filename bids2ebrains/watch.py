@@ -0,0 +1,222 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import ctypes, ctypes.util, os, select, struct, sys, time
+
+from .scanner import Scanner
+from .utils import read_json
+from . import validator
+
+POLL_INTERVAL = 0.5
+DEBOUNCE = 0.05
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO = 0x8, 0x40, 0x80
+IN_DELETE, IN_DELETE_SELF, IN_Q_OVERFLOW = 0x200, 0x400, 0x4000
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Directory watch through the Linux inotify syscalls (ctypes, no extra dependency)."""
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF
+
+    def __init__(self, path: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {path}")
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+    def read(self, timeout: float) -> Optional[Set[str]]:
+        """Names touched within ``timeout`` seconds; None when the kernel queue overflowed."""
+        names: Set[str] = set()
+        while select.select([self.fd], [], [], timeout)[0]:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos + _EVENT.size <= len(buf):
+                _, mask, _, length = _EVENT.unpack_from(buf, pos)
+                name = buf[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\0")
+                pos += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & IN_DELETE_SELF:
+                    raise FileNotFoundError("watched directory was removed")
+                if name:
+                    names.add(os.fsdecode(name))
+            # gather the rest of a burst (editor save = several events)
+            timeout = DEBOUNCE
+        return names
+
+
+class _Poller:
+    """Fallback: compare ``(mtime, size)`` of the directory entries every ``interval`` seconds."""
+
+    def __init__(self, path: Path, interval: float = POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._seen = self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        out = {}
+        with os.scandir(self.path) as it:
+            for e in it:
+                try:
+                    st = e.stat()
+                except FileNotFoundError:
+                    continue
+                out[e.name] = (st.st_mtime_ns, st.st_size)
+        return out
+
+    def close(self) -> None:
+        pass
+
+    def read(self, timeout: float) -> Optional[Set[str]]:
+        time.sleep(min(timeout, self.interval))
+        now = self._snapshot()
+        changed = {n for n in set(now) | set(self._seen) if now.get(n) != self._seen.get(n)}
+        self._seen = now
+        return changed
+
+
+def _open_watch(path: Path, poll: bool = False, interval: float = POLL_INTERVAL):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return _Inotify(path)
+        except (OSError, AttributeError):
+            pass
+    return _Poller(path, interval)
+
+
+class WatchState:
+    """Missing mandatory fields and validation errors per file, updated file by file."""
+
+    def __init__(self, jsonld_dir: Path):
+        self.dir = Path(jsonld_dir)
+        self.missing: Dict[str, Tuple[str, List[str]]] = {}
+        self.errors: Dict[str, List[str]] = {}
+        self.ids: Dict[str, str] = {}
+        self.mode = "unknown"
+
+    def refresh(self, names: Optional[Set[str]] = None) -> List[str]:
+        """Rescan and revalidate ``names`` (every ``*.jsonld`` when None); returns the names handled."""
+        if names is None:
+            names = {fp.name for fp in self.dir.glob("*.jsonld")}
+            for gone in set(self.missing) - names:
+                self._drop(gone)
+        names = sorted(n for n in names if n.endswith(".jsonld"))
+        present = []
+        for name in names:
+            self._drop(name)
+            fp = self.dir / name
+            if not fp.is_file():
+                continue
+            present.append(fp)
+            try:
+                payload = read_json(fp)
+            except Exception:
+                self.missing[name] = ("Unreadable", [])
+                continue
+            self.missing[name] = Scanner.missing(payload)
+            if isinstance(payload, dict) and payload.get("@id"):
+                self.ids[str(payload["@id"])] = name
+        # errors whose node could not be traced to a file are stale once anything is revalidated
+        for key in set(self.errors) - set(self.missing):
+            del self.errors[key]
+        if present:
+            for where, msg in validator._validate_dir(self.dir, present):
+                # openMINDS failures name the node (@id), the basic checks the file
+                if isinstance(where, Path):
+                    name = where.name
+                else:
+                    name = self.ids.get(where, where)
+                self.errors.setdefault(name, []).append(msg)
+            self.mode = validator.get_last_validation_mode()
+        return names
+
+    def _drop(self, name: str) -> None:
+        self.missing.pop(name, None)
+        self.errors.pop(name, None)
+        for node_id in [i for i, n in self.ids.items() if n == name]:
+            del self.ids[node_id]
+            self.errors.pop(node_id, None)
+
+    def summary(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for typ, keys in self.missing.values():
+            for k in keys:
+                counts[f"{typ}.{k}"] = counts.get(f"{typ}.{k}", 0) + 1
+        return {
+            "files": len(self.missing),
+            "missing": dict(sorted(counts.items())),
+            "errors": {n: list(m) for n, m in sorted(self.errors.items())},
+            "validation_mode": self.mode,
+        }
+
+
+def watch(
+    jsonld_dir: Path,
+    on_update: Callable[[Dict[str, Any]], None],
+    poll: bool = False,
+    interval: float = POLL_INTERVAL,
+    stop: Optional[Callable[[], bool]] = None,
+) -> None:
+    """Full scan + validation once, then per changed file; ``on_update`` gets the summary each time.
+
+    Uses inotify on Linux (``poll`` forces ``(mtime, size)`` polling every
+    ``interval`` seconds). Runs until ``stop()`` is true or KeyboardInterrupt.
+    """
+    jsonld_dir = Path(jsonld_dir)
+    state = WatchState(jsonld_dir)
+    watcher = _open_watch(jsonld_dir, poll, interval)
+    backend = "inotify" if isinstance(watcher, _Inotify) else "polling"
+
+    def update(names: Optional[Set[str]]) -> None:
+        t0 = time.perf_counter()
+        handled = state.refresh(names)
+        on_update({**state.summary(), "changed": handled if names is not None else [],
+                   "seconds": round(time.perf_counter() - t0, 3), "backend": backend, "time": time.time()})
+
+    try:
+        update(None)
+        while not (stop and stop()):
+            names = watcher.read(interval)
+            if names is None:
+                update(None)
+            elif any(n.endswith(".jsonld") for n in names):
+                update(names)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def render(summary: Dict[str, Any], out=None, max_errors: int = 20) -> None:
+    """Redraw the live summary (clears the screen when writing to a terminal)."""
+    out = out or sys.stdout
+    if out.isatty():
+        out.write("\x1b[2J\x1b[H")
+    stamp = time.strftime("%H:%M:%S", time.localtime(summary["time"]))
+    n_missing = sum(summary["missing"].values())
+    n_errors = sum(len(m) for m in summary["errors"].values())
+    what = f"{len(summary['changed'])} changed file(s)" if summary["changed"] else "full scan"
+    print(f"[{stamp}] {summary['files']} files: {n_missing} missing field(s), {n_errors} error(s) in "
+          f"{len(summary['errors'])} file(s)  ({what} in {summary['seconds']}s, {summary['backend']}, "
+          f"{summary['validation_mode']})", file=out)
+    for key, n in summary["missing"].items():
+        print(f"  {key:<40}{n:>6}", file=out)
+    errors = [(name, msg) for name, msgs in summary["errors"].items() for msg in msgs]
+    for name, msg in errors[:max_errors]:
+        print(f"  [invalid] {name}: {msg}", file=out)
+    if len(errors) > max_errors:
+        print(f"  ... {len(errors) - max_errors} more", file=out)
+    out.flush()
@@ -2,13 +2,17 @@ import os
 from pathlib import Path
 import streamlit as st
 
-from bids2ebrains.core import convert_bids, scan_missing, patch_openminds, upload_to_kg, validate_jsonld
 from bids2ebrains.grouper import group_subjects
 from bids2ebrains.mappings import LICENSE, ACCESSIBILITY, AGE_CATEGORY
-from bids2ebrains.validator import get_last_validation_mode
+from bids2ebrains.jobs import JobManager, JOB_KINDS, DONE, FAILED, CANCELLED
+from bids2ebrains.scanner import Scanner
+from bids2ebrains.utils import dir_fingerprint
+from bids2ebrains.archive import extract_metadata, stream_to_file
 
 import subprocess, time
-import json, zipfile, shutil
+import shutil
+import threading
+from collections import OrderedDict
 
 
 
@@ -17,24 +21,14 @@ def _local_name(uri: str) -> str:
         return ""
     return uri.rsplit("/", 1)[-1].rsplit("#", 1)[-1]
 
-def _summarize_missing(report: dict) -> dict:
+def _summarize_missing(report: dict, types: dict) -> dict:
+    # ``types`` comes with the scan result, so no file is reopened here.
     counts = {}
     for fp, miss in report.items():
-        try:
-            payload = json.loads(Path(fp).read_text())
-            typ = payload.get("@type")
-            if isinstance(typ, list) and typ:
-                typ = typ[-1]
-            if isinstance(typ, str):
-                tname = _local_name(typ)
-            else:
-                tname = "Unknown"
-            for k in miss:
-                key = f"{tname}.{k}"
-                counts[key] = counts.get(key, 0) + 1
-        except Exception:
-            for k in miss:
-                counts[k] = counts.get(k, 0) + 1
+        tname = types.get(fp, "Unknown")
+        for k in miss:
+            key = f"{tname}.{k}"
+            counts[key] = counts.get(key, 0) + 1
     return dict(sorted(counts.items(), key=lambda x: (-x[1], x[0])))
 
 def download_ds001_sparse():
@@ -66,23 +60,17 @@ def download_ds001_sparse():
         except Exception as e:
             status.update(label=f"Failed to download ds001: {e}", state="error", expanded=True)
 
-def jsonld_summary(out_dir: Path) -> dict:
+@st.cache_data(show_spinner=False, max_entries=32)
+def _jsonld_summary(out_dir: str, fingerprint: str) -> dict:
     counts = {}
-    for fp in Path(out_dir).glob("*.jsonld"):
-        try:
-            obj = json.loads(fp.read_text())
-            typ = obj.get("@type")
-            if isinstance(typ, list) and typ:
-                typ = typ[-1]
-            if isinstance(typ, str):
-                name = typ.rsplit("/", 1)[-1]
-            else:
-                name = "Unknown"
-            counts[name] = counts.get(name, 0) + 1
-        except Exception:
-            counts["Unreadable"] = counts.get("Unreadable", 0) + 1
+    for name in Scanner.types(Path(out_dir)).values():
+        counts[name] = counts.get(name, 0) + 1
     return counts
 
+def jsonld_summary(out_dir: Path) -> dict:
+    # Keyed on the folder fingerprint: reruns only re-read files after they change.
+    return _jsonld_summary(str(Path(out_dir).resolve()), dir_fingerprint(out_dir))
+
 def _maybe_text(key: str, label: str, placeholder: str = "", help_text: str = ""):
     prompts = st.session_state.get("scan_prompts", {})
     if key in prompts:
@@ -90,6 +78,131 @@ def _maybe_text(key: str, label: str, placeholder: str = "", help_text: str = ""
         return v.strip()
     return ""
 
+@st.cache_resource
+def _job_manager() -> JobManager:
+    # One pool per server process: imports and caches stay warm across sessions and reruns.
+    return JobManager(workers=2)
+
+def _start_job(key: str, kind: str, params: dict, fn=None) -> None:
+    job = _job_manager().submit(kind, params, fn=fn)
+    st.session_state.setdefault("jobs", {})[key] = job.id
+
+def _session_job(key: str):
+    job_id = st.session_state.get("jobs", {}).get(key)
+    return _job_manager().get(job_id) if job_id else None
+
+RESULT_CACHE_SIZE = int(os.getenv("BIDS2EBRAINS_UI_RESULTS", "32"))
+
+class _ResultCache:
+    """(kind, folder, fingerprint) -> job result for the last ``size`` jobs (LRU).
+
+    Storing a result drops older fingerprints of the same kind and folder:
+    they can never match again once the folder has changed.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[tuple, object]" = OrderedDict()
+
+    def get(self, key: tuple):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value) -> None:
+        with self._lock:
+            for old in [k for k in self._items if k[:2] == key[:2] and k != key]:
+                del self._items[old]
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+@st.cache_resource
+def _results() -> _ResultCache:
+    # shared by all sessions of this server process
+    return _ResultCache(RESULT_CACHE_SIZE)
+
+def _start_cached_job(key: str, kind: str, folder: str, params: dict, fn=None) -> None:
+    """Like ``_start_job`` but reuses the last result while ``folder`` is unchanged."""
+    ck = (kind, str(Path(folder).resolve()), dir_fingerprint(folder))
+    cached = _results().get(ck)
+    if cached is not None:
+        _start_job(key, kind, params, fn=lambda: cached)
+        return
+    runner = fn or (lambda: JOB_KINDS[kind](params, _job_manager().caches))
+    def run():
+        result = runner()
+        _results().put(ck, result)
+        return result
+    _start_job(key, kind, params, fn=run)
+
+def _job_running(key: str) -> bool:
+    job = _session_job(key)
+    return job is not None and not job.done
+
+def _chain(*steps):
+    # Run registered job kinds back to back in one job; stops early when a step returns errors.
+    def run():
+        out = {}
+        for kind, params in steps:
+            out[kind] = JOB_KINDS[kind](params, _job_manager().caches)
+            if isinstance(out[kind], dict) and out[kind].get("errors"):
+                break
+        return out
+    return run
+
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+def _job_panel(key: str, on_done) -> None:
+    """Live progress (with Cancel) for this session's ``key`` job, then ``on_done(job)``."""
+    job = _session_job(key)
+    if job is None:
+        return
+    if job.done:
+        if job.state == DONE:
+            on_done(job)
+        elif job.state == FAILED:
+            st.error(f"{job.kind} failed: {job.error}")
+        elif job.state == CANCELLED:
+            st.warning(f"{job.kind} cancelled.")
+        return
+
+    def live():
+        current = _session_job(key)
+        if current is None:
+            return
+        if current.done:
+            st.rerun()  # full rerun so results and dependent widgets refresh
+        p = current.progress.as_dict()
+        frac = min(p["done"] / p["total"], 1.0) if p["total"] else 0.0
+        text = f"{p['stage'] or current.kind}: {p['done']}/{p['total'] if p['total'] is not None else '?'} {p['unit']}"
+        if p["eta_s"] is not None:
+            text += f" · ETA {p['eta_s']:.0f}s"
+        text += f" · {p['elapsed_s']:.0f}s elapsed"
+        st.progress(frac, text=text)
+        if st.button("Cancel", key=f"cancel_{key}_{current.id}"):
+            _job_manager().cancel(current.id)
+
+    if _fragment is not None:
+        _fragment(run_every=1.0)(live)()
+    else:
+        live()
+        st.button("Refresh progress", key=f"refresh_{key}")
+
+def _show_validation(result: dict, limit: int = 100) -> None:
+    errs = result.get("errors") or []
+    if not errs:
+        st.success("Schema validation passed")
+    else:
+        st.error(f"Schema validation found {len(errs)} issue(s):")
+        for fp, msg in errs[:limit]:
+            st.write(f"• **{fp}** — {msg}")
+    st.caption(f"Validation mode: {result.get('mode', 'unknown')}")
+
 def _check_iri_field(label: str, key: str, placeholder: str = "") -> str:
     val = st.text_input(label, key=key, placeholder=placeholder)
     if val and not (val.startswith("http://") or val.startswith("https://")):
@@ -123,29 +236,28 @@ with st.expander("Step 1 Convert ⚙️", expanded=False):
             help="Select a zipped BIDS dataset from your local machine. The archive is processed locally; nothing is uploaded."
         )
 
-        if up is not None:
+        metadata_only = st.checkbox(
+            "Metadata only",
+            value=True,
+            help="Extract sidecars, TSVs and descriptions only; imaging files become empty placeholders of their "
+                 "real size (sizes come from the archive; file hashes are streamed from it during conversion)."
+        )
+
+        if up is not None and st.session_state.get("upload_id") != (up.file_id, metadata_only):
             try:
                 upload_root = Path("bids-upload")
                 if upload_root.exists():
                     shutil.rmtree(upload_root)
                 upload_root.mkdir(parents=True, exist_ok=True)
                 zip_path = upload_root / "dataset.zip"
-                with open(zip_path, "wb") as f:
-                    f.write(up.getbuffer())
-                with zipfile.ZipFile(zip_path) as z:
-                    z.extractall(upload_root)
-                def _find_bids_root(base: Path) -> Path | None:
-                    for p in [base, *base.glob("**/*")]:
-                        if p.is_dir() and (p / "dataset_description.json").exists():
-                            return p
-                    return None
-                root = _find_bids_root(upload_root)
-                if root:
-                    st.session_state["bids_dir"] = str(root)
-                    st.success(f"Uploaded and extracted. Using: {root}")
-                    st.rerun()
-                else:
-                    st.error("Could not find dataset_description.json in the uploaded archive.")
+                stream_to_file(up, zip_path)
+                root = extract_metadata(zip_path, upload_root / "extracted", metadata_only=metadata_only)
+                st.session_state["upload_id"] = (up.file_id, metadata_only)
+                st.session_state["bids_dir"] = str(root)
+                st.success(f"Uploaded and extracted. Using: {root}")
+                st.rerun()
+            except FileNotFoundError:
+                st.error("Could not find dataset_description.json in the uploaded archive.")
             except Exception as e:
                 st.error(f"Failed to process upload: {e}")
 
@@ -162,20 +274,24 @@ with st.expander("Step 1 Convert ⚙️", expanded=False):
         help="Folder where the converted openMINDS JSON-LD files will be written."
     )
 
-    if st.button("Convert"):
+    if st.button("Convert", disabled=_job_running("convert")):
         if not bids_dir or not Path(bids_dir).exists():
             st.error("Please provide a valid BIDS directory (use Download or Upload).")
         elif not out_dir:
             st.error("Please provide an output folder name.")
         else:
-            convert_bids(Path(bids_dir), Path(out_dir))
-            st.success(f"Converted to {out_dir}")
-            s = jsonld_summary(Path(out_dir))
-            c1, c2, c3, c4 = st.columns(4)
-            c1.metric("Dataset(s)", s.get("Dataset", 0))
-            c2.metric("DatasetVersion(s)", s.get("DatasetVersion", 0))
-            c3.metric("Subject(s)", s.get("Subject", 0))
-            c4.metric("File(s)", s.get("File", 0))
+            _start_job("convert", "convert", {"bids": bids_dir, "out": out_dir})
+
+    def _converted(job):
+        st.success(f"Converted to {job.params['out']}")
+        s = jsonld_summary(Path(job.params["out"]))
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Dataset(s)", s.get("Dataset", 0))
+        c2.metric("DatasetVersion(s)", s.get("DatasetVersion", 0))
+        c3.metric("Subject(s)", s.get("Subject", 0))
+        c4.metric("File(s)", s.get("File", 0))
+
+    _job_panel("convert", _converted)
 
 
 # Step 2 Scan & Patch
@@ -193,11 +309,17 @@ with st.expander("Step 2 Scan & Patch 🩹"):
         value=False,
         help="If enabled and a field remains missing, the program will ask for it in the terminal when running headless."
     )
-    if st.button("Scan"):
-        rep, prompts = scan_missing(Path(jsonld))
-        st.session_state["scan_report"] = {str(k): v for k, v in rep.items()}
-        st.session_state["scan_prompts"] = prompts
-        miss_summary = _summarize_missing(rep)
+    if st.button("Scan", disabled=_job_running("scan")):
+        _start_cached_job("scan", "scan", jsonld, {"jsonld": jsonld})
+
+    def _scanned(job):
+        rep, prompts = job.result["missing"], job.result["prompts"]
+        if st.session_state.get("scan_job") != job.id:
+            # First render of this result: feed the form below.
+            st.session_state["scan_job"] = job.id
+            st.session_state["scan_report"] = rep
+            st.session_state["scan_prompts"] = dict(prompts)
+        miss_summary = _summarize_missing(rep, job.result.get("types", {}))
         n_files_with_issues = len([1 for v in rep.values() if v])
         n_total_gaps = sum(len(v) for v in rep.values())
         st.success(f"{n_files_with_issues} files have missing fields; {n_total_gaps} total gaps.")
@@ -216,6 +338,8 @@ with st.expander("Step 2 Scan & Patch 🩹"):
         with st.expander("Unique prompts"):
             st.json(st.session_state["scan_prompts"])
 
+    _job_panel("scan", _scanned)
+
     st.subheader("Fill required fields")
     prompts = st.session_state.get("scan_prompts", {})
     auto_filled = {"FileRepository.hostedBy", "FileRepository.label"}
@@ -234,8 +358,8 @@ with st.expander("Step 2 Scan & Patch 🩹"):
             "Add 1..N persons to be registered as dataset custodians.\n"
             "Priority order for matching: **Existing Person IRI** → **ORCID** → **First & Last name**.\n"
             "If you paste an IRI, it overrides ORCID and names.\n"
-            "When no ORCID is given, and the Disambiguation toggle is ON, we search by family name and use\n"
-            "fuzzy similarity on the given name to avoid duplicates."
+            "When no ORCID is given, and the Disambiguation toggle is ON, we search by family name and rank\n"
+            "candidates by fuzzy (trigram) similarity of the full name to avoid duplicates."
         )
 
     n = st.number_input(
@@ -396,39 +520,28 @@ with st.expander("Step 2 Scan & Patch 🩹"):
         if custodians:
             answers["custodians"] = custodians
 
-        submitted = st.form_submit_button("Patch", help="Apply provided values to all missing fields.")
+        submitted = st.form_submit_button("Patch", help="Apply provided values to all missing fields.",
+                                          disabled=_job_running("patch"))
         if submitted:
             if not answers:
                 st.warning("Please enter at least one value before patching.")
             else:
-                patch_openminds(
-                    Path(jsonld),
-                    repo_iri="",
-                    interactive=False,
-                    answers=answers,
-                    resolve_persons=resolve_flag,
-                    token=resolve_token or None,
-                )
-                st.success("Patched missing fields in JSON-LD files.")
-                errs = validate_jsonld(Path(jsonld))
-                if not errs:
-                    st.success("Schema validation passed")
-                else:
-                    st.error(f"Schema validation found {len(errs)} issue(s):")
-                    for fp, msg in errs[:50]:
-                        st.write(f"• **{fp}** — {msg}")
-                    st.info("Fix the inputs above and patch again, or correct the JSON-LD manually.")
-                st.caption(f"Validation mode: {get_last_validation_mode()}")
-
-    if st.button("Validate JSON-LD"):
-        errs = validate_jsonld(Path(jsonld))
-        if not errs:
-            st.success("Schema validation passed")
-        else:
-            st.error(f"Schema validation found {len(errs)} issue(s):")
-            for fp, msg in errs[:100]:
-                st.write(f"• **{fp}** — {msg}")
-        st.caption(f"Validation mode: {get_last_validation_mode()}")
+                patch_params = {"jsonld": jsonld, "repo_iri": "", "answers": answers,
+                                "resolve_persons": resolve_flag, "token": resolve_token or None}
+                _start_job("patch", "patch", patch_params,
+                           fn=_chain(("patch", patch_params), ("validate", {"jsonld": jsonld})))
+
+    def _patched(job):
+        st.success("Patched missing fields in JSON-LD files.")
+        _show_validation(job.result["validate"], limit=50)
+        if job.result["validate"].get("errors"):
+            st.info("Fix the inputs above and patch again, or correct the JSON-LD manually.")
+
+    _job_panel("patch", _patched)
+
+    if st.button("Validate JSON-LD", disabled=_job_running("validate")):
+        _start_cached_job("validate", "validate", jsonld, {"jsonld": jsonld})
+    _job_panel("validate", lambda job: _show_validation(job.result))
 # Step 3 Upload
 with st.expander("Step 3 Upload 🚀"):
     jsonld = st.text_input(
@@ -448,14 +561,27 @@ with st.expander("Step 3 Upload 🚀"):
         help="Personal access token from the EBRAINS portal."
     )
 
-    if st.button("Upload"):
-        errs = validate_jsonld(Path(jsonld))
+    if st.button("Upload", disabled=_job_running("upload")):
+        _start_job("upload", "upload", {"jsonld": jsonld, "space": space, "token": token or None},
+                   fn=_chain(("validate", {"jsonld": jsonld}),
+                             ("upload", {"jsonld": jsonld, "space": space, "token": token or None})))
+
+    def _uploaded(job):
+        errs = job.result["validate"].get("errors")
         if errs:
             st.error("Upload blocked: schema validation failed. Please fix errors before uploading.")
             for fp, msg in errs[:50]:
                 st.write(f"• **{fp}** — {msg}")
+            return
+        res = job.result["upload"]
+        if res["failed"]:
+            st.error(f"Upload stopped: {len(res['failed'])} node(s) rejected by the KG "
+                     f"({', '.join(f'{n} ({code})' for n, code in res['failed'])}).")
         else:
-            with st.status("Uploading to EBRAINS KG…", expanded=True) as status:
-                upload_to_kg(Path(jsonld), space=space, token=token or None)
-                status.update(label="Upload completed successfully.", state="complete", expanded=False)
-            st.balloons()
+            st.success(f"Upload completed successfully: {res['uploaded']} node(s) uploaded, "
+                       f"{res['skipped']} controlled term(s) skipped.")
+            if st.session_state.get("balloons_job") != job.id:
+                st.session_state["balloons_job"] = job.id
+                st.balloons()
+
+    _job_panel("upload", _uploaded)